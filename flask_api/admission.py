@@ -0,0 +1,171 @@
+"""
+Admission control for the prediction routes
+
+Each model family gets its own budget: at most max_in_flight requests
+running, at most max_queue more waiting (each for up to max_wait_ms).
+Anything beyond that is rejected straight away, so under overload
+clients get a quick "retry later" instead of timing out behind a
+backlog. Waiting requests are admitted in arrival order: a freed slot is
+handed to the oldest waiter, never to a request that just arrived.
+Separate budgets mean a burst of image uploads can't take the
+slots the tabular endpoints need.
+
+    try:
+        with soil_admission.slot():
+            ...
+    except Rejected as e:
+        return busy_response(e)
+
+A queued request waits on the server thread that is serving it, so the
+limits only keep budgets apart if they fit in the server's threads:
+thread_limits() splits a worker's request threads between the budgets,
+so running plus queued requests of one budget never take threads
+another needs, and one thread is left for everything else (/health,
+/metrics, answering the 429s).
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import Counter, Gauge, Histogram
+
+ADMISSION_IN_FLIGHT = Gauge('flask_api_admission_in_flight', 'Requests admitted and running', ['budget'])
+ADMISSION_QUEUED = Gauge('flask_api_admission_queue_depth', 'Requests waiting for a slot', ['budget'])
+ADMISSION_REJECTED = Counter('flask_api_admission_rejected_total', 'Requests rejected by admission control',
+                             ['budget', 'reason'])
+ADMISSION_WAIT = Histogram('flask_api_admission_wait_seconds', 'Time admitted requests spent queued',
+                           ['budget'])
+
+QUEUE_FULL = 'queue_full'
+QUEUE_TIMEOUT = 'queue_timeout'
+
+
+def thread_limits(threads, shares, reserve=1):
+    """{budget: (max_in_flight, max_queue)} that together fit in threads
+
+    Each budget gets its share of the threads left after reserve (at least
+    one), split into running and queued requests.
+    """
+    usable = max(len(shares), threads - reserve)
+    total = sum(shares.values())
+    exact = {name: usable * share / total for name, share in shares.items()}
+    threads_for = {name: max(1, int(value)) for name, value in exact.items()}
+    # Threads left by rounding down go to the largest remainders
+    leftover = usable - sum(threads_for.values())
+    for name in sorted(exact, key=lambda n: exact[n] - int(exact[n]), reverse=True)[:max(0, leftover)]:
+        threads_for[name] += 1
+    return {name: (n - n // 3, n // 3) for name, n in threads_for.items()}
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, budget, reason, status, retry_after):
+        super().__init__(f'{budget}: {reason}')
+        self.budget = budget
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a bounded, time-limited FIFO wait queue"""
+
+    def __init__(self, name, max_in_flight, max_queue=0, max_wait_ms=0):
+        self.name = name
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+        # Moving average of how long a slot is held, for Retry-After
+        self.avg_service_seconds = 0.0
+
+        self._lock = threading.Lock()
+        # One Event per waiting request, oldest first; set when handed a slot
+        self._waiters = deque()
+        self._in_flight = ADMISSION_IN_FLIGHT.labels(budget=name)
+        self._queued = ADMISSION_QUEUED.labels(budget=name)
+
+    def _retry_after(self):
+        # Roughly how long until the current backlog has drained
+        backlog = (self.in_flight + self.queued) / self.max_in_flight
+        return max(1, math.ceil(self.avg_service_seconds * backlog))
+
+    def _reject(self, reason, status):
+        self.rejected[reason] += 1
+        ADMISSION_REJECTED.labels(budget=self.name, reason=reason).inc()
+        return Rejected(self.name, reason, status, self._retry_after())
+
+    def acquire(self):
+        """Take a slot, waiting up to max_wait; raises Rejected"""
+        start = time.perf_counter()
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self._admit()
+                granted = None
+            elif self.queued >= self.max_queue:
+                # 429: shed immediately, the queue is already as long as allowed
+                raise self._reject(QUEUE_FULL, 429)
+            else:
+                granted = threading.Event()
+                self._waiters.append(granted)
+                self.queued += 1
+                self._queued.set(self.queued)
+
+        if granted is not None and not granted.wait(self.max_wait):
+            with self._lock:
+                # A slot may have been handed over just as the wait ran out
+                if not granted.is_set():
+                    self._waiters.remove(granted)
+                    self.queued -= 1
+                    self._queued.set(self.queued)
+                    # 503: waited the maximum and still no capacity
+                    raise self._reject(QUEUE_TIMEOUT, 503)
+        ADMISSION_WAIT.labels(budget=self.name).observe(time.perf_counter() - start)
+        return time.perf_counter()
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        self._in_flight.set(self.in_flight)
+
+    def release(self, acquired_at=None):
+        with self._lock:
+            self.in_flight -= 1
+            if acquired_at is not None:
+                held = time.perf_counter() - acquired_at
+                self.avg_service_seconds += 0.1 * (held - self.avg_service_seconds)
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter
+                self.queued -= 1
+                self._queued.set(self.queued)
+                self._admit()
+                self._waiters.popleft().set()
+            else:
+                self._in_flight.set(self.in_flight)
+
+    @contextmanager
+    def slot(self):
+        acquired_at = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def stats(self):
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'avg_service_ms': round(self.avg_service_seconds * 1000.0, 2)
+        }
@@ -1,22 +1,62 @@
 import os
 import sys
+import time
+import uuid
+import threading
+import hmac
+import math
+import functools
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+# First, so STARTUP_PROFILE=1 times every import below (startup_profiler.py)
+import startup_profiler
+from startup_profiler import phase
+
+# One thread budget per worker for TF / BLAS / sklearn (thread_budget.py);
+# the BLAS settings only take effect if exported before numpy is imported
+from thread_budget import worker_budget, apply_env, limit_blas, configure_tensorflow, set_n_jobs
+THREAD_BUDGET = worker_budget()
+apply_env(THREAD_BUDGET)
 
 # Download models on startup if needed
-if not os.path.exists('models/fertility_model.pkl'):
+if not os.path.exists('models/fertility_model.pkl') and not os.path.exists('models/fertility.bundle'):
     print("⚠️  Models not found. Downloading...")
     from download_models import download_models
-    download_models()
+    with phase('download models'):
+        download_models()
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context, g, has_request_context
 from flask_cors import CORS
 import joblib
+import pickle
 import numpy as np
 import json
+import csv
+from types import SimpleNamespace
 from werkzeug.utils import secure_filename
-import tensorflow as tf
-from tensorflow import keras
 from PIL import Image
 import io
+from model_loader import LazyModel, ModelWatcher, file_version, artifacts_version, preload as preload_models, MODEL_STATES
+from inference_scheduler import InferenceScheduler
+from result_cache import ResultCache
+from tree_engine import compile_model, SklearnPredictor
+from fast_inference import CompiledPredictor, TFLitePredictor, keras_predictor, without_graph_resize
+from metrics import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, process_memory
+from logging_setup import setup_logging, get_logger, dropped_records
+from admission import AdmissionController, Rejected, thread_limits
+from image_preprocessing import preprocess_image, ImageTooLarge
+from buffer_pool import TensorPool
+from model_bundle import read_bundle, engine_from_bundle
+from warmup import (MODEL_WARMUP, parse_sizes, default_batch_sizes,
+                    warm_image_model, warm_tabular_model)
+
+# Pools that started before apply_env (numpy imported by the caller first)
+limit_blas(THREAD_BUDGET)
+
+# Request-path logging (LOG_LEVEL / LOG_FORMAT); startup still prints
+setup_logging()
+logger = get_logger('app')
 
 app = Flask(__name__)
 
@@ -44,100 +84,304 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# CSV bulk-scoring (/predict/<model>/stream): rows scored per chunk, upload limit
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 2048))
+STREAM_MAX_CONTENT_LENGTH = int(os.environ.get('STREAM_MAX_MB', 1024)) * 1024 * 1024
+
 # ==================== LOAD MODELS ====================
-print("🔄 Loading ML models...")
+# Models load lazily: on first use, or in the background for the families
+# listed in MODEL_PRELOAD ("all", "none", or e.g. "fertility,irrigation").
+# TensorFlow is only imported when the soil image model is loaded.
+MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'all').lower()
+
+# Micro-batching: concurrent uploads are merged into one forward pass
+SOIL_BATCH_MAX_SIZE = int(os.environ.get('SOIL_BATCH_MAX_SIZE', 16))
+SOIL_BATCH_MAX_WAIT_MS = float(os.environ.get('SOIL_BATCH_MAX_WAIT_MS', 10))
+
+# Backend: 'keras' (.keras/.h5) or 'tflite' (quantized export from export_tflite.py)
+SOIL_MODEL_BACKEND = os.environ.get('SOIL_MODEL_BACKEND', 'keras').lower()
+SOIL_TFLITE_MODEL = os.environ.get('SOIL_TFLITE_MODEL')
+TFLITE_NUM_THREADS = int(os.environ.get('TFLITE_NUM_THREADS', THREAD_BUDGET['tf_intra_op']))
+
+# Evaluate the tree ensembles with tree_engine.py instead of sklearn (0 disables)
+USE_TREE_ENGINE = os.environ.get('TREE_ENGINE', '1') != '0'
+
+# Multi-image requests (/predict/soil-image/batch): photos per request, upload
+# limit, and threads decoding them in parallel (PIL releases the GIL)
+SOIL_MULTI_MAX_IMAGES = int(os.environ.get('SOIL_MULTI_MAX_IMAGES', 32))
+SOIL_MULTI_MAX_CONTENT_LENGTH = int(os.environ.get('SOIL_MULTI_MAX_MB', 128)) * 1024 * 1024
+SOIL_DECODE_THREADS = int(os.environ.get('SOIL_DECODE_THREADS', min(4, THREAD_BUDGET['threads'])))
+image_decode_pool = ThreadPoolExecutor(SOIL_DECODE_THREADS, thread_name_prefix='image-decode')
+
+# Warmup plan (warmup.py): batch shapes run through each model before it
+# reports ready, so the first requests after a deploy aren't the slow ones
+SOIL_WARMUP_BATCH_SIZES = parse_sizes(os.environ.get('SOIL_WARMUP_BATCH_SIZES'),
+                                      default_batch_sizes(SOIL_BATCH_MAX_SIZE, SOIL_MULTI_MAX_IMAGES))
+TABULAR_WARMUP_ROWS = parse_sizes(os.environ.get('TABULAR_WARMUP_ROWS'), (1, 64, STREAM_CHUNK_ROWS))
+
+# TFLite backend: batch sizes with their own interpreter, allocated on first
+# use and never resized (activation memory each). Other sizes share one
+# interpreter resized as needed; larger batches run in chunks of the largest
+TFLITE_BATCH_BUCKETS = parse_sizes(os.environ.get('TFLITE_BATCH_BUCKETS'), (1, SOIL_BATCH_MAX_SIZE))
+
+# Reused input tensors (buffer_pool.py): idle batch buffers kept per model;
+# 0 disables reuse (every request allocates, still counted in /metrics)
+SOIL_BUFFER_POOL_BATCHES = int(os.environ.get('SOIL_BUFFER_POOL_BATCHES', 2))
+
+# Result cache for repeated soil image uploads (0 disables)
+SOIL_CACHE_MAX_MB = float(os.environ.get('SOIL_CACHE_MAX_MB', 32))
+SOIL_CACHE_TTL = float(os.environ.get('SOIL_CACHE_TTL', 3600))
+soil_result_cache = ResultCache(SOIL_CACHE_MAX_MB * 1024 * 1024, SOIL_CACHE_TTL)
 
-# Fertility model
-try:
-    fertility_model = joblib.load('models/fertility_model.pkl')
-    fertility_scaler = joblib.load('models/fertility_scaler.pkl')
-    fertility_features = joblib.load('models/fertility_features.pkl')
+# Admission control: per-budget in-flight limit, wait queue length and max
+# wait, e.g. SOIL_IMAGE_MAX_IN_FLIGHT / SOIL_IMAGE_MAX_QUEUE / SOIL_IMAGE_MAX_WAIT_MS.
+# Each model has its own budget; CSV streams ("bulk") hold a slot for the
+# whole upload, so they get a small one of their own. Queued requests hold
+# a server thread too, so under gunicorn / uvicorn (which export
+# REQUEST_THREADS) the limits are the budgets' shares of the worker's
+# threads; the fixed defaults only apply to the dev server.
+REQUEST_THREADS = int(os.environ.get('REQUEST_THREADS', 0))
+ADMISSION_SHARES = {'soil_image': 0.5, 'fertility': 0.2, 'irrigation': 0.2, 'bulk': 0.1}
+ADMISSION_LIMITS = thread_limits(REQUEST_THREADS, ADMISSION_SHARES) if REQUEST_THREADS else {
+    'soil_image': (SOIL_BATCH_MAX_SIZE * 2, 32),
+    'fertility': (16, 64),
+    'irrigation': (16, 64),
+    'bulk': (2, 2)
+}
+
+def admission_budget(name, max_wait_ms):
+    prefix = name.upper()
+    max_in_flight, max_queue = ADMISSION_LIMITS[name]
+    return AdmissionController(
+        name,
+        max_in_flight=int(os.environ.get(f'{prefix}_MAX_IN_FLIGHT', max_in_flight)),
+        max_queue=int(os.environ.get(f'{prefix}_MAX_QUEUE', max_queue)),
+        max_wait_ms=float(os.environ.get(f'{prefix}_MAX_WAIT_MS', max_wait_ms))
+    )
+
+ADMISSION = {
+    'soil_image': admission_budget('soil_image', 2000),
+    'fertility': admission_budget('fertility', 1000),
+    'irrigation': admission_budget('irrigation', 1000),
+    'bulk': admission_budget('bulk', 1000)
+}
+
+# ==================== METRICS ====================
+# Served at /metrics. Stage names per route:
+#   soil image: read, cache, decode, convert, resize, normalize, forward, topk, serialize
+#   tabular:    extract, scale (skipped for fused models), predict, serialize
+REQUESTS = Counter('flask_api_requests_total', 'Requests served',
+                   ['endpoint', 'method', 'status'])
+REQUEST_SECONDS = Histogram('flask_api_request_duration_seconds',
+                            'End-to-end request latency (including streamed bodies)', ['endpoint'])
+IN_FLIGHT = Gauge('flask_api_requests_in_flight', 'Requests currently being served', ['endpoint'])
+STAGE_SECONDS = Histogram('flask_api_stage_duration_seconds',
+                          'Time spent in each stage of a prediction route', ['endpoint', 'stage'])
+MODEL_LOAD_SECONDS = Gauge('flask_api_model_load_seconds', 'Time taken to load each model', ['model'])
+MODEL_STATE = Gauge('flask_api_model_state', '1 for the current load state of each model',
+                    ['model', 'state'])
+BATCH_SECONDS = Histogram('flask_api_inference_batch_seconds',
+                          'Model forward time per micro-batch (excludes queueing)', ['model'])
+BATCH_SIZE = Histogram('flask_api_inference_batch_size', 'Inputs per micro-batch', ['model'],
+                       buckets=(1, 2, 4, 8, 16, 32, 64))
+QUEUE_DEPTH = Gauge('flask_api_inference_queue_depth', 'Inputs waiting for a micro-batch', ['model'])
+PROCESS_MEMORY = Gauge('flask_api_process_memory_bytes',
+                       'Memory of this worker process (uss = not shared with other processes)', ['kind'])
+MODEL_INFO = Gauge('flask_api_model_info', 'Active version of each model (always 1)',
+                   ['model', 'version'])
+MODEL_RELOADS = Gauge('flask_api_model_reloads', 'Successful hot reloads of each model', ['model'])
+LOG_DROPPED = Gauge('flask_api_log_records_dropped', 'Log records dropped because the log queue was full')
+
+def stage(name):
+    """Time a block as one stage of the current route (not recorded outside requests, e.g. warmup)"""
+    if not has_request_context():
+        return nullcontext()
+    return STAGE_SECONDS.time(endpoint=request.endpoint or 'none', stage=name)
+
+def compile_tree_model(model, name):
+    """Flat-array engine for the tree ensemble, or plain sklearn as fallback"""
+    if USE_TREE_ENGINE:
+        try:
+            with phase(f'compile {name} trees'):
+                engine = compile_model(model)
+            print(f"  ✅ {name}: compiled {engine.n_trees} trees ({engine.n_nodes} nodes)")
+            return engine
+        except Exception as e:
+            print(f"  ⚠️  {name}: tree engine unavailable, using sklearn: {e}")
+    return SklearnPredictor(model)
+
+def load_fused(path, sources):
+    """Scaler-folded engine from build_fused_models.py, if built from these pickles"""
+    if not USE_TREE_ENGINE or not os.path.exists(path):
+        return None
     try:
-        fertility_encoder = joblib.load('models/fertility_label_encoder.pkl')
+        with phase(f'unpickle {path}'):
+            fused = joblib.load(path)
+        current = {source: file_version(source) for source in sources}
+        if fused.get('sources') != current:
+            print(f"  ⚠️  {path} is stale (source pickles changed), ignoring it")
+            return None
+        print(f"  ✅ Using fused model {path}")
+        return fused
+    except Exception as e:
+        print(f"  ⚠️  Failed to load {path}: {e}")
+        return None
+
+def load_bundle(path, sources):
+    """Memory-mapped model bundle from pack_models.py, unless its sources changed
+    
+    Only source pickles that are present are compared, so a deploy can ship
+    the bundle alone.
+    """
+    if not USE_TREE_ENGINE or not os.path.exists(path):
+        return None
+    try:
+        with phase(f'map {path}'):
+            bundle = read_bundle(path)
+        recorded = bundle.meta.get('sources', {})
+        current = {source: file_version(source) for source in recorded if os.path.exists(source)}
+        if any(recorded[source] != version for source, version in current.items()) or \
+                any(source not in recorded for source in sources if os.path.exists(source)):
+            print(f"  ⚠️  {path} is stale (source pickles changed), ignoring it")
+            return None
+        engine, scaler = engine_from_bundle(bundle)
+        print(f"  ✅ Using bundle {path} ({bundle.size / 1e6:.2f} MB, memory-mapped)")
+        return SimpleNamespace(model=None, scaler=scaler, features=bundle.meta['features'],
+                               engine=engine, fused=scaler is None, bundle=path,
+                               meta=bundle.meta)
+    except Exception as e:
+        print(f"  ⚠️  Failed to load {path}: {e}")
+        return None
+
+def predict_rows(bundle, X):
+    """Labels and probabilities for a matrix of raw feature rows"""
+    if not bundle.fused:
+        # (Fused models have the scaler folded into the tree thresholds)
+        with stage('scale'):
+            X = bundle.scaler.transform(X)
+    with stage('predict'):
+        return bundle.engine.predict_with_proba(X)
+
+def load_fertility():
+    """Load the fertility model, scaler and feature list"""
+    sources = ['models/fertility_model.pkl', 'models/fertility_scaler.pkl', 'models/fertility_features.pkl']
+    
+    # One memory-mapped file instead of the pickles
+    bundle = load_bundle('models/fertility.bundle', sources + ['models/fertility_label_encoder.pkl'])
+    if bundle:
+        return bundle
+    
+    encoder = None
+    try:
+        encoder = joblib.load('models/fertility_label_encoder.pkl')
     except:
-        fertility_encoder = None
-    print("✅ Fertility model loaded")
-except Exception as e:
-    print(f"❌ Fertility model error: {e}")
-    fertility_model = None
-
-# Irrigation model
-# Irrigation model - loaded from irrigation_assets/ (committed directly to repo)
-try:
-    import pickle
-
-    # Try irrigation_assets/ first (committed to repo, always reliable)
-    irrigation_paths = [
-        ('irrigation_assets/irrigation_model.pkl',
-         'irrigation_assets/irrigation_scaler.pkl',
-         'irrigation_assets/irrigation_features.pkl'),
-        ('models/irrigation_model.pkl',
-         'models/irrigation_scaler.pkl',
-         'models/irrigation_features.pkl'),
-    ]
+        pass
+    
+    fused = load_fused('models/fertility_fused.pkl', sources)
+    if fused:
+        return SimpleNamespace(model=None, scaler=None, features=fused['features'],
+                               encoder=encoder, engine=fused['engine'], fused=True)
+    
+    with phase('unpickle fertility pickles'):
+        bundle = SimpleNamespace(
+            model=joblib.load('models/fertility_model.pkl'),
+            scaler=joblib.load('models/fertility_scaler.pkl'),
+            features=joblib.load('models/fertility_features.pkl'),
+            encoder=encoder,
+            fused=False
+        )
+    # The pickle carries the training n_jobs (-1: every core)
+    set_n_jobs(bundle.model, THREAD_BUDGET['n_jobs'])
+    bundle.engine = compile_tree_model(bundle.model, 'Fertility')
+    return bundle
 
-    irrigation_model = None
-    for model_path, scaler_path, features_path in irrigation_paths:
+IRRIGATION_PATHS = [
+    ('irrigation_assets/irrigation_model.pkl',
+     'irrigation_assets/irrigation_scaler.pkl',
+     'irrigation_assets/irrigation_features.pkl'),
+    ('models/irrigation_model.pkl',
+     'models/irrigation_scaler.pkl',
+     'models/irrigation_features.pkl'),
+]
+
+def load_irrigation():
+    """Load the irrigation model - irrigation_assets/ (committed to repo) first"""
+    for model_path, scaler_path, features_path in IRRIGATION_PATHS:
+        fused_path = os.path.join(os.path.dirname(model_path), 'irrigation_fused.pkl')
+        bundle = load_bundle(os.path.join(os.path.dirname(model_path), 'irrigation.bundle'),
+                             [model_path, scaler_path, features_path])
+        if bundle:
+            return bundle
         try:
-            with open(model_path, 'rb') as f:
-                irrigation_model = pickle.load(f)
-            irrigation_scaler = joblib.load(scaler_path)
-            irrigation_features = joblib.load(features_path)
+            fused = load_fused(fused_path, [model_path, scaler_path, features_path])
+            if fused:
+                return SimpleNamespace(model=None, scaler=None, features=fused['features'],
+                                       engine=fused['engine'], fused=True)
+            
+            with phase('unpickle irrigation pickles'):
+                with open(model_path, 'rb') as f:
+                    model = pickle.load(f)
+                set_n_jobs(model, THREAD_BUDGET['n_jobs'])
+                scaler = joblib.load(scaler_path)
+                features = joblib.load(features_path)
+            bundle = SimpleNamespace(
+                model=model,
+                scaler=scaler,
+                features=features,
+                engine=compile_tree_model(model, 'Irrigation'),
+                fused=False
+            )
             print(f"✅ Irrigation model loaded from {model_path}")
-            break
+            return bundle
         except Exception as inner_e:
             print(f"  ⚠️  Failed from {model_path}: {inner_e}")
-            irrigation_model = None
             continue
 
-    if irrigation_model is None:
-        raise Exception("All irrigation model paths failed")
-
-except Exception as e:
-    print(f"⚠️  Irrigation model error: {e}")
-    import traceback
-    traceback.print_exc()
-    irrigation_model = None
-
-# Soil Image model
-soil_image_model = None
-soil_class_labels = None
-soil_metadata = None
-IMG_SIZE = 224
-
-try:
-    print("🔄 Loading soil image model...")
-    
-    model_paths = [
-        'models/soil_image_model.keras',
-        'models/soil_image_best.keras',
-        'models/soil_image_model.h5',
-        'models/soil_image_best.h5'
-    ]
-    
-    model_loaded = False
-    for model_path in model_paths:
-        if os.path.exists(model_path):
-            try:
-                print(f"  Trying to load: {model_path}")
-                soil_image_model = keras.models.load_model(model_path, compile=False)
-                print(f"  ✅ Loaded: {model_path}")
-                model_loaded = True
-                break
-            except Exception as e:
-                print(f"  ❌ Failed to load {model_path}: {e}")
-                continue
+    raise Exception("All irrigation model paths failed")
+
+SOIL_TFLITE_PATHS = [SOIL_TFLITE_MODEL] if SOIL_TFLITE_MODEL else [
+    'models/soil_image_model_int8.tflite',
+    'models/soil_image_model_dynamic.tflite'
+]
+# The serving export (export_serving_model.py) takes raw uint8 pixels
+SOIL_SERVING_PATH = 'models/soil_image_serving.keras'
+SOIL_SERVING_INFO = 'models/soil_image_serving.json'
+SOIL_KERAS_PATHS = [
+    SOIL_SERVING_PATH,
+    'models/soil_image_model.keras',
+    'models/soil_image_best.keras',
+    'models/soil_image_model.h5',
+    'models/soil_image_best.h5'
+]
+
+def serving_export_current():
+    """Whether the serving export was built from the soil model it would replace
     
-    if not model_loaded:
-        raise FileNotFoundError("No soil image model found in any format")
+    The source fingerprint recorded by export_serving_model.py must match
+    the first soil model present. With no soil model present (a deploy
+    shipping the export alone) the export is used as it is.
+    """
+    source = next((p for p in SOIL_KERAS_PATHS[1:] if os.path.exists(p)), None)
+    if source is None:
+        return True
+    try:
+        with open(SOIL_SERVING_INFO) as f:
+            recorded = json.load(f).get('sources', {})
+    except (OSError, ValueError):
+        return False
+    return recorded.get(source) == file_version(source)
+
+def load_soil_image():
+    """Load the soil image model, labels and metadata, and start its batcher"""
+    print(f"🔄 Loading soil image model (backend: {SOIL_MODEL_BACKEND})...")
     
     # Load class labels
     if os.path.exists('models/soil_class_labels.json'):
         with open('models/soil_class_labels.json', 'r') as f:
-            soil_class_labels = json.load(f)
-        print(f"  ✅ Loaded class labels: {list(soil_class_labels.values())}")
+            class_labels = json.load(f)
+        print(f"  ✅ Loaded class labels: {list(class_labels.values())}")
     else:
-        soil_class_labels = {
+        class_labels = {
             "0": "Alluvial Soil",
             "1": "Black Soil",
             "2": "Red Soil"
@@ -145,35 +389,179 @@ try:
         print("  ⚠️  Using default class labels")
     
     # Load metadata
+    metadata = None
+    img_size = 224
     if os.path.exists('models/soil_model_metadata.json'):
         with open('models/soil_model_metadata.json', 'r') as f:
-            soil_metadata = json.load(f)
-        IMG_SIZE = soil_metadata.get('img_size', 224)
-        print(f"  ✅ Loaded metadata (IMG_SIZE: {IMG_SIZE})")
+            metadata = json.load(f)
+        img_size = metadata.get('img_size', 224)
+        print(f"  ✅ Loaded metadata (IMG_SIZE: {img_size})")
     else:
         print("  ⚠️  Using default metadata")
     
-    print("✅ Soil image model loaded successfully")
+    input_dtype = np.float32
     
-    # Warmup prediction
-    try:
-        dummy = np.zeros((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32)
-        soil_image_model.predict(dummy, verbose=0)
-        print("✅ Warmup prediction complete")
-    except Exception as w:
-        print(f"⚠️  Warmup failed (non-critical): {w}")
+    if SOIL_MODEL_BACKEND == 'tflite':
+        # Quantized flatbuffer from export_tflite.py
+        model_paths = SOIL_TFLITE_PATHS
+        model_path = next((p for p in model_paths if os.path.exists(p)), None)
+        if not model_path:
+            raise FileNotFoundError(f"No TFLite soil model found in {model_paths}")
+        
+        print(f"  Trying to load: {model_path} ({TFLITE_NUM_THREADS} threads)")
+        # Single images and full micro-batches never reallocate (TFLITE_BATCH_BUCKETS)
+        model = TFLitePredictor(
+            model_path, img_size, num_threads=TFLITE_NUM_THREADS, batch_sizes=(),
+            bucket_sizes=TFLITE_BATCH_BUCKETS
+        )
+        predictor = model
+        print(f"  ✅ Loaded: {model_path}")
+    else:
+        import tensorflow as tf
+        from tensorflow import keras
+        
+        # Too late on a hot reload (the runtime is running); the pools are kept
+        if configure_tensorflow(tf, THREAD_BUDGET):
+            print(f"  ✅ TensorFlow threads: {THREAD_BUDGET['tf_intra_op']} intra-op / "
+                  f"{THREAD_BUDGET['tf_inter_op']} inter-op")
+        
+        model = None
+        for model_path in SOIL_KERAS_PATHS:
+            if model_path == SOIL_SERVING_PATH and os.path.exists(model_path) and \
+                    not serving_export_current():
+                print(f"  ⚠️  {model_path} is stale (soil model changed), ignoring it. "
+                      f"Run: python export_serving_model.py")
+                continue
+            if os.path.exists(model_path):
+                try:
+                    print(f"  Trying to load: {model_path}")
+                    with phase(f'keras load_model {model_path}'):
+                        model = keras.models.load_model(model_path, compile=False)
+                    print(f"  ✅ Loaded: {model_path}")
+                    break
+                except Exception as e:
+                    print(f"  ❌ Failed to load {model_path}: {e}")
+                    continue
+        
+        if model is None:
+            raise FileNotFoundError("No soil image model found in any format")
+        
+        # Feed the input the model declares: the serving export rescales in its
+        # graph and takes uint8 (at the trained size; PIL does the resizing)
+        if np.dtype(model.inputs[0].dtype) == np.uint8:
+            model = without_graph_resize(model)
+        model_input = model.inputs[0]
+        if np.dtype(model_input.dtype) == np.uint8:
+            input_dtype = np.uint8
+            img_size = model_input.shape[1] or img_size
+            print(f"  ✅ Serving model: uint8 {img_size}x{img_size} input, rescaled in the graph")
+        
+        # Trace the model once into a direct-call function (this also warms it up)
+        try:
+            predictor = CompiledPredictor(model, img_size, batch_sizes=(), dtype=input_dtype)
+            print("✅ Compiled inference path ready")
+        except Exception as w:
+            print(f"⚠️  Compiled path failed, using Model.predict: {w}")
+            predictor = keras_predictor(model)
 
-    print("✅ Soil image model loaded successfully")
+    def timed_predictor(batch):
+        BATCH_SIZE.labels(model='soil_image').observe(len(batch))
+        with BATCH_SECONDS.time(model='soil_image'):
+            return predictor(batch)
+    
+    # Single uploads are preprocessed into an item buffer, then stacked into
+    # a batch buffer by the scheduler; multi-image requests use batch buffers
+    item_shape = (img_size, img_size, 3)
+    item_pool = TensorPool('soil_image_item', item_shape, batch_size=1,
+                           capacity=ADMISSION['soil_image'].max_in_flight if SOIL_BUFFER_POOL_BATCHES else 0,
+                           dtype=input_dtype)
+    batch_pool = TensorPool('soil_image_batch', item_shape, batch_size=SOIL_BATCH_MAX_SIZE,
+                            capacity=SOIL_BUFFER_POOL_BATCHES, dtype=input_dtype)
     
-except Exception as e:
-    print(f"❌ Soil image model error: {e}")
-    import traceback
-    traceback.print_exc()
+    scheduler = InferenceScheduler(
+        timed_predictor,
+        max_batch_size=SOIL_BATCH_MAX_SIZE,
+        max_wait_ms=SOIL_BATCH_MAX_WAIT_MS,
+        name='soil_image',
+        input_pool=batch_pool
+    )
+    print(f"✅ Soil image batching: max {SOIL_BATCH_MAX_SIZE} images / {SOIL_BATCH_MAX_WAIT_MS}ms")
+    
+    return SimpleNamespace(
+        model=model,
+        predictor=predictor,
+        predict_batch=timed_predictor,
+        scheduler=scheduler,
+        item_pool=item_pool,
+        batch_pool=batch_pool,
+        class_labels=class_labels,
+        metadata=metadata,
+        img_size=img_size,
+        input_dtype=input_dtype,
+        # Every file the payload depends on: a labels- or metadata-only
+        # reload is a new version too (and discards the cached results)
+        version=f"{SOIL_MODEL_BACKEND}-" + artifacts_version([
+            'models/soil_class_labels.json', 'models/soil_model_metadata.json', model_path])
+    )
+
+def warmup_soil_image(soil):
+    """Run the warmup plan's batch sizes through the soil model"""
+    timings = warm_image_model(soil, SOIL_WARMUP_BATCH_SIZES)
+    print(f"✅ soil_image warmed up: batch sizes {', '.join(timings['batch_sizes'])} ({timings['seconds']:.1f}s)")
+    return timings
+
+def warmup_tabular(name, score_fn):
+    """Warmup for a tabular model: representative rows through its scoring function"""
+    def warmup(bundle):
+        timings = warm_tabular_model(bundle, score_fn, TABULAR_WARMUP_ROWS)
+        print(f"✅ {name} warmed up: {', '.join(timings['rows'])} rows ({timings['seconds']:.2f}s)")
+        return timings
+    return warmup
+
+def retire_soil_image(old):
+    """Stop a replaced soil model's batcher once its requests have finished"""
+    old.scheduler.shutdown()
+    # Its cached results can't be hit any more (unless the reload changed nothing)
+    if old.version != soil_image.version:
+        soil_result_cache.discard_version(old.version)
+
+# Artifacts are watched for hot reload and hashed into each model's version.
+# Batch shapes are warmed by the warmup functions, not in the predictors
+# (the scoring functions are defined below, hence the lambdas)
+fertility = LazyModel('fertility', load_fertility, artifacts=[
+    'models/fertility_model.pkl', 'models/fertility_scaler.pkl', 'models/fertility_features.pkl',
+    'models/fertility_label_encoder.pkl', 'models/fertility_fused.pkl', 'models/fertility.bundle'
+], warmup=warmup_tabular('fertility', lambda b, X: score_fertility(b, X)) if MODEL_WARMUP else None)
+irrigation = LazyModel('irrigation', load_irrigation, artifacts=[
+    path for paths in IRRIGATION_PATHS for path in paths + (
+        os.path.join(os.path.dirname(paths[0]), 'irrigation_fused.pkl'),
+        os.path.join(os.path.dirname(paths[0]), 'irrigation.bundle'))
+], warmup=warmup_tabular('irrigation', lambda b, X: score_irrigation(b, X)) if MODEL_WARMUP else None)
+soil_image = LazyModel('soil_image', load_soil_image, artifacts=[
+    'models/soil_class_labels.json', 'models/soil_model_metadata.json'
+] + (SOIL_TFLITE_PATHS if SOIL_MODEL_BACKEND == 'tflite' else SOIL_KERAS_PATHS + [SOIL_SERVING_INFO]),
+    on_retire=retire_soil_image, warmup=warmup_soil_image if MODEL_WARMUP else None)
+MODELS = {m.name: m for m in (fertility, irrigation, soil_image)}
 
-print("="*70)
-print("Flask ML API Ready!")
-print(f"Models loaded: Fertility={fertility_model is not None}, Irrigation={irrigation_model is not None}, SoilImage={soil_image_model is not None}")
-print("="*70)
+# Hot reload: poll artifacts every MODEL_WATCH_SECONDS (0 disables), and/or
+# POST /admin/reload with "Authorization: Bearer $MODEL_RELOAD_TOKEN"
+# (one worker; add all_workers=1 to have every worker's watcher follow)
+MODEL_WATCH_SECONDS = float(os.environ.get('MODEL_WATCH_SECONDS', 10))
+MODEL_RELOAD_TOKEN = os.environ.get('MODEL_RELOAD_TOKEN')
+model_watcher = ModelWatcher(MODELS.values(), interval=MODEL_WATCH_SECONDS)
+
+if MODEL_PRELOAD == 'all':
+    preload = list(MODELS)
+elif MODEL_PRELOAD == 'none':
+    preload = []
+else:
+    preload = [name.strip() for name in MODEL_PRELOAD.split(',') if name.strip() in MODELS]
+
+# Plain NumPy / sklearn bundles: safe to load in the gunicorn master and
+# share copy-on-write with the workers. TensorFlow's runtime (thread pools,
+# allocators) does not survive a fork, so the soil image model is always
+# loaded inside each worker.
+FORK_SAFE_MODELS = ('fertility', 'irrigation')
 
 # ==================== HELPER FUNCTIONS ====================
 def allowed_file(filename):
@@ -242,6 +630,295 @@ def get_soil_characteristics(soil_type):
         'recommendations': ['Get soil tested']
     }))
 
+def extract_features(record, feature_names):
+    """Return a record's feature values in model order, or raise ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('Record must be a JSON object')
+    
+    values = []
+    for feature_name in feature_names:
+        if feature_name not in record:
+            raise ValueError(f'Missing {feature_name}')
+        try:
+            value = float(record[feature_name])
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for {feature_name}: {record[feature_name]!r}')
+        # float() accepts "nan" / "inf", which the models can't score
+        if not math.isfinite(value):
+            raise ValueError(f'Invalid value for {feature_name}: {record[feature_name]!r} (must be finite)')
+        values.append(value)
+    return values
+
+def get_batch_records(data):
+    """Accept either a bare JSON array or {"records": [...]}"""
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        return None
+    return data
+
+def batch_summary(results):
+    """Wrap per-row batch results with success/failure counts"""
+    succeeded = sum(1 for r in results if r['success'])
+    return {
+        'success': True,
+        'count': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    }
+
+def fertility_result(prediction, probabilities):
+    """Build the fertility response payload for one prediction"""
+    fertility_mapping = {0: 'Low', 1: 'Medium', 2: 'High'}
+    pred_label = fertility_mapping.get(int(prediction), 'Unknown')
+    confidence = float(max(probabilities))
+    
+    return {
+        'success': True,
+        'prediction': pred_label,
+        'confidence': confidence,
+        'confidence_percentage': f"{confidence*100:.1f}%",
+        'probabilities': {
+            'Low': float(probabilities[0]),
+            'Medium': float(probabilities[1]),
+            'High': float(probabilities[2])
+        }
+    }
+
+# Urgency buckets by average moisture: <30 High, <50 Medium, else Low
+IRRIGATION_URGENCY = ['High', 'Medium', 'Low']
+IRRIGATION_COLORS = ['#dc3545', '#ffc107', '#28a745']
+
+def irrigation_urgency_level(avg_moisture):
+    """Index into IRRIGATION_URGENCY; works on scalars and arrays"""
+    return np.digitize(avg_moisture, [30, 50])
+
+def irrigation_result(prediction, probability, avg_moisture, level):
+    """Build the irrigation response payload for one prediction"""
+    confidence = float(max(probability))
+    
+    return {
+        'success': True,
+        'irrigationNeeded': bool(prediction == 1),
+        'confidence': confidence,
+        'confidence_percentage': f"{confidence*100:.1f}%",
+        'average_moisture': float(avg_moisture),
+        'recommendation': {
+            'urgency': IRRIGATION_URGENCY[level],
+            'color': IRRIGATION_COLORS[level]
+        }
+    }
+
+def score_fertility(bundle, X):
+    """Fertility payloads for a matrix of raw feature rows"""
+    predictions, probabilities = predict_rows(bundle, X)
+    return [fertility_result(p, proba) for p, proba in zip(predictions, probabilities)]
+
+def score_irrigation(bundle, X):
+    """Irrigation payloads for a matrix of raw moisture rows"""
+    predictions, probabilities = predict_rows(bundle, X)
+    avg_moisture = X.mean(axis=1)
+    levels = irrigation_urgency_level(avg_moisture)
+    return [
+        irrigation_result(p, proba, avg, level)
+        for p, proba, avg, level in zip(predictions, probabilities, avg_moisture, levels)
+    ]
+
+def stream_csv_scores(lazy_model, score_fn):
+    """Score a CSV upload chunk by chunk, streaming NDJSON results back"""
+    
+    # Uploads here can be far larger than the normal request limit
+    request.max_content_length = STREAM_MAX_CONTENT_LENGTH
+    
+    bundle = lazy_model.get()
+    if bundle is None:
+        return jsonify({'error': f'{lazy_model.name.capitalize()} model not loaded'}), 503
+    
+    # Read the raw body incrementally; multipart would be parsed (and
+    # buffered) in full before the first row could be scored
+    if request.mimetype == 'multipart/form-data':
+        return jsonify({'error': 'Send the CSV as the raw request body (Content-Type: text/csv)'}), 400
+    
+    reader = csv.reader(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+    try:
+        header = [name.strip() for name in next(reader, [])]
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Could not read CSV: {e}'}), 400
+    missing = [name for name in bundle.features if name not in header]
+    if missing:
+        return jsonify({'error': f'CSV is missing columns: {missing}'}), 400
+    columns = [header.index(name) for name in bundle.features]
+    
+    def score_chunk(entries, rows):
+        """(NDJSON lines for one chunk in input order, rows scored)"""
+        try:
+            results = iter(score_fn(bundle, np.array(rows, dtype=np.float64)) if rows else [])
+            scored = len(rows)
+        except Exception as e:
+            # The 200 is already sent: report the chunk's rows as failed and go on
+            logger.exception("Scoring a CSV chunk failed")
+            failure = {'success': False, 'error': f'Scoring failed: {e}'}
+            results = iter([failure] * len(rows))
+            scored = 0
+        with stage('serialize'):
+            lines = [
+                json.dumps({'row': row_number, **(error or next(results))})
+                for row_number, error in entries
+            ]
+            return '\n'.join(lines) + '\n', scored
+    
+    extract_seconds = STAGE_SECONDS.labels(endpoint=request.endpoint, stage='extract')
+    
+    def generate():
+        entries, rows = [], []
+        scored = failed = 0
+        # Per chunk: reading the upload and parsing its rows
+        chunk_start = time.perf_counter()
+        
+        # Row numbers count data rows from 1 (the header is not a row)
+        row_number, read_error = 0, None
+        try:
+            for row_number, record in enumerate(reader, start=1):
+                if not record:
+                    continue
+                try:
+                    values = [float(record[c]) for c in columns]
+                    # float() accepts "nan" / "inf", which the models can't score
+                    bad = [bundle.features[i] for i, v in enumerate(values) if not math.isfinite(v)]
+                    if bad:
+                        raise ValueError(f'non-finite value for {", ".join(bad)}')
+                    rows.append(values)
+                    entries.append((row_number, None))
+                except (IndexError, ValueError) as e:
+                    entries.append((row_number, {'success': False, 'error': f'Invalid row: {e}'}))
+                    failed += 1
+            
+                if len(entries) >= STREAM_CHUNK_ROWS:
+                    extract_seconds.observe(time.perf_counter() - chunk_start)
+                    lines, chunk_scored = score_chunk(entries, rows)
+                    yield lines
+                    scored += chunk_scored
+                    failed += len(rows) - chunk_scored
+                    entries, rows = [], []
+                    chunk_start = time.perf_counter()
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The 200 is already sent: score what was read, then say why it stopped
+            read_error = {'error': f'Could not read CSV after row {row_number}: {e}'}
+        
+        if entries:
+            extract_seconds.observe(time.perf_counter() - chunk_start)
+            lines, chunk_scored = score_chunk(entries, rows)
+            yield lines
+            scored += chunk_scored
+            failed += len(rows) - chunk_scored
+        
+        if read_error:
+            yield json.dumps(read_error) + '\n'
+        yield json.dumps({'summary': {'scored': scored, 'failed': failed}}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def soil_prediction(probs, class_labels):
+    """Predicted soil type, confidence and top 3 for one probability vector"""
+    predicted_idx = np.argmax(probs)
+    confidence = float(probs[predicted_idx])
+    
+    # Get top 3 predictions
+    top_3_idx = np.argsort(probs)[-3:][::-1]
+    top_predictions = []
+    for idx in top_3_idx:
+        top_predictions.append({
+            'soil_type': class_labels[str(idx)],
+            'confidence': float(probs[idx]),
+            'confidence_percentage': f"{probs[idx]*100:.1f}%"
+        })
+    
+    return {
+        'prediction': class_labels[str(predicted_idx)],
+        'confidence': confidence,
+        'confidence_percentage': f"{confidence*100:.1f}%",
+        'top_predictions': top_predictions
+    }
+
+# ==================== REQUEST METRICS / LOGGING ====================
+@app.before_request
+def start_request_metrics():
+    # Reuse the caller's request id (e.g. from a proxy) so logs can be joined
+    g.request_id = request.headers.get('X-Request-ID', '')[:128] or uuid.uuid4().hex
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.metrics_start = time.perf_counter()
+    IN_FLIGHT.labels(endpoint=g.metrics_endpoint).inc()
+
+@app.after_request
+def count_request(response):
+    endpoint = g.get('metrics_endpoint', request.endpoint or 'unmatched')
+    REQUESTS.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+    g.status = response.status_code
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    # Runs after a streamed response body has been fully sent
+    if 'metrics_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.pop('metrics_start')
+    IN_FLIGHT.labels(endpoint=g.metrics_endpoint).dec()
+    REQUEST_SECONDS.labels(endpoint=g.metrics_endpoint).observe(elapsed)
+    logger.info("%s %s %s", request.method, request.path, g.get('status', 500), extra={
+        'endpoint': g.metrics_endpoint,
+        'status': g.get('status', 500),
+        'duration_ms': round(elapsed * 1000, 2)
+    })
+
+@app.teardown_request
+def release_models(exc):
+    # Bundles from use_model(); a replaced one is retired by its last release
+    for lazy_model, bundle in g.pop('models_in_use', ()):
+        lazy_model.release(bundle)
+
+def use_model(lazy_model):
+    """The model's bundle, held (not retired by a reload) until the request ends"""
+    bundle = lazy_model.acquire()
+    if bundle is not None:
+        g.setdefault('models_in_use', []).append((lazy_model, bundle))
+    return bundle
+
+@app.teardown_request
+def release_admission(exc):
+    # After the response (including a streamed body) is done
+    admitted = g.pop('admission', None)
+    if admitted:
+        controller, acquired_at = admitted
+        controller.release(acquired_at)
+
+def admit(budget):
+    """Route decorator: run the view only if the budget has room, else 429/503"""
+    controller = ADMISSION[budget]
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return view(*args, **kwargs)
+            try:
+                g.admission = (controller, controller.acquire())
+            except Rejected as e:
+                logger.warning("Rejected by %s admission control: %s", e.budget, e.reason)
+                response = jsonify({
+                    'error': 'Server busy, please retry later',
+                    'reason': e.reason,
+                    'retry_after': e.retry_after
+                })
+                response.status_code = e.status
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # ==================== API ENDPOINTS ====================
 
 @app.route('/', methods=['GET'])
@@ -254,8 +931,14 @@ def root():
         'endpoints': {
             'health': '/health',
             'fertility': '/predict/fertility',
+            'fertility_batch': '/predict/fertility/batch',
             'irrigation': '/predict/irrigation',
-            'soil_image': '/predict/soil-image'
+            'irrigation_batch': '/predict/irrigation/batch',
+            'fertility_stream': '/predict/fertility/stream',
+            'irrigation_stream': '/predict/irrigation/stream',
+            'soil_image': '/predict/soil-image',
+            'soil_image_batch': '/predict/soil-image/batch',
+            'metrics': '/metrics'
         }
     })
 
@@ -265,14 +948,91 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'message': 'Flask ML API is running',
-        'models': {
-            'fertility': fertility_model is not None,
-            'irrigation': irrigation_model is not None,
-            'soil_image': soil_image_model is not None
-        }
+        'models': {name: model.ready for name, model in MODELS.items()},
+        'model_versions': {name: model.version for name, model in MODELS.items()},
+        'model_states': {name: model.status() for name, model in MODELS.items()},
+        'soil_image_backend': SOIL_MODEL_BACKEND,
+        'soil_image_batching': soil_image.get().scheduler.stats() if soil_image.ready else None,
+        'soil_image_cache': soil_result_cache.stats(),
+        'soil_image_buffers': {
+            'item': soil_image.get().item_pool.stats(),
+            'batch': soil_image.get().batch_pool.stats()
+        } if soil_image.ready else None,
+        'admission': {name: controller.stats() for name, controller in ADMISSION.items()},
+        'worker': {'pid': os.getpid(), 'memory': process_memory(), 'threads': THREAD_BUDGET}
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for this process"""
+    MODEL_INFO.clear()
+    for name, model in MODELS.items():
+        for state in MODEL_STATES:
+            MODEL_STATE.labels(model=name, state=state).set(model.state == state)
+        if model.load_seconds is not None:
+            MODEL_LOAD_SECONDS.labels(model=name).set(model.load_seconds)
+        if model.version:
+            MODEL_INFO.labels(model=name, version=model.version).set(1)
+        MODEL_RELOADS.labels(model=name).set(model.reloads)
+    if soil_image.ready:
+        QUEUE_DEPTH.labels(model='soil_image').set(soil_image.get().scheduler.stats()['queue_depth'])
+    LOG_DROPPED.set(dropped_records())
+    for kind, value in (process_memory() or {}).items():
+        PROCESS_MEMORY.labels(kind=kind).set(value)
+    
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_models():
+    """Reload models from disk without a restart
+    
+    The reload runs in the worker that serves this request. With
+    all_workers=1 the models' artifact files are also touched, so every
+    other worker's ModelWatcher reloads them within two MODEL_WATCH_SECONDS
+    polls (gunicorn workers don't share memory).
+    """
+    if not MODEL_RELOAD_TOKEN:
+        return jsonify({'error': 'Reload endpoint disabled (set MODEL_RELOAD_TOKEN)'}), 404
+    
+    auth = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(auth.encode(), f'Bearer {MODEL_RELOAD_TOKEN}'.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    names = data.get('models') or request.args.getlist('model') or list(MODELS)
+    unknown = [name for name in names if name not in MODELS]
+    if unknown:
+        return jsonify({'error': f'Unknown models: {unknown}'}), 400
+    
+    # wait=1 blocks until the new versions are swapped in
+    wait = request.args.get('wait', '0') == '1' or data.get('wait') is True
+    all_workers = request.args.get('all_workers', '0') == '1' or data.get('all_workers') is True
+    if all_workers:
+        # Before reloading here, so this worker's watcher sees no further change
+        for name in names:
+            for path in MODELS[name].artifacts:
+                if os.path.exists(path):
+                    os.utime(path)
+    started = {name: MODELS[name].reload(wait=wait) for name in names}
+    
+    if all_workers and MODEL_WATCH_SECONDS > 0:
+        other_workers = f'artifacts touched: other workers reload within {2 * MODEL_WATCH_SECONDS:g}s'
+    elif all_workers:
+        other_workers = 'artifacts touched, but MODEL_WATCH_SECONDS=0: other workers keep their version'
+    else:
+        other_workers = 'not reloaded (this worker only; pass all_workers=1)'
+    
+    return jsonify({
+        'success': True,
+        'reloading' if not wait else 'reloaded': [name for name, ok in started.items() if ok],
+        'skipped': [name for name, ok in started.items() if not ok],
+        'model_states': {name: MODELS[name].status() for name in names},
+        'worker_pid': os.getpid(),
+        'other_workers': other_workers
+    }), 200 if wait else 202
+
 @app.route('/predict/fertility', methods=['POST', 'OPTIONS'])
+@admit('fertility')
 def predict_fertility():
     """Predict soil fertility"""
     
@@ -280,7 +1040,8 @@ def predict_fertility():
     if request.method == 'OPTIONS':
         return '', 204
     
-    if not fertility_model:
+    bundle = fertility.get()
+    if bundle is None:
         return jsonify({'error': 'Fertility model not loaded'}), 503
     
     try:
@@ -288,40 +1049,79 @@ def predict_fertility():
         if not data:
             return jsonify({'error': 'No data received'}), 400
         
-        features = []
-        for feature_name in fertility_features:
-            if feature_name not in data:
-                return jsonify({'error': f'Missing {feature_name}'}), 400
-            features.append(float(data[feature_name]))
+        with stage('extract'):
+            try:
+                features = extract_features(data, bundle.features)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         X = np.array([features])
-        X_scaled = fertility_scaler.transform(X)
-        prediction = fertility_model.predict(X_scaled)[0]
-        probabilities = fertility_model.predict_proba(X_scaled)[0]
+        predictions, probabilities = predict_rows(bundle, X)
+        prediction, probabilities = predictions[0], probabilities[0]
         
-        fertility_mapping = {0: 'Low', 1: 'Medium', 2: 'High'}
-        pred_label = fertility_mapping.get(int(prediction), 'Unknown')
-        confidence = float(max(probabilities))
+        with stage('serialize'):
+            return jsonify(fertility_result(prediction, probabilities))
         
-        return jsonify({
-            'success': True,
-            'prediction': pred_label,
-            'confidence': confidence,
-            'confidence_percentage': f"{confidence*100:.1f}%",
-            'probabilities': {
-                'Low': float(probabilities[0]),
-                'Medium': float(probabilities[1]),
-                'High': float(probabilities[2])
-            }
-        })
+    except Exception as e:
+        logger.exception("Fertility prediction failed")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/fertility/batch', methods=['POST', 'OPTIONS'])
+@admit('fertility')
+def predict_fertility_batch():
+    """Predict soil fertility for many soil-test records in one call"""
+    
+    # Handle OPTIONS for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    bundle = fertility.get()
+    if bundle is None:
+        return jsonify({'error': 'Fertility model not loaded'}), 503
+    
+    try:
+        records = get_batch_records(request.json)
+        if records is None:
+            return jsonify({'error': 'Expected a JSON array of records'}), 400
+        
+        # Validate every row first so one bad row doesn't fail the batch
+        results = [None] * len(records)
+        valid_rows = []
+        valid_idx = []
+        with stage('extract'):
+            for i, record in enumerate(records):
+                try:
+                    valid_rows.append(extract_features(record, bundle.features))
+                    valid_idx.append(i)
+                except ValueError as e:
+                    results[i] = {'index': i, 'success': False, 'error': str(e)}
+        
+        # One scoring pass for all valid rows
+        if valid_rows:
+            X = np.array(valid_rows, dtype=np.float64)
+            for i, result in zip(valid_idx, score_fertility(bundle, X)):
+                results[i] = {'index': i, **result}
+        
+        with stage('serialize'):
+            return jsonify(batch_summary(results))
         
     except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fertility batch prediction failed")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/fertility/stream', methods=['POST', 'OPTIONS'])
+@admit('bulk')
+def predict_fertility_stream():
+    """Bulk-score a soil-card CSV upload, streaming NDJSON results"""
+    
+    # Handle OPTIONS for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    return stream_csv_scores(fertility, score_fertility)
+
 @app.route('/predict/irrigation', methods=['POST', 'OPTIONS'])
+@admit('irrigation')
 def predict_irrigation():
     """Predict irrigation need"""
     
@@ -329,7 +1129,8 @@ def predict_irrigation():
     if request.method == 'OPTIONS':
         return '', 204
     
-    if not irrigation_model:
+    bundle = irrigation.get()
+    if bundle is None:
         return jsonify({'error': 'Irrigation model not loaded'}), 503
     
     try:
@@ -337,40 +1138,81 @@ def predict_irrigation():
         if not data:
             return jsonify({'error': 'No data received'}), 400
         
-        features = []
-        for feature_name in irrigation_features:
-            if feature_name not in data:
-                return jsonify({'error': f'Missing {feature_name}'}), 400
-            features.append(float(data[feature_name]))
+        with stage('extract'):
+            try:
+                features = extract_features(data, bundle.features)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         X = np.array([features])
-        X_scaled = irrigation_scaler.transform(X)
-        prediction = irrigation_model.predict(X_scaled)[0]
-        probability = irrigation_model.predict_proba(X_scaled)[0]
+        predictions, probabilities = predict_rows(bundle, X)
+        prediction, probability = predictions[0], probabilities[0]
         
-        confidence = float(max(probability))
         avg_moisture = float(np.mean(features))
-        irrigation_needed = bool(prediction == 1)
+        level = int(irrigation_urgency_level(avg_moisture))
         
-        return jsonify({
-            'success': True,
-            'irrigationNeeded': irrigation_needed,
-            'confidence': confidence,
-            'confidence_percentage': f"{confidence*100:.1f}%",
-            'average_moisture': avg_moisture,
-            'recommendation': {
-                'urgency': 'High' if avg_moisture < 30 else 'Medium' if avg_moisture < 50 else 'Low',
-                'color': '#dc3545' if avg_moisture < 30 else '#ffc107' if avg_moisture < 50 else '#28a745'
-            }
-        })
+        with stage('serialize'):
+            return jsonify(irrigation_result(prediction, probability, avg_moisture, level))
         
     except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Irrigation prediction failed")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/irrigation/batch', methods=['POST', 'OPTIONS'])
+@admit('irrigation')
+def predict_irrigation_batch():
+    """Predict irrigation need for many fields in one call"""
+    
+    # Handle OPTIONS for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    bundle = irrigation.get()
+    if bundle is None:
+        return jsonify({'error': 'Irrigation model not loaded'}), 503
+    
+    try:
+        records = get_batch_records(request.json)
+        if records is None:
+            return jsonify({'error': 'Expected a JSON array of records'}), 400
+        
+        results = [None] * len(records)
+        valid_rows = []
+        valid_idx = []
+        with stage('extract'):
+            for i, record in enumerate(records):
+                try:
+                    valid_rows.append(extract_features(record, bundle.features))
+                    valid_idx.append(i)
+                except ValueError as e:
+                    results[i] = {'index': i, 'success': False, 'error': str(e)}
+        
+        if valid_rows:
+            # (N, 5) matrix -> one scoring pass for every field
+            X = np.array(valid_rows, dtype=np.float64)
+            for i, result in zip(valid_idx, score_irrigation(bundle, X)):
+                results[i] = {'index': i, **result}
+        
+        with stage('serialize'):
+            return jsonify(batch_summary(results))
+        
+    except Exception as e:
+        logger.exception("Irrigation batch prediction failed")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/irrigation/stream', methods=['POST', 'OPTIONS'])
+@admit('bulk')
+def predict_irrigation_stream():
+    """Bulk-score a moisture-log CSV upload, streaming NDJSON results"""
+    
+    # Handle OPTIONS for CORS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    return stream_csv_scores(irrigation, score_irrigation)
+
 @app.route('/predict/soil-image', methods=['POST', 'OPTIONS'])
+@admit('soil_image')
 def predict_soil_image():
     """Predict soil type from image"""
     
@@ -378,97 +1220,222 @@ def predict_soil_image():
     if request.method == 'OPTIONS':
         return '', 204
     
-    print("\n" + "="*70)
-    print("SOIL IMAGE PREDICTION REQUEST")
-    print("="*70)
+    logger.debug("Soil image prediction request")
     
-    if not soil_image_model:
-        print("❌ Model not loaded")
+    soil = use_model(soil_image)
+    if soil is None:
+        logger.error("Soil image model not loaded")
         return jsonify({'error': 'Soil image model not loaded'}), 503
     
     try:
-        print("📸 Checking for image file...")
-        
         if 'image' not in request.files:
-            print("❌ No image in request")
+            logger.info("Rejected: no image in request")
             return jsonify({'error': 'No image provided'}), 400
         
         file = request.files['image']
         
         if file.filename == '':
-            print("❌ Empty filename")
+            logger.info("Rejected: empty filename")
             return jsonify({'error': 'No file selected'}), 400
         
         if not allowed_file(file.filename):
-            print(f"❌ Invalid file type: {file.filename}")
+            logger.info("Rejected: invalid file type %r", file.filename)
             return jsonify({'error': 'Invalid file type. Use JPG, JPEG, or PNG'}), 400
         
-        print(f"✅ File received: {file.filename}")
+        logger.debug("File received: %s", file.filename)
         
         # Process image
-        print("🔄 Processing image...")
-        img_bytes = file.read()
-        print(f"  Image size: {len(img_bytes)} bytes")
-        
-        img = Image.open(io.BytesIO(img_bytes))
-        print(f"  Original size: {img.size}, Mode: {img.mode}")
-        
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-            print(f"  Converted to RGB")
-        
-        img = img.resize((IMG_SIZE, IMG_SIZE))
-        print(f"  Resized to: {IMG_SIZE}x{IMG_SIZE}")
-        img_array = np.array(img, dtype=np.float32)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array = img_array / 255.0
-        print(f"  Array shape: {img_array.shape}")
-        
-        # Predict
-        print("🔄 Running prediction...")
-        predictions = soil_image_model.predict(img_array, verbose=0)
-        print(f"  Predictions shape: {predictions.shape}")
-        print(f"  Raw predictions: {predictions[0]}")
-        
-        predicted_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_idx])
-        
-        predicted_soil = soil_class_labels[str(predicted_idx)]
-        print(f"  Predicted: {predicted_soil} (confidence: {confidence*100:.1f}%)")
-        
-        # Get top 3 predictions
-        top_3_idx = np.argsort(predictions[0])[-3:][::-1]
-        top_predictions = []
-        for idx in top_3_idx:
-            top_predictions.append({
-                'soil_type': soil_class_labels[str(idx)],
-                'confidence': float(predictions[0][idx]),
-                'confidence_percentage': f"{predictions[0][idx]*100:.1f}%"
-            })
-        
-        characteristics = get_soil_characteristics(predicted_soil)
+        with stage('read'):
+            img_bytes = file.read()
+        logger.debug("Image size: %d bytes", len(img_bytes))
+        
+        # Same bytes + same model -> same answer; skip decode and inference
+        with stage('cache'):
+            cache_key = ResultCache.make_key(img_bytes, soil.version)
+            cached = soil_result_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Cache hit")
+            with stage('serialize'):
+                return jsonify(cached)
+        
+        with soil.item_pool.batch(1) as buffer:
+            try:
+                img_array = preprocess_image(img_bytes, soil.img_size, out=buffer[0], timed=stage)
+            except ImageTooLarge as e:
+                logger.info("Rejected: %s", e)
+                return jsonify({'error': str(e)}), 413
+            logger.debug("Array shape: %s", img_array.shape)
+            
+            # Predict (queued and merged with concurrent requests); the stage
+            # includes the batching wait, flask_api_inference_batch_seconds doesn't
+            with stage('forward'):
+                probs = soil.scheduler.predict(img_array)
+        logger.debug("Raw predictions: %s", probs)
+        
+        with stage('topk'):
+            prediction = soil_prediction(probs, soil.class_labels)
+        logger.debug("Predicted: %s (confidence: %s)", prediction['prediction'],
+                     prediction['confidence_percentage'])
         
         result = {
             'success': True,
-            'prediction': predicted_soil,
-            'confidence': confidence,
-            'confidence_percentage': f"{confidence*100:.1f}%",
-            'top_predictions': top_predictions,
-            'characteristics': characteristics
+            **prediction,
+            'characteristics': get_soil_characteristics(prediction['prediction'])
         }
         
-        print("✅ Prediction successful")
-        print("="*70 + "\n")
+        soil_result_cache.put(cache_key, result)
+        
+        with stage('serialize'):
+            return jsonify(result)
         
-        return jsonify(result)
+    except Exception as e:
+        logger.exception("Soil image prediction failed")
+        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+
+@app.route('/predict/soil-image/batch', methods=['POST', 'OPTIONS'])
+@admit('soil_image')
+def predict_soil_image_batch():
+    """Classify several photos of one plot with a single forward pass"""
+    
+    # Handle OPTIONS request for CORS
+    if request.method == 'OPTIONS':
+        return '', 204
+    
+    # A plot's worth of phone photos is larger than one normal upload
+    request.max_content_length = SOIL_MULTI_MAX_CONTENT_LENGTH
+    
+    soil = use_model(soil_image)
+    if soil is None:
+        logger.error("Soil image model not loaded")
+        return jsonify({'error': 'Soil image model not loaded'}), 503
+    
+    try:
+        files = request.files.getlist('image')
+        if not files:
+            return jsonify({'error': 'No images provided (send one or more "image" parts)'}), 400
+        if len(files) > SOIL_MULTI_MAX_IMAGES:
+            return jsonify({'error': f'Too many images: {len(files)} (max {SOIL_MULTI_MAX_IMAGES})'}), 400
+        
+        # Bad files fail individually, like rows in the tabular batch routes
+        results = [None] * len(files)
+        uploads = []
+        with stage('read'):
+            for i, file in enumerate(files):
+                if file.filename == '' or not allowed_file(file.filename):
+                    results[i] = {'index': i, 'filename': file.filename, 'success': False,
+                                  'error': 'Invalid file type. Use JPG, JPEG, or PNG'}
+                else:
+                    uploads.append((i, file.filename, file.read()))
+        
+        # Each image is decoded straight into its row of a pooled batch tensor
+        with soil.batch_pool.batch(len(uploads)) as batch:
+            def decode(row):
+                try:
+                    preprocess_image(uploads[row][2], soil.img_size, out=batch[row])
+                except Exception as e:
+                    return e
+            
+            with stage('decode'):
+                errors = list(image_decode_pool.map(decode, range(len(uploads))))
+            
+            valid = []
+            for row, ((i, filename, _), error) in enumerate(zip(uploads, errors)):
+                if error is not None:
+                    results[i] = {'index': i, 'filename': filename, 'success': False,
+                                  'error': f'Could not read image: {error}'}
+                else:
+                    # Close the gaps left by failed images, in place
+                    if row != len(valid):
+                        batch[len(valid)] = batch[row]
+                    valid.append((i, filename))
+            
+            # One forward pass for the whole plot
+            if valid:
+                with stage('forward'):
+                    probs = np.asarray(soil.predict_batch(batch[:len(valid)]))
+        
+        plot = None
+        if valid:
+            with stage('topk'):
+                for (i, filename), image_probs in zip(valid, probs):
+                    results[i] = {'index': i, 'filename': filename, 'success': True,
+                                  **soil_prediction(image_probs, soil.class_labels)}
+                
+                # Plot-level answer from the averaged class probabilities
+                mean_probs = probs.mean(axis=0)
+                plot = soil_prediction(mean_probs, soil.class_labels)
+                plot_label = plot['prediction']
+                plot.update({
+                    'images': len(valid),
+                    'probabilities': {soil.class_labels[str(idx)]: float(p) for idx, p in enumerate(mean_probs)},
+                    'agreement': float(np.mean([results[i]['prediction'] == plot_label for i, _ in valid])),
+                    'characteristics': get_soil_characteristics(plot_label)
+                })
+        
+        with stage('serialize'):
+            return jsonify({**batch_summary(results), 'plot': plot})
         
     except Exception as e:
-        print(f"❌ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        print("="*70 + "\n")
+        logger.exception("Soil image batch prediction failed")
         return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
 
+# ==================== APP FACTORY ====================
+def create_app(fork=False):
+    """Start loading the MODEL_PRELOAD models and return the app
+    
+    fork=True is for gunicorn's preload_app (see gunicorn.conf.py): the
+    fork-safe models are loaded now, in the master, and start_worker()
+    loads the rest in each worker after the fork.
+    """
+    if fork:
+        for name in preload:
+            if name in FORK_SAFE_MODELS:
+                MODELS[name].get()
+        deferred = [name for name in preload if name not in FORK_SAFE_MODELS]
+        # (The watcher thread is started per worker, in start_worker)
+        print("="*70)
+        print("Flask ML API Ready!")
+        print(f"Threads per worker: {THREAD_BUDGET['threads']} ({THREAD_BUDGET['cores']} cores / "
+              f"{THREAD_BUDGET['workers']} workers)")
+        print(f"Loaded before fork: {', '.join(n for n in preload if n in FORK_SAFE_MODELS) or 'none'}")
+        print(f"Loading in each worker: {', '.join(deferred) or 'none'} (others load on first use)")
+        print("="*70)
+        if startup_profiler.enabled():
+            # Covers the master only; profile_startup.py profiles everything
+            startup_profiler.finish()
+        return app
+    
+    # Tabular models first so they are ready while TensorFlow is still loading
+    loading = preload_models([MODELS[name] for name in MODELS if name in preload])
+    model_watcher.start()
+    if startup_profiler.enabled():
+        threading.Thread(target=finish_startup_profile, args=(loading,),
+                         name='startup-profile', daemon=True).start()
+    
+    print("="*70)
+    print("Flask ML API Ready!")
+    print(f"Threads: {THREAD_BUDGET['threads']} ({THREAD_BUDGET['cores']} cores / "
+          f"{THREAD_BUDGET['workers']} workers)")
+    print(f"Loading in background: {', '.join(preload) or 'none'} (others load on first use)")
+    print("="*70)
+    return app
+
+def finish_startup_profile(loading):
+    """Report the startup profile once the preloaded models are ready"""
+    if loading:
+        loading.join()
+    startup_profiler.finish()
+
+def start_worker():
+    """In a forked worker: start loading the models the master left out"""
+    preload_models([MODELS[name] for name in MODELS if name in preload and name not in FORK_SAFE_MODELS])
+    model_watcher.start()
+
+# `python app.py` and `gunicorn app:app` start loading on import; wsgi.py
+# sets APP_FACTORY=1 and calls create_app() itself
+if os.environ.get('APP_FACTORY') != '1':
+    create_app()
+
 # ==================== RUN SERVER ====================
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
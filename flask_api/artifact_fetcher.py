@@ -0,0 +1,249 @@
+"""
+Manifest-driven model artifact fetcher
+
+model_manifest.json lists every artifact with its sha256 digest and size.
+fetch_all() downloads them in parallel and:
+
+  - skips files already on disk whose digest matches
+  - resumes a partial download (<path>.part) with an HTTP Range request
+  - verifies size and sha256 before the file is renamed into place, so a
+    worker never sees a half-written pickle
+  - retries a failed or corrupt download from scratch
+
+Sources: with a base URL (MODEL_BASE_URL, e.g. http://10.0.0.5:8080 or
+file:///mnt/artifacts) each artifact is fetched from <base>/<path>;
+otherwise from its own "url", or Google Drive when it has a "drive_id"
+(following Drive's "can't scan this file for viruses" confirmation page
+for large files).
+
+Entries without a sha256 yet are only checked against their "min_size"
+(the old download_models.py limits: 50 bytes for JSON, 1000 for the rest),
+and download_models.py refuses them unless ALLOW_UNVERIFIED_MODELS=1;
+record the digests with 'python download_models.py --update-manifest'.
+
+    manifest = load_manifest()
+    results = fetch_all(manifest, base_url='http://localhost:8080', workers=8)
+"""
+import os
+import re
+import html
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote, urlencode
+
+import requests
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_manifest.json')
+DRIVE_URL = 'https://drive.google.com/uc?export=download&id={id}'
+DRIVE_HOSTS = ('drive.google.com', 'drive.usercontent.google.com')
+CHUNK_SIZE = 1024 * 1024
+
+# Outcomes reported per artifact
+SKIPPED = 'skipped'
+DOWNLOADED = 'downloaded'
+RESUMED = 'resumed'
+FAILED = 'failed'
+
+
+class FetchError(Exception):
+    """Raised when an artifact can't be downloaded and verified"""
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != 1:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')}")
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def update_manifest(manifest, root='.'):
+    """Record size and sha256 of the artifacts present under root; returns paths updated"""
+    updated = []
+    for entry in manifest['artifacts']:
+        path = os.path.join(root, entry['path'])
+        if os.path.exists(path):
+            entry['size'] = os.path.getsize(path)
+            entry['sha256'] = sha256_file(path)
+            updated.append(entry['path'])
+    return updated
+
+
+def artifact_url(entry, base_url=None):
+    if base_url:
+        return f"{base_url.rstrip('/')}/{entry['path'].lstrip('/')}"
+    if entry.get('url'):
+        return entry['url']
+    if entry.get('drive_id'):
+        return DRIVE_URL.format(id=entry['drive_id'])
+    raise FetchError(f"{entry['path']}: no url, drive_id or base URL")
+
+
+def verify(path, entry):
+    """True when the file matches the manifest (size, then sha256 when listed)
+
+    Without a sha256 the file must be larger than the entry's min_size.
+    """
+    if not os.path.exists(path):
+        return False
+    size = os.path.getsize(path)
+    if entry.get('size') is not None and size != entry['size']:
+        return False
+    if entry.get('sha256'):
+        return sha256_file(path) == entry['sha256']
+    return size > entry.get('min_size', 0)
+
+
+def _attributes(tag):
+    return {name: html.unescape(value) for name, value in re.findall(r'([\w-]+)="([^"]*)"', tag)}
+
+
+def drive_confirm_url(url, page, cookies=None):
+    """Download URL behind Drive's large-file warning page, or None if there is none
+
+    Current Drive pages carry a form (action on drive.usercontent.google.com
+    with id, export, confirm and uuid fields); older ones a confirm token,
+    in a download_warning cookie or a confirm= link.
+    """
+    form = re.search(r'<form\b[^>]*\bid="download-form"[^>]*>(.*?)</form>', page, re.S)
+    if form:
+        action = _attributes(form.group(0)[:form.group(0).index('>') + 1]).get('action')
+        fields = {}
+        for tag in re.findall(r'<input\b[^>]*>', form.group(1)):
+            attrs = _attributes(tag)
+            if attrs.get('type') == 'hidden' and 'name' in attrs:
+                fields[attrs['name']] = attrs.get('value', '')
+        if action and fields:
+            return f'{action}?{urlencode(fields)}'
+    for name, value in (cookies or {}).items():
+        if name.startswith('download_warning'):
+            return f'{url}&confirm={value}'
+    token = re.search(r'confirm=([0-9A-Za-z_-]+)', page)
+    if token:
+        return f'{url}&confirm={token.group(1)}'
+    return None
+
+
+def _is_html(response):
+    return 'text/html' in response.headers.get('Content-Type', '')
+
+
+def _open_source(url, offset, timeout):
+    """(stream of chunks, resumed) for url starting at byte offset"""
+    parsed = urlparse(url)
+    if parsed.scheme in ('', 'file'):
+        f = open(unquote(parsed.path) if parsed.scheme else url, 'rb')
+        f.seek(offset)
+
+        def chunks():
+            with f:
+                yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+        return chunks(), offset > 0
+
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    session = requests.Session()
+    response = session.get(url, headers=headers, stream=True, timeout=timeout)
+    if _is_html(response) and parsed.hostname in DRIVE_HOSTS:
+        # Large files come behind a "can't scan for viruses" page: confirm once
+        confirm_url = drive_confirm_url(url, response.text, response.cookies)
+        response.close()
+        if confirm_url:
+            response = session.get(confirm_url, headers=headers, stream=True, timeout=timeout)
+    if response.status_code == 416:
+        # Nothing past offset: the partial file is already complete
+        response.close()
+        return iter(()), True
+    response.raise_for_status()
+    if _is_html(response):
+        # Drive answers with an HTML page (quota, permissions) instead of the file
+        response.close()
+        raise FetchError(f'{url} returned an HTML page, not the artifact')
+    return response.iter_content(CHUNK_SIZE), response.status_code == 206
+
+
+def fetch_artifact(entry, base_url=None, root='.', retries=3, timeout=60):
+    """Download one manifest entry into root; returns SKIPPED, DOWNLOADED or RESUMED"""
+    dest = os.path.join(root, entry['path'])
+    if verify(dest, entry):
+        return SKIPPED
+
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    part = f'{dest}.part'
+    url = artifact_url(entry, base_url)
+    expected_size = entry.get('size')
+    last_error = None
+
+    for attempt in range(retries):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if expected_size is not None and offset > expected_size:
+            os.remove(part)
+            offset = 0
+        try:
+            chunks, resumed = _open_source(url, offset, timeout)
+            # Servers that ignore Range send the whole file again
+            with open(part, 'ab' if resumed else 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except (OSError, requests.RequestException, FetchError) as e:
+            # Keep what arrived; the next attempt resumes from it
+            last_error = e
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status and 400 <= status < 500 and status not in (408, 429):
+                break  # Missing / forbidden: retrying won't help
+            time.sleep(min(2 ** attempt, 10))
+            continue
+
+        if verify(part, entry):
+            os.replace(part, dest)
+            return RESUMED if resumed else DOWNLOADED
+
+        # Corrupt (or a stale partial from another version): start over
+        os.remove(part)
+        last_error = FetchError(f"{entry['path']}: size or sha256 mismatch")
+
+    raise FetchError(f"{entry['path']}: {last_error}")
+
+
+def fetch_all(manifest, base_url=None, workers=4, root='.', only=None, progress=None):
+    """Fetch every artifact (or those in only) in parallel; returns {path: (outcome, detail)}"""
+    entries = [e for e in manifest['artifacts'] if only is None or e['path'] in only]
+    results = {}
+    lock = threading.Lock()
+
+    def run(entry):
+        start = time.perf_counter()
+        try:
+            outcome = fetch_artifact(entry, base_url, root)
+            detail = f'{time.perf_counter() - start:.1f}s'
+        except Exception as e:
+            outcome, detail = FAILED, str(e)
+        with lock:
+            results[entry['path']] = (outcome, detail)
+            if progress:
+                progress(entry['path'], outcome, detail)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='fetch') as pool:
+        list(pool.map(run, entries))
+    return results
+
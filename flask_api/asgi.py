@@ -0,0 +1,232 @@
+"""
+ASGI entry point: the same Flask app, with async request I/O
+
+Run from flask_api directory:
+  uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+Uploads are received on the event loop, so a slow client (e.g. a phone on
+2G sending a soil photo) costs a socket and a buffer, not a thread. Only
+once the whole body has arrived is the request handed to the Flask app,
+which runs in a bounded thread pool where the sklearn / TensorFlow work
+happens. Response bodies are sent back asynchronously as well.
+
+The CSV bulk-scoring routes (/predict/<model>/stream) are the exception:
+their bodies can be far larger than memory should hold, so they are
+passed through chunk by chunk while the upload is still arriving.
+
+Environment:
+  ASGI_WORKER_THREADS  threads running Flask / inference (16), split
+                       between the admission budgets (app.py)
+  ASGI_MAX_PENDING     requests admitted to the pool at once; the rest
+                       wait on the event loop (ASGI_WORKER_THREADS * 4)
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ['APP_FACTORY'] = '1'
+
+# Read by app.py to fit the admission limits into the pool
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 16))
+os.environ.setdefault('REQUEST_THREADS', str(ASGI_WORKER_THREADS))
+
+from app import create_app, STREAM_MAX_CONTENT_LENGTH, SOIL_MULTI_MAX_CONTENT_LENGTH
+from metrics import Gauge
+
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', ASGI_WORKER_THREADS * 4))
+
+ASGI_REQUESTS = Gauge('flask_api_asgi_requests', 'ASGI requests by phase (receiving, queued, running)',
+                      ['phase'])
+
+
+class _ReceiveStream(io.RawIOBase):
+    """Blocking file-like view (for a worker thread) of an ASGI request body"""
+
+    def __init__(self, receive, loop, first=b''):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = first
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        future = asyncio.run_coroutine_threadsafe(self._receive(), self._loop)
+        message = future.result()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError('Client disconnected')
+        self._more = message.get('more_body', False)
+        return message.get('body', b'')
+
+    def readinto(self, b):
+        while not self._buffer and self._more:
+            self._buffer = self._next_chunk()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class ASGIAdapter:
+    """Serve a WSGI (Flask) app over ASGI with async bodies and a thread pool"""
+
+    def __init__(self, wsgi_app, max_threads=ASGI_WORKER_THREADS, max_pending=ASGI_MAX_PENDING):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi-worker')
+        self.max_pending = max_pending
+        self._pending = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _max_body(self, scope):
+        # Same per-route limits the Flask views set on request.max_content_length
+        if scope['path'].endswith('/stream'):
+            return STREAM_MAX_CONTENT_LENGTH
+        if scope['path'].rstrip('/') == '/predict/soil-image/batch':
+            return SOIL_MULTI_MAX_CONTENT_LENGTH
+        return getattr(self.wsgi_app, 'config', {}).get('MAX_CONTENT_LENGTH')
+
+    async def _http(self, scope, receive, send):
+        if self._pending is None:
+            # Created lazily so it belongs to the server's event loop
+            self._pending = asyncio.Semaphore(self.max_pending)
+        loop = asyncio.get_running_loop()
+
+        headers = [(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']]
+        content_length = next((int(v) for k, v in headers if k.lower() == 'content-length' and v.isdigit()), None)
+        max_body = self._max_body(scope)
+        if max_body and content_length and content_length > max_body:
+            await self._send_simple(send, 413, b'Request body too large')
+            return
+
+        if scope['path'].endswith('/stream'):
+            # Stream through: the worker thread pulls chunks as it parses them
+            body = io.BufferedReader(_ReceiveStream(receive, loop), buffer_size=64 * 1024)
+        else:
+            ASGI_REQUESTS.labels(phase='receiving').inc()
+            try:
+                chunks, size = [], 0
+                more = True
+                while more:
+                    message = await receive()
+                    if message['type'] == 'http.disconnect':
+                        return
+                    chunk = message.get('body', b'')
+                    size += len(chunk)
+                    if max_body and size > max_body:
+                        await self._send_simple(send, 413, b'Request body too large')
+                        return
+                    chunks.append(chunk)
+                    more = message.get('more_body', False)
+            finally:
+                ASGI_REQUESTS.labels(phase='receiving').dec()
+            body = io.BytesIO(b''.join(chunks))
+            content_length = size
+
+        environ = self._environ(scope, headers, body, content_length)
+
+        ASGI_REQUESTS.labels(phase='queued').inc()
+        async with self._pending:
+            ASGI_REQUESTS.labels(phase='queued').dec()
+            ASGI_REQUESTS.labels(phase='running').inc()
+            try:
+                await self._run(environ, send, loop)
+            finally:
+                ASGI_REQUESTS.labels(phase='running').dec()
+
+    async def _run(self, environ, send, loop):
+        response = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.encode('latin-1'), v.encode('latin-1')) for k, v in response_headers]
+            return lambda data: None
+
+        def first_chunk():
+            # Runs the view; werkzeug calls start_response before the first chunk
+            iterator = iter(self.wsgi_app(environ, start_response))
+            return iterator, next(iterator, None)
+
+        # Every call for this request runs in one context: stream_with_context
+        # keeps Flask's request context in context variables, and successive
+        # chunks may be produced on different pool threads
+        context = contextvars.copy_context()
+        iterator, chunk = await loop.run_in_executor(self.executor, context.run, first_chunk)
+        try:
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                # Streamed bodies (NDJSON) produce each chunk on a worker thread
+                chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                # Tears down the request context (teardown_request hooks)
+                await loop.run_in_executor(self.executor, context.run, close)
+
+    @staticmethod
+    async def _send_simple(send, status, body):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    def _environ(scope, headers, body, content_length):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            # Lets werkzeug read a chunked body to its end without a length
+            'wsgi.input_terminated': content_length is None,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if content_length is not None:
+            environ['CONTENT_LENGTH'] = str(content_length)
+        for name, value in headers:
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key != 'CONTENT_LENGTH':
+                key = f'HTTP_{key}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+app = ASGIAdapter(create_app())
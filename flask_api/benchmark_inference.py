@@ -0,0 +1,77 @@
+"""
+Compare soil image inference latency: keras Model.predict vs the
+pre-traced direct-call path used by the API (fast_inference.py)
+Run from flask_api directory
+"""
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from tensorflow import keras
+from fast_inference import CompiledPredictor, keras_predictor
+
+BATCH_SIZES = [1, 8, 16, 32]
+ITERATIONS = 30
+
+print("="*70)
+print("SOIL IMAGE INFERENCE LATENCY BENCHMARK")
+print("="*70)
+
+model_path = None
+for path in ['models/soil_image_model.keras', 'models/soil_image_best.keras',
+             'models/soil_image_model.h5', 'models/soil_image_best.h5']:
+    if os.path.exists(path):
+        model_path = path
+        break
+
+if not model_path:
+    print("❌ No soil image model found. Run: python download_models.py")
+    sys.exit(1)
+
+img_size = 224
+if os.path.exists('models/soil_model_metadata.json'):
+    with open('models/soil_model_metadata.json') as f:
+        img_size = json.load(f).get('img_size', 224)
+
+print(f"\n📥 Loading {model_path} (IMG_SIZE: {img_size})...")
+model = keras.models.load_model(model_path, compile=False)
+
+paths = {
+    'Model.predict': keras_predictor(model),
+    'CompiledPredictor': CompiledPredictor(model, img_size, batch_sizes=BATCH_SIZES),
+}
+
+
+def time_path(predict, batch):
+    """Return per-call latencies in ms (after one warmup call)"""
+    predict(batch)
+    latencies = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        predict(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+rng = np.random.default_rng(0)
+print(f"\n{'Batch':>6} {'Path':<20} {'p50 ms':>9} {'p95 ms':>9} {'ms/image':>9}")
+print("-"*58)
+for batch_size in BATCH_SIZES:
+    batch = rng.random((batch_size, img_size, img_size, 3), dtype=np.float32)
+    p50 = {}
+    for name, predict in paths.items():
+        lat = time_path(predict, batch)
+        p50[name] = np.percentile(lat, 50)
+        print(f"{batch_size:>6} {name:<20} {p50[name]:>9.2f} "
+              f"{np.percentile(lat, 95):>9.2f} {p50[name] / batch_size:>9.2f}")
+
+    # Both paths must agree before the speedup means anything
+    diff = np.abs(paths['Model.predict'](batch) - paths['CompiledPredictor'](batch)).max()
+    speedup = p50['Model.predict'] / p50['CompiledPredictor']
+    print(f"{'':>6} speedup {speedup:.2f}x, max |diff| {diff:.2e}")
+
+print(f"\n{'='*70}")
+print("✅ BENCHMARK COMPLETE")
+print("="*70)
@@ -0,0 +1,126 @@
+"""
+Compare soil image preprocessing: reference pipeline (full decode,
+convert, resize) vs the reduced-resolution fast path used by the API
+(image_preprocessing.py), for speed and for accuracy
+Run from flask_api directory
+"""
+import os
+import io
+import sys
+import json
+import glob
+import time
+import numpy as np
+from PIL import Image
+
+from image_preprocessing import preprocess_image
+
+ITERATIONS = 20
+# Typical phone camera resolutions the API receives
+PHONE_SIZES = [(4032, 3024), (4000, 3000), (1920, 1080)]
+DATASET_PATH = 'datasets/soil_images'
+MAX_ACCURACY_IMAGES = 300
+
+print("="*70)
+print("SOIL IMAGE PREPROCESSING BENCHMARK")
+print("="*70)
+
+img_size = 224
+if os.path.exists('models/soil_model_metadata.json'):
+    with open('models/soil_model_metadata.json') as f:
+        img_size = json.load(f).get('img_size', 224)
+
+images = sorted(glob.glob(os.path.join(DATASET_PATH, '*', '*')))
+images = [f for f in images if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+
+
+def encode(img, fmt, **kwargs):
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def make_photo(size):
+    """A phone-sized photo: a dataset image upscaled, or smooth noise"""
+    if images:
+        base = Image.open(images[0]).convert('RGB')
+    else:
+        rng = np.random.default_rng(0)
+        base = Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+    return base.resize(size, Image.Resampling.BICUBIC)
+
+
+def time_path(img_bytes, fast):
+    """Return per-call latencies in ms (after one warmup call)"""
+    out = np.empty((img_size, img_size, 3), dtype=np.float32)
+    preprocess_image(img_bytes, img_size, out=out, fast=fast)
+    latencies = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        preprocess_image(img_bytes, img_size, out=out, fast=fast)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+# ==================== SPEED ====================
+print(f"\n⏱️  Latency per image (IMG_SIZE: {img_size}, {ITERATIONS} iterations)")
+print(f"\n{'Input':<22} {'Reference ms':>13} {'Fast ms':>9} {'Speedup':>8} {'max |diff|':>11}")
+print("-"*67)
+for size in PHONE_SIZES:
+    photo = make_photo(size)
+    for fmt, kwargs in [('JPEG', {'quality': 90}), ('PNG', {'compress_level': 1})]:
+        img_bytes = encode(photo, fmt, **kwargs)
+        reference = np.percentile(time_path(img_bytes, fast=False), 50)
+        fast = np.percentile(time_path(img_bytes, fast=True), 50)
+        diff = np.abs(preprocess_image(img_bytes, img_size, fast=False) -
+                      preprocess_image(img_bytes, img_size, fast=True)).max()
+        label = f"{size[0]}x{size[1]} {fmt}"
+        print(f"{label:<22} {reference:>13.2f} {fast:>9.2f} {reference / fast:>7.2f}x {diff:>11.4f}")
+
+# ==================== ACCURACY ====================
+print(f"\n🎯 Accuracy vs reference pipeline")
+if not images:
+    print(f"   ⚠️  No images in {DATASET_PATH}; skipping")
+    sys.exit(0)
+
+sample = images[::max(1, len(images) // MAX_ACCURACY_IMAGES)][:MAX_ACCURACY_IMAGES]
+reference_batch = np.empty((len(sample), img_size, img_size, 3), dtype=np.float32)
+fast_batch = np.empty_like(reference_batch)
+for i, path in enumerate(sample):
+    with open(path, 'rb') as f:
+        img_bytes = f.read()
+    preprocess_image(img_bytes, img_size, out=reference_batch[i], fast=False)
+    preprocess_image(img_bytes, img_size, out=fast_batch[i], fast=True)
+
+pixel_diff = np.abs(reference_batch - fast_batch)
+print(f"   Images: {len(sample)}")
+print(f"   Pixel |diff|: mean {pixel_diff.mean():.4f}, max {pixel_diff.max():.4f} (scale 0-1)")
+
+model_path = None
+for path in ['models/soil_image_model.keras', 'models/soil_image_best.keras',
+             'models/soil_image_model.h5', 'models/soil_image_best.h5']:
+    if os.path.exists(path):
+        model_path = path
+        break
+
+if not model_path:
+    print("   ⚠️  No soil image model found; skipping prediction check (python download_models.py)")
+    sys.exit(0)
+
+from tensorflow import keras
+from fast_inference import CompiledPredictor
+
+print(f"   Model: {model_path}")
+model = keras.models.load_model(model_path, compile=False)
+predict = CompiledPredictor(model, img_size)
+reference_probs = np.concatenate([predict(reference_batch[i:i + 32]) for i in range(0, len(sample), 32)])
+fast_probs = np.concatenate([predict(fast_batch[i:i + 32]) for i in range(0, len(sample), 32)])
+
+agreement = np.mean(reference_probs.argmax(axis=1) == fast_probs.argmax(axis=1))
+print(f"   Top-1 agreement: {agreement * 100:.1f}%")
+print(f"   Probability |diff|: mean {np.abs(reference_probs - fast_probs).mean():.4f}, "
+      f"max {np.abs(reference_probs - fast_probs).max():.4f}")
+
+print(f"\n{'='*70}")
+print("✅ BENCHMARK COMPLETE")
+print("="*70)
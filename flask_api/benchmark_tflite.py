@@ -0,0 +1,141 @@
+"""
+Compare TFLite batch handling: latency per call and interpreter memory
+
+Replays the batch sizes a micro-batcher produces through TFLitePredictor
+with different TFLITE_BATCH_BUCKETS settings. Each setting runs in a fresh
+process so its memory can be measured on its own. Settings:
+  (empty)       one interpreter, resized whenever the batch size changes
+  1;16          the app's default: own interpreters for 1 and a full batch
+  pad:1;2;...   batches zero-padded up to the next size, one interpreter each
+
+Traffic mixes:
+  uniform  batch sizes 1..max, equally likely
+  bursty   mostly single images and full batches, some sizes in between
+
+Run from flask_api directory:
+  python benchmark_tflite.py
+  python benchmark_tflite.py --buckets ",1;16,1;2;4;8;16" --calls 400
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+from startup_profiler import rss
+from warmup import default_batch_sizes
+
+MODEL_PATHS = ['models/soil_image_model_int8.tflite', 'models/soil_image_model_dynamic.tflite']
+
+
+def batch_sizes(mix, max_size, calls, seed=0):
+    rng = np.random.default_rng(seed)
+    if mix == 'uniform':
+        return rng.integers(1, max_size + 1, size=calls)
+    sizes = rng.choice([1, max_size, 0], size=calls, p=[0.45, 0.45, 0.1])
+    return np.where(sizes == 0, rng.integers(2, max_size, size=calls), sizes)
+
+
+def run_setting(model_path, img_size, setting, mix, max_size, calls, threads):
+    """Child process: time the replay, report JSON on stdout"""
+    from fast_inference import TFLitePredictor, load_tflite_interpreter
+
+    pad = setting.startswith('pad:')
+    buckets = [int(s) for s in setting.replace('pad:', '').split(';') if s]
+    sizes = batch_sizes(mix, max_size, calls)
+    # The app's warmup plan (multi-image requests up to twice a batch), then every replayed size
+    warm_sizes = sorted(set(default_batch_sizes(max_size, 2 * max_size)) | set(sizes.tolist()))
+    batches = {n: np.random.default_rng(n).random((n, img_size, img_size, 3), dtype=np.float32)
+               for n in warm_sizes}
+    load_tflite_interpreter(model_path)  # the runtime's import isn't counted below
+    before = rss()
+    predictor = TFLitePredictor(model_path, img_size, num_threads=threads, batch_sizes=(),
+                                bucket_sizes=buckets)
+
+    def predict(batch):
+        n = len(batch)
+        size = next((b for b in buckets if b >= n), n) if pad else n
+        if size > n:
+            batch = np.concatenate([batch, np.zeros((size - n,) + batch.shape[1:], dtype=batch.dtype)])
+        return predictor(batch)[:n]
+
+    for n in warm_sizes:
+        predict(batches[n])
+
+    latencies = []
+    for n in sizes:
+        start = time.perf_counter()
+        predict(batches[n])
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    print(json.dumps({
+        'mean_ms': float(latencies.mean()),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'images_per_s': float(sizes.sum() / latencies.sum() * 1000),
+        'interpreters': len(predictor._interpreters),
+        'memory_mb': (rss() - before) / 1e6,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--buckets', default=',pad:1;2;4;8;16;32,1;16',
+                        help='comma-separated settings, sizes within one separated by ";"')
+    parser.add_argument('--mix', default='uniform,bursty')
+    parser.add_argument('--max-size', type=int, default=int(os.environ.get('SOIL_BATCH_MAX_SIZE', 16)))
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    model_path = next((p for p in MODEL_PATHS if os.path.exists(p)), None)
+    if not model_path:
+        print("❌ No TFLite soil model found. Run: python export_tflite.py")
+        sys.exit(1)
+    img_size = 224
+    if os.path.exists('models/soil_model_metadata.json'):
+        with open('models/soil_model_metadata.json') as f:
+            img_size = json.load(f).get('img_size', 224)
+
+    if args.child is not None:
+        setting, mix = args.child.split('|')
+        run_setting(model_path, img_size, setting, mix, args.max_size, args.calls, args.threads)
+        return
+
+    print("="*70)
+    print("TFLITE BATCH HANDLING BENCHMARK")
+    print("="*70)
+    print(f"\n{model_path} (IMG_SIZE: {img_size}, {args.threads} thread(s), {args.calls} calls)")
+
+    settings = args.buckets.split(',')
+    for mix in args.mix.split(','):
+        # Settings alternate across rounds and each keeps its best round, so
+        # noise from other load on the machine doesn't decide the comparison
+        best = {}
+        for _ in range(args.rounds):
+            for setting in settings:
+                output = subprocess.run(
+                    [sys.executable, __file__, '--child', f'{setting}|{mix}', '--max-size', str(args.max_size),
+                     '--calls', str(args.calls), '--threads', str(args.threads)],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                if setting not in best or result['mean_ms'] < best[setting]['mean_ms']:
+                    best[setting] = result
+
+        print(f"\n{mix} batch sizes (1..{args.max_size}), best of {args.rounds}:")
+        print(f"  {'buckets':<20} {'mean ms':>8} {'p95 ms':>8} {'images/s':>9} {'interp.':>8} {'memory MB':>10}")
+        for setting in settings:
+            result = best[setting]
+            label = setting.replace(';', ',') or 'resize'
+            print(f"  {label:<20} {result['mean_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                  f"{result['images_per_s']:>9.0f} {result['interpreters']:>8} {result['memory_mb']:>10.0f}")
+
+    print("\n" + "="*70)
+
+
+if __name__ == '__main__':
+    main()
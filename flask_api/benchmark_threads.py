@@ -0,0 +1,212 @@
+"""
+Sweep per-worker thread budgets: throughput vs p99 latency
+
+Starts --workers copies of the app (one process per simulated gunicorn
+worker, each with the thread settings under test, see thread_budget.py),
+loads and warms the model in each, then drives all of them at once with
+--clients concurrent requests per worker for --duration seconds. Each
+setting gets fresh processes, since TensorFlow's pools can't be resized
+once it has started.
+
+The "threads" sweep covers 1, the budget (cores // workers) and every
+core per worker (the old default, oversubscribed once workers > 1).
+
+Run from flask_api directory:
+  python benchmark_threads.py                                  # soil image, 2 workers
+  python benchmark_threads.py --workers 4 --threads 1,2,4 --inter 1,2
+  python benchmark_threads.py --model fertility --rows 64 --sklearn   # n_jobs via sklearn
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import numpy as np
+
+from thread_budget import available_cores
+
+ENDPOINTS = {
+    'soil_image': '/predict/soil-image',
+    'fertility': '/predict/fertility/batch',
+    'irrigation': '/predict/irrigation/batch',
+}
+
+
+# ==================== WORKER PROCESS ====================
+
+def request_factory(app, model, rows):
+    """Function building the keyword arguments of request i"""
+    bundle = app.MODELS[model].get()
+    if bundle is None:
+        raise SystemExit(f"{model} model failed to load: {app.MODELS[model].error}")
+
+    if model == 'soil_image':
+        from warmup import sample_photo
+        photos = [sample_photo(seed=seed) for seed in range(8)]
+        return lambda i: {'data': {'image': (io.BytesIO(photos[i % len(photos)]), 'soil.jpg')}}
+
+    from warmup import representative_rows
+    payloads = []
+    for seed in range(8):
+        X = representative_rows(bundle, rows, seed=seed)
+        payloads.append([dict(zip(bundle.features, map(float, row))) for row in X])
+    return lambda i: {'json': payloads[i % len(payloads)]}
+
+
+def run_worker(model, clients, duration, rows):
+    """One simulated worker: load, report READY, wait for GO, run the load"""
+    import app
+
+    make_request = request_factory(app, model, rows)
+    url = ENDPOINTS[model]
+    print('READY', flush=True)
+    sys.stdin.readline()
+
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def client(first):
+        client_app = app.app.test_client()
+        local, i = [], first
+        while time.perf_counter() < deadline:
+            kwargs = make_request(i)
+            i += clients
+            start = time.perf_counter()
+            response = client_app.post(url, **kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code == 200:
+                local.append(elapsed)
+            else:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print('RESULT ' + json.dumps({'latencies_ms': latencies, 'errors': errors[0]}), flush=True)
+
+
+# ==================== SWEEP ====================
+
+def run_setting(args, threads, inter):
+    """Run --workers processes with one setting; returns the summary row"""
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(args.workers), INFERENCE_THREADS=str(threads),
+               TF_INTER_OP_THREADS=str(inter), APP_FACTORY='1', MODEL_PRELOAD='none',
+               MODEL_WATCH_SECONDS='0', SOIL_CACHE_MAX_MB='0', LOG_LEVEL='warning',
+               TF_CPP_MIN_LOG_LEVEL='2')
+    if args.sklearn:
+        env['TREE_ENGINE'] = '0'
+    for name in ('TF_INTRA_OP_THREADS', 'BLAS_THREADS', 'SKLEARN_N_JOBS', 'TFLITE_NUM_THREADS',
+                 'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        env.pop(name, None)
+
+    command = [sys.executable, __file__, '--worker', '--model', args.model,
+               '--clients', str(args.clients), '--duration', str(args.duration), '--rows', str(args.rows)]
+    procs = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True) for _ in range(args.workers)]
+    try:
+        for proc in procs:
+            for line in proc.stdout:
+                if line.startswith('READY'):
+                    break
+            else:
+                raise RuntimeError(f"worker exited before it was ready (exit code {proc.wait()})")
+        for proc in procs:
+            proc.stdin.write('GO\n')
+            proc.stdin.flush()
+
+        latencies, errors = [], 0
+        for proc in procs:
+            for line in proc.stdout:
+                if line.startswith('RESULT '):
+                    result = json.loads(line[len('RESULT '):])
+                    latencies.extend(result['latencies_ms'])
+                    errors += result['errors']
+            proc.wait()
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+    latencies = np.array(latencies) if latencies else np.array([np.nan])
+    return {
+        'threads': threads,
+        'inter_op': inter,
+        'total_threads': threads * args.workers,
+        'requests': int(np.isfinite(latencies).sum()),
+        'throughput': round(np.isfinite(latencies).sum() / args.duration, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+        'errors': errors,
+    }
+
+
+def parse_list(value):
+    return sorted({int(v) for v in value.split(',') if v.strip()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep per-worker thread budgets')
+    parser.add_argument('--model', default='soil_image', choices=sorted(ENDPOINTS))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 2)))
+    parser.add_argument('--clients', type=int, default=int(os.environ.get('GUNICORN_THREADS', 16)),
+                        help='Concurrent requests per worker (gunicorn threads)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per setting')
+    parser.add_argument('--threads', default=None, help='Threads per worker to try, e.g. 1,2,4')
+    parser.add_argument('--inter', default='1', help='TF inter-op threads to try, e.g. 1,2')
+    parser.add_argument('--rows', type=int, default=1, help='Rows per tabular request')
+    parser.add_argument('--sklearn', action='store_true',
+                        help='Serve tabular models through sklearn (TREE_ENGINE=0), so n_jobs matters')
+    parser.add_argument('--output', default=None, help='Also write the results as JSON')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.model, args.clients, args.duration, args.rows)
+        return 0
+
+    cores = available_cores()
+    budget = max(1, cores // args.workers)
+    thread_counts = parse_list(args.threads) if args.threads else sorted({1, budget, cores})
+
+    print("="*70)
+    print("THREAD BUDGET SWEEP")
+    print("="*70)
+    print(f"Model: {args.model}  Cores: {cores}  Workers: {args.workers}  "
+          f"Clients/worker: {args.clients}  Budget: {budget} threads/worker")
+    print(f"\n{'threads':>8} {'inter':>6} {'total':>6} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    print("-"*60)
+
+    results = []
+    for threads in thread_counts:
+        for inter in parse_list(args.inter):
+            row = run_setting(args, threads, inter)
+            results.append(row)
+            note = '  <- budget' if threads == budget else ('  (oversubscribed)' if row['total_threads'] > cores else '')
+            print(f"{threads:>8} {inter:>6} {row['total_threads']:>6} {row['throughput']:>8.1f} "
+                  f"{row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['errors']:>7}{note}", flush=True)
+
+    best = max(results, key=lambda r: (r['throughput'] / max(r['p99_ms'], 1e-9)))
+    print("-"*60)
+    print(f"Best throughput / p99: {best['threads']} threads, {best['inter_op']} inter-op "
+          f"(INFERENCE_THREADS={best['threads']} TF_INTER_OP_THREADS={best['inter_op']})")
+    print("="*70)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'model': args.model, 'cores': cores, 'workers': args.workers,
+                       'clients': args.clients, 'duration': args.duration, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
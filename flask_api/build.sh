@@ -4,6 +4,14 @@ echo "🔧 Installing dependencies..."
 pip install -r requirements.txt
 
 echo "📥 Downloading models..."
-python download_models.py
+# Fails while model_manifest.json has entries without a sha256; set
+# ALLOW_UNVERIFIED_MODELS=1 to deploy them anyway. MODEL_BASE_URL=http://... to use a mirror
+python download_models.py || { echo "❌ Model download failed"; exit 1; }
+
+echo "🌲 Building scaler-folded tree models..."
+python build_fused_models.py || echo "⚠️  Fused models not built, API will use scaler + trees"
+
+echo "📦 Packing memory-mapped model bundles..."
+python pack_models.py || echo "⚠️  Bundles not packed, API will load the pickles"
 
 echo "✅ Build complete!"
\ No newline at end of file
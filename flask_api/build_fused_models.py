@@ -0,0 +1,166 @@
+"""
+Build scaler-folded tree models for the tabular endpoints
+
+Reads the existing model + StandardScaler pickles, compiles the tree
+ensemble (tree_engine.py) and folds the scaler into its split thresholds,
+so the API can feed raw features straight to the trees. Each fused model
+is verified against the current pipeline (scaler.transform + sklearn
+predict / predict_proba) and only written if every label and probability
+is identical.
+
+Output (loaded automatically by app.py when the source pickles match):
+  models/fertility_fused.pkl
+  irrigation_assets/irrigation_fused.pkl (or models/, next to its source)
+
+Run from flask_api directory: python build_fused_models.py
+"""
+import os
+import sys
+import csv
+import pickle
+import warnings
+import joblib
+import numpy as np
+
+from tree_engine import compile_model, fold_scaler
+from model_loader import file_version
+
+FUSED_FORMAT = 'fused-tree-ensemble'
+FUSED_VERSION = 1
+
+MODELS = {
+    'fertility': {
+        'candidates': [('models/fertility_model.pkl', 'models/fertility_scaler.pkl',
+                        'models/fertility_features.pkl')],
+        'dataset': 'datasets/soil_data.csv',
+        'output': 'fertility_fused.pkl'
+    },
+    'irrigation': {
+        'candidates': [('irrigation_assets/irrigation_model.pkl', 'irrigation_assets/irrigation_scaler.pkl',
+                        'irrigation_assets/irrigation_features.pkl'),
+                       ('models/irrigation_model.pkl', 'models/irrigation_scaler.pkl',
+                        'models/irrigation_features.pkl')],
+        'dataset': 'datasets/irrigation_data.csv',
+        'output': 'irrigation_fused.pkl'
+    }
+}
+
+
+def load_pickle(path):
+    # The irrigation model is saved with plain pickle, the rest with joblib
+    try:
+        return joblib.load(path)
+    except Exception:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def dataset_rows(path, features, limit=50000):
+    """Feature rows from a training CSV, if it is available"""
+    if not os.path.exists(path):
+        return np.empty((0, len(features)))
+    rows = []
+    with open(path, newline='') as f:
+        for record in csv.DictReader(f):
+            try:
+                rows.append([float(record[name]) for name in features])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if len(rows) >= limit:
+                break
+    return np.array(rows, dtype=np.float64).reshape(-1, len(features))
+
+
+def verification_inputs(fused, scaler, features, dataset):
+    """Dataset rows, random rows around the training range, and split edges"""
+    rng = np.random.default_rng(42)
+    n_features = len(features)
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+
+    random_rows = mean + scale * rng.normal(0, 2, (20000, n_features))
+
+    # Raw values exactly at, and one ULP either side of, every folded threshold
+    split = fused.children_left != np.arange(fused.n_nodes)
+    thresholds = fused.threshold[split]
+    split_features = fused.feature[split]
+    base = random_rows[rng.integers(0, len(random_rows), len(thresholds))]
+    edges = []
+    for shifted in [thresholds, np.nextafter(thresholds, np.inf), np.nextafter(thresholds, -np.inf)]:
+        rows = base.copy()
+        rows[np.arange(len(thresholds)), split_features] = shifted
+        edges.append(rows)
+
+    return np.concatenate([dataset_rows(dataset, features), random_rows] + edges)
+
+
+def verify(model, scaler, fused, X):
+    """Count rows where the fused model differs from the current pipeline"""
+    with warnings.catch_warnings():
+        # The scalers were fitted on DataFrames; we pass plain arrays
+        warnings.simplefilter('ignore', UserWarning)
+        X_scaled = scaler.transform(X)
+    expected_labels = model.predict(X_scaled)
+    expected_proba = model.predict_proba(X_scaled)
+
+    labels, proba = fused.predict_with_proba(X)
+    label_mismatch = int((labels != expected_labels).sum())
+    proba_mismatch = int((proba != expected_proba).any(axis=1).sum())
+    return label_mismatch, proba_mismatch
+
+
+def build_fused(name):
+    """Build, verify and save one fused model; returns True on success"""
+    config = MODELS[name]
+    print(f"\n📦 {name}")
+
+    source = next((c for c in config['candidates'] if all(os.path.exists(p) for p in c)), None)
+    if not source:
+        print(f"  ❌ Source pickles not found: {config['candidates']}")
+        return False
+    model_path, scaler_path, features_path = source
+
+    model = load_pickle(model_path)
+    scaler = load_pickle(scaler_path)
+    features = list(load_pickle(features_path))
+    if hasattr(model, 'n_jobs'):
+        # Sum trees in a fixed order so the comparison is deterministic
+        model.set_params(n_jobs=1)
+
+    fused = fold_scaler(compile_model(model), scaler)
+    print(f"  Compiled {fused.n_trees} trees ({fused.n_nodes} nodes) from {model_path}")
+
+    X = verification_inputs(fused, scaler, features, config['dataset'])
+    label_mismatch, proba_mismatch = verify(model, scaler, fused, X)
+    print(f"  Verified {len(X)} rows: {label_mismatch} label / {proba_mismatch} probability mismatches")
+    if label_mismatch or proba_mismatch:
+        print("  ❌ Fused model differs from the current pipeline, not saving")
+        return False
+
+    output_path = os.path.join(os.path.dirname(model_path), config['output'])
+    joblib.dump({
+        'format': FUSED_FORMAT,
+        'version': FUSED_VERSION,
+        'engine': fused,
+        'features': features,
+        'sources': {path: file_version(path) for path in (model_path, scaler_path, features_path)}
+    }, output_path)
+    print(f"  ✅ Saved: {output_path}")
+    return True
+
+
+def build_all(names=None):
+    print("="*70)
+    print("BUILDING SCALER-FOLDED TREE MODELS")
+    print("="*70)
+    results = {name: build_fused(name) for name in (names or MODELS)}
+    print("\n" + "="*70)
+    for name, ok in results.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    print("="*70)
+    return all(results.values())
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or None
+    sys.exit(0 if build_all(names) else 1)
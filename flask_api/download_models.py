@@ -1,151 +1,146 @@
+"""
+Download the ML model artifacts listed in model_manifest.json
+
+Files are fetched in parallel, verified against the manifest's sha256 and
+size, resumed if a previous run was interrupted, and renamed into place
+only once complete (see artifact_fetcher.py). Files that already match
+are skipped. Nothing is fetched while manifest entries have no sha256,
+unless unverified artifacts are explicitly allowed.
+
+Usage:
+  python download_models.py                       # from Google Drive
+  python download_models.py --base-url http://localhost:8080
+  python download_models.py --update-manifest     # record digests of local files
+  python download_models.py --allow-unverified    # accept entries without a sha256
+
+Environment:
+  MODEL_BASE_URL        fetch <base>/<path> instead (any HTTP server, or file://)
+  MODEL_FETCH_WORKERS   parallel downloads (4)
+  ALLOW_UNVERIFIED_MODELS=1  same as --allow-unverified (only min_size is checked)
+"""
 import os
-import requests
-import gdown
-from pathlib import Path
-
-def download_from_drive(file_id, output_path):
-    """Download file from Google Drive with better error handling"""
-    try:
-        print(f"  Downloading to {output_path}...")
-        url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        gdown.download(url, output_path, quiet=False)
-        
-        # Verify file was downloaded
-        file_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
-        
-        # JSON files can be small, only check > 50 bytes
-        min_size = 50 if output_path.endswith('.json') else 1000
-        
-        if file_size > min_size:
-            print(f"  ✅ Downloaded successfully ({file_size} bytes)")
-            return True
-        else:
-            print(f"  ❌ Download failed or file too small ({file_size} bytes)")
-            return False
-    except Exception as e:
-        print(f"  ❌ Error: {e}")
-        return False
+import sys
+import argparse
+
+from artifact_fetcher import (load_manifest, save_manifest, update_manifest, fetch_all,
+                              MANIFEST_PATH, SKIPPED, DOWNLOADED, RESUMED, FAILED)
+
+SOIL_MODELS = [
+    'models/soil_image_model.keras',
+    'models/soil_image_best.keras',
+    'models/soil_image_model.h5',
+    'models/soil_image_best.h5'
+]
+
+ICONS = {SKIPPED: '⏭️ ', DOWNLOADED: '✅', RESUMED: '✅', FAILED: '❌'}
+
+
+def print_progress(path, outcome, detail):
+    print(f"  {ICONS[outcome]} {path}: {outcome} ({detail})", flush=True)
+
+
+def download_models(base_url=None, workers=None, manifest_path=MANIFEST_PATH, allow_unverified=None):
+    """Download all required models on startup; returns True when they are all present"""
+    base_url = base_url or os.environ.get('MODEL_BASE_URL') or None
+    workers = workers or int(os.environ.get('MODEL_FETCH_WORKERS', 4))
+    if allow_unverified is None:
+        allow_unverified = os.environ.get('ALLOW_UNVERIFIED_MODELS', '0') == '1'
 
-def download_models():
-    """Download all required models on startup"""
-    
     # Create directories
     os.makedirs('models', exist_ok=True)
     os.makedirs('datasets', exist_ok=True)
-    
+
     print("="*70)
     print("DOWNLOADING ML MODELS")
     print("="*70)
-    
-    # Google Drive file IDs - VERIFY THESE ARE CORRECT
-    files_to_download = {
-        # Fertility models
-        'models/fertility_model.pkl': '1ZUSElOGr3ESDv6wDR-slj5RXPu9oI2jJ',
-        'models/fertility_scaler.pkl': '1s7HIiQ4WGPAnk3zNVQJbyCjrqN73pa8B',
-        'models/fertility_features.pkl': '1U02YNgVYRE0cDbMKeYDvFKfAoHaOHiwI',
-        
-        # Irrigation models
-        'models/irrigation_model.pkl': '1noEeY2qoPj8q9rnebOzkyXgWO44euIMO',
-        'models/irrigation_scaler.pkl': '156iZGLd-Pz6YhNWbv1bSluuUBT2jk0G3',
-        'models/irrigation_features.pkl': '1zaHQ4pfxT8xd4VxlIRnsiRrY3e-c1U3T',
-        
-        # Soil image models - TRY ALL FORMATS
-        'models/soil_image_model.keras': '1lNZzFVwl-Zj7PBzjdAkqAaQ30bcs-egf',
-        'models/soil_image_best.keras': '1auEP9QJ0VOGsKDqh07gkyR1Z4_GE5VjN',
-        'models/soil_image_model.h5': '192mNoD-EvLNzz8g1UmVhTNoxyj131Rx4',
-        'models/soil_image_best.h5': '1b8oHL2gIVLdXy1jRZKRksTBUqZTClqyG',
-        
-        # Soil metadata
-        'models/soil_class_labels.json': '18SwY7Lnv0ASHdShazgcsVxVIQ_xf4MOq',
-        'models/soil_model_metadata.json': '1zE-frtzFmyjF1bBEQfC5oUN2w_eWHI1k',
-    }
-    
-    downloaded_count = 0
-    failed_count = 0
-    skipped_count = 0
-    
-    for output_path, file_id in files_to_download.items():
-        print(f"\n📥 {output_path}")
-        
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            # Different minimum sizes for different file types
-            min_size = 50 if output_path.endswith('.json') else 1000
-            
-            if file_size > min_size:
-                print(f"  ⏭️  Already exists ({file_size} bytes)")
-                skipped_count += 1
-                continue
-            else:
-                print(f"  ⚠️  File exists but too small, re-downloading...")
-                os.remove(output_path)
-        
-        if download_from_drive(file_id, output_path):
-            downloaded_count += 1
-        else:
-            failed_count += 1
-    
+
+    manifest = load_manifest(manifest_path)
+    unverified = [e['path'] for e in manifest['artifacts'] if not e.get('sha256')]
+    print(f"📥 {len(manifest['artifacts'])} artifacts from {base_url or 'Google Drive'} "
+          f"({workers} parallel)")
+    if unverified and not allow_unverified:
+        # A Drive quota page or a swapped file would pass the min_size check
+        print(f"❌ {len(unverified)} artifacts have no sha256 in {manifest_path}:")
+        for path in unverified:
+            print(f"   {path}")
+        print("   Record them from known-good files in models/: python download_models.py --update-manifest")
+        print("   Or accept a min_size check only: --allow-unverified (ALLOW_UNVERIFIED_MODELS=1)")
+        return False
+    if unverified:
+        print(f"⚠️  {len(unverified)} without a sha256 in the manifest, only checked against min_size "
+              f"(unverified artifacts allowed)")
+
+    results = fetch_all(manifest, base_url=base_url, workers=workers, progress=print_progress)
+    outcomes = [outcome for outcome, _ in results.values()]
+
     print("\n" + "="*70)
     print("DOWNLOAD SUMMARY")
     print("="*70)
-    print(f"✅ Downloaded: {downloaded_count}")
-    print(f"⏭️  Skipped: {skipped_count}")
-    print(f"❌ Failed: {failed_count}")
-    
+    print(f"✅ Downloaded: {outcomes.count(DOWNLOADED) + outcomes.count(RESUMED)} "
+          f"(resumed: {outcomes.count(RESUMED)})")
+    print(f"⏭️  Skipped: {outcomes.count(SKIPPED)}")
+    print(f"❌ Failed: {outcomes.count(FAILED)}")
+
     # Check critical models
     print("\n" + "="*70)
     print("VERIFYING CRITICAL MODELS")
     print("="*70)
-    
-    critical_checks = {
-        'Fertility Model': 'models/fertility_model.pkl',
-        'Fertility Scaler': 'models/fertility_scaler.pkl',
-        'Fertility Features': 'models/fertility_features.pkl',
-        'Soil Class Labels': 'models/soil_class_labels.json',
-        'Soil Metadata': 'models/soil_model_metadata.json'
-    }
-    
+
     all_critical_exist = True
-    for name, path in critical_checks.items():
-        if os.path.exists(path) and os.path.getsize(path) > 100:
-            print(f"✅ {name}: OK ({os.path.getsize(path)} bytes)")
-        else:
-            print(f"❌ {name}: MISSING or INVALID")
+    for entry in manifest['artifacts']:
+        if not entry.get('required'):
+            continue
+        outcome, detail = results[entry['path']]
+        if outcome == FAILED:
+            print(f"❌ {entry['path']}: {detail}")
             all_critical_exist = False
-    
+        else:
+            print(f"✅ {entry['path']}: OK ({os.path.getsize(entry['path'])} bytes)")
+
     # Check for at least ONE soil image model
     print("\n📸 Soil Image Model:")
-    soil_models = [
-        'models/soil_image_model.keras',
-        'models/soil_image_best.keras',
-        'models/soil_image_model.h5',
-        'models/soil_image_best.h5'
-    ]
-    
     soil_model_found = False
-    for model_path in soil_models:
-        if os.path.exists(model_path) and os.path.getsize(model_path) > 1000000:  # > 1MB
+    for model_path in SOIL_MODELS:
+        if model_path in results and results[model_path][0] != FAILED:
             print(f"  ✅ Found: {model_path} ({os.path.getsize(model_path)} bytes)")
             soil_model_found = True
-        elif os.path.exists(model_path):
-            print(f"  ⚠️  {model_path} exists but seems too small ({os.path.getsize(model_path)} bytes)")
-    
+
     if not soil_model_found:
         print("  ❌ NO VALID SOIL IMAGE MODEL FOUND!")
         print("\n  MANUAL FIX:")
-        print("  1. Upload your trained model to Google Drive")
+        print("  1. Upload your trained model to Google Drive (or any file server)")
         print("  2. Make it publicly accessible (Anyone with link can view)")
-        print("  3. Get the file ID from the share link")
-        print("  4. Update file IDs in download_models.py")
+        print("  3. Update its drive_id (or url) in model_manifest.json")
+        print("  4. Run: python download_models.py --update-manifest  (with the good file in models/)")
         print("  5. Run: python download_models.py")
-        all_critical_exist = False
-    
+
     print("\n" + "="*70)
     if all_critical_exist and soil_model_found:
         print("✅ ALL MODELS READY!")
     else:
         print("❌ SOME MODELS MISSING - CHECK ABOVE")
     print("="*70)
+    return all_critical_exist and soil_model_found
+
 
 if __name__ == '__main__':
-    download_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Download the model artifacts in model_manifest.json')
+    parser.add_argument('--base-url', default=None, help='Fetch <base-url>/<path> (default: MODEL_BASE_URL or Drive)')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel downloads (default: MODEL_FETCH_WORKERS or 4)')
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    parser.add_argument('--update-manifest', action='store_true',
+                        help='Record sha256 and size of the artifacts in models/ instead of downloading')
+    parser.add_argument('--allow-unverified', action='store_true', default=None,
+                        help='Download entries without a sha256 (default: ALLOW_UNVERIFIED_MODELS=1)')
+    args = parser.parse_args()
+
+    if args.update_manifest:
+        manifest = load_manifest(args.manifest)
+        updated = update_manifest(manifest)
+        save_manifest(manifest, args.manifest)
+        print(f"✅ Recorded sha256 and size for {len(updated)} artifacts in {args.manifest}")
+        for path in updated:
+            print(f"   {path}")
+        sys.exit(0)
+
+    sys.exit(0 if download_models(args.base_url, args.workers, args.manifest, args.allow_unverified) else 1)
@@ -0,0 +1,151 @@
+"""
+Export the soil image model for serving with preprocessing in the graph
+
+Prepends Rescaling (1/255) and, with --input-size, Resizing layers to the
+trained model, so the API feeds raw uint8 pixels: a quarter of the bytes
+through the input buffers, and no NumPy float pass per image. The API
+picks up models/soil_image_serving.keras automatically (SOIL_KERAS_PATHS)
+as long as models/soil_image_serving.json records the fingerprint of the
+soil model it was built from; after that model changes, the API serves
+the source model until this is re-run. The API resizes in PIL already,
+so it feeds the model at the trained size and leaves out the in-graph
+resize (the Resizing layer is for other clients of the export).
+
+Also checks the exported model against the current preprocessing (PIL
+resize, / 255.0 in NumPy) on the dataset images and writes
+models/soil_image_serving_report.json.
+
+Usage: python export_serving_model.py [--input-size 256]
+"""
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+from export_tflite import KERAS_MODEL_PATHS, list_dataset_images
+from image_preprocessing import preprocess_image
+
+SERVING_MODEL_PATH = 'models/soil_image_serving.keras'
+SERVING_INFO_PATH = 'models/soil_image_serving.json'
+
+
+def build_serving_model(model, img_size, input_size=None):
+    """uint8 (B, input_size, input_size, 3) -> the model's class probabilities"""
+    from tensorflow import keras
+
+    input_size = input_size or img_size
+    inputs = keras.Input((input_size, input_size, 3), dtype='uint8', name='images')
+    # Rescaling casts to float32 before scaling
+    x = keras.layers.Rescaling(1.0 / 255.0, name='rescale')(inputs)
+    if input_size != img_size:
+        x = keras.layers.Resizing(img_size, img_size, interpolation='bilinear',
+                                  antialias=True, name='resize')(x)
+    outputs = model(x, training=False)
+    return keras.Model(inputs, outputs, name='soil_image_serving')
+
+
+def save_serving_model(serving_model, source_path, img_size, input_size=None):
+    """Save the serving model with the fingerprint of the model it wraps"""
+    from model_loader import file_version
+
+    serving_model.save(SERVING_MODEL_PATH)
+    info = {
+        'sources': {source_path: file_version(source_path)},
+        'img_size': img_size,
+        'input_size': input_size or img_size
+    }
+    with open(SERVING_INFO_PATH, 'w') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def compare_preprocessing(model, serving_model, paths, img_size, input_size=None):
+    """Max |diff| and top-1 agreement: serving model on uint8 vs model on / 255.0"""
+    from fast_inference import CompiledPredictor
+
+    input_size = input_size or img_size
+    reference = CompiledPredictor(model, img_size)
+    serving = CompiledPredictor(serving_model, input_size, dtype=np.uint8)
+
+    max_diff, agree = 0.0, 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            img_bytes = f.read()
+        x_float = preprocess_image(img_bytes, img_size, fast=False)[np.newaxis]
+        x_uint8 = preprocess_image(img_bytes, input_size, fast=False, dtype=np.uint8)[np.newaxis]
+        ref_probs, serving_probs = reference(x_float)[0], serving(x_uint8)[0]
+        max_diff = max(max_diff, float(np.abs(ref_probs - serving_probs).max()))
+        agree += int(np.argmax(ref_probs) == np.argmax(serving_probs))
+    return {
+        'images': len(paths),
+        'max_probability_diff': max_diff,
+        'top1_agreement': agree / len(paths) if paths else None
+    }
+
+
+def export_serving_model(input_size=None, eval_size=300):
+    """Build, save and check the serving model; returns the report dict"""
+    from tensorflow import keras
+
+    print("="*70)
+    print("EXPORTING SOIL IMAGE SERVING MODEL (uint8 input)")
+    print("="*70)
+
+    model_path = next((p for p in KERAS_MODEL_PATHS if os.path.exists(p)), None)
+    if not model_path:
+        print("❌ No soil image model found. Run: python download_models.py")
+        sys.exit(1)
+
+    img_size = 224
+    if os.path.exists('models/soil_model_metadata.json'):
+        with open('models/soil_model_metadata.json') as f:
+            img_size = json.load(f).get('img_size', 224)
+    input_size = input_size or img_size
+
+    print(f"\n1. Loading {model_path}...")
+    model = keras.models.load_model(model_path, compile=False)
+
+    print(f"\n2. Building serving model (uint8 {input_size}x{input_size} -> "
+          f"rescale{' -> resize' if input_size != img_size else ''} -> model)...")
+    serving_model = build_serving_model(model, img_size, input_size)
+    info = save_serving_model(serving_model, model_path, img_size, input_size)
+    print(f"✅ Saved: {SERVING_MODEL_PATH} (+ {SERVING_INFO_PATH})")
+
+    report = {
+        'source_model': model_path,
+        'sources': info['sources'],
+        'serving_model': SERVING_MODEL_PATH,
+        'img_size': img_size,
+        'input_size': input_size,
+        'input_dtype': 'uint8'
+    }
+
+    paths = [path for path, _ in list_dataset_images()][:eval_size]
+    if paths:
+        print(f"\n3. Comparing against the NumPy preprocessing ({len(paths)} images)...")
+        report['equivalence'] = compare_preprocessing(model, serving_model, paths, img_size, input_size)
+        eq = report['equivalence']
+        print(f"   Max probability |diff|: {eq['max_probability_diff']:.2e}")
+        print(f"   Top-1 agreement: {eq['top1_agreement']*100:.1f}%")
+    else:
+        print("⚠️  No dataset images, skipping comparison")
+
+    with open('models/soil_image_serving_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print("✅ Saved: models/soil_image_serving_report.json")
+
+    print("\n" + "="*70)
+    print("The API loads it on next start / reload (delete it to serve the float model)")
+    print("Re-run after the soil model changes; until then the API serves the source model")
+    print("="*70)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the soil image model with in-graph preprocessing')
+    parser.add_argument('--input-size', type=int, default=None,
+                        help='Accept images of this size and resize in the graph (default: IMG_SIZE, no resize)')
+    parser.add_argument('--eval-size', type=int, default=300)
+    args = parser.parse_args()
+    export_serving_model(args.input_size, args.eval_size)
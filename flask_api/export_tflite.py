@@ -0,0 +1,224 @@
+"""
+Export the soil image model to a quantized TFLite flatbuffer
+
+Modes:
+  dynamic - dynamic-range quantization (int8 weights, float activations)
+  int8    - full-integer quantization, calibrated on datasets/soil_images
+            (float32 input/output so the API preprocessing is unchanged)
+
+Writes models/soil_image_model_<mode>.tflite and a comparison report
+(accuracy, top-1 agreement, latency, size) against the .keras model to
+models/soil_image_model_<mode>_report.json
+
+Usage: python export_tflite.py --mode int8
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import numpy as np
+from PIL import Image
+
+DATASET_PATH = 'datasets/soil_images'
+KERAS_MODEL_PATHS = [
+    'models/soil_image_model.keras',
+    'models/soil_image_best.keras',
+    'models/soil_image_model.h5',
+    'models/soil_image_best.h5'
+]
+
+
+def load_image(path, img_size):
+    """Same preprocessing as the API: RGB, resize, scale to [0, 1]"""
+    img = Image.open(path)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize((img_size, img_size))
+    return np.array(img, dtype=np.float32) / 255.0
+
+
+def list_dataset_images(dataset_path=DATASET_PATH):
+    """Return (path, folder_name) pairs for every image in the dataset"""
+    images = []
+    if not os.path.exists(dataset_path):
+        return images
+    for soil_type in sorted(os.listdir(dataset_path)):
+        folder = os.path.join(dataset_path, soil_type)
+        if not os.path.isdir(folder):
+            continue
+        for f in sorted(os.listdir(folder)):
+            if f.lower().endswith(('.png', '.jpg', '.jpeg')):
+                images.append((os.path.join(folder, f), soil_type))
+    return images
+
+
+def split_images(images, calibration_size, eval_size, seed=42):
+    """Disjoint calibration / evaluation samples"""
+    images = list(images)
+    random.Random(seed).shuffle(images)
+    calibration = images[:calibration_size]
+    evaluation = images[calibration_size:calibration_size + eval_size]
+    if not evaluation:
+        # Tiny dataset: evaluate on everything rather than nothing
+        evaluation = images[:eval_size]
+    return calibration, evaluation
+
+
+def convert(model, mode, calibration, img_size):
+    """Convert a keras model to TFLite bytes"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == 'int8':
+        if not calibration:
+            raise ValueError(f'Full-integer quantization needs calibration images in {DATASET_PATH}')
+
+        def representative_dataset():
+            for path, _ in calibration:
+                yield [load_image(path, img_size)[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+
+def measure_latency(predict, img_size, iterations=30):
+    batch = np.random.default_rng(0).random((1, img_size, img_size, 3), dtype=np.float32)
+    predict(batch)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3)
+    }
+
+
+def compare(keras_predict, tflite_predict, evaluation, class_labels, img_size):
+    """Top-1 agreement and accuracy (when folder names match labels)"""
+    label_to_idx = {v: int(k) for k, v in class_labels.items()}
+    agree = keras_correct = tflite_correct = labelled = 0
+    max_prob_diff = 0.0
+
+    for path, folder in evaluation:
+        x = load_image(path, img_size)[np.newaxis]
+        k_probs = keras_predict(x)[0]
+        t_probs = tflite_predict(x)[0]
+        k_idx, t_idx = int(np.argmax(k_probs)), int(np.argmax(t_probs))
+        agree += k_idx == t_idx
+        max_prob_diff = max(max_prob_diff, float(np.abs(k_probs - t_probs).max()))
+
+        true_idx = label_to_idx.get(folder, label_to_idx.get(folder.replace('_', ' ')))
+        if true_idx is not None:
+            labelled += 1
+            keras_correct += k_idx == true_idx
+            tflite_correct += t_idx == true_idx
+
+    n = len(evaluation)
+    return {
+        'eval_images': n,
+        'top1_agreement': agree / n if n else None,
+        'max_probability_diff': max_prob_diff,
+        'keras_accuracy': keras_correct / labelled if labelled else None,
+        'tflite_accuracy': tflite_correct / labelled if labelled else None
+    }
+
+
+def export_tflite(mode='int8', num_threads=None, calibration_size=200, eval_size=300):
+    """Convert, save and compare; returns the report dict"""
+    from tensorflow import keras
+    from fast_inference import CompiledPredictor, TFLitePredictor
+
+    print("="*70)
+    print(f"EXPORTING SOIL IMAGE MODEL TO TFLITE ({mode})")
+    print("="*70)
+
+    model_path = next((p for p in KERAS_MODEL_PATHS if os.path.exists(p)), None)
+    if not model_path:
+        print("❌ No soil image model found. Run: python download_models.py")
+        sys.exit(1)
+
+    img_size = 224
+    if os.path.exists('models/soil_model_metadata.json'):
+        with open('models/soil_model_metadata.json') as f:
+            img_size = json.load(f).get('img_size', 224)
+
+    class_labels = {}
+    if os.path.exists('models/soil_class_labels.json'):
+        with open('models/soil_class_labels.json') as f:
+            class_labels = json.load(f)
+
+    print(f"\n1. Loading {model_path}...")
+    model = keras.models.load_model(model_path, compile=False)
+
+    images = list_dataset_images()
+    calibration, evaluation = split_images(images, calibration_size, eval_size)
+    print(f"   Dataset images: {len(images)} "
+          f"(calibration: {len(calibration)}, evaluation: {len(evaluation)})")
+
+    print(f"\n2. Converting ({mode})...")
+    tflite_bytes = convert(model, mode, calibration, img_size)
+    output_path = f'models/soil_image_model_{mode}.tflite'
+    with open(output_path, 'wb') as f:
+        f.write(tflite_bytes)
+    print(f"✅ Saved: {output_path} ({len(tflite_bytes)/1e6:.2f} MB)")
+
+    print("\n3. Comparing against keras model...")
+    keras_predict = CompiledPredictor(model, img_size)
+    tflite_predict = TFLitePredictor(output_path, img_size, num_threads=num_threads)
+
+    report = {
+        'mode': mode,
+        'source_model': model_path,
+        'tflite_model': output_path,
+        'img_size': img_size,
+        'num_threads': num_threads,
+        'size_mb': {
+            'keras': round(os.path.getsize(model_path) / 1e6, 3),
+            'tflite': round(len(tflite_bytes) / 1e6, 3)
+        },
+        'latency_batch1': {
+            'keras': measure_latency(keras_predict, img_size),
+            'tflite': measure_latency(tflite_predict, img_size)
+        }
+    }
+    if evaluation:
+        report['accuracy'] = compare(keras_predict, tflite_predict, evaluation, class_labels, img_size)
+    else:
+        print(f"⚠️  No images in {DATASET_PATH}, skipping accuracy comparison")
+
+    report_path = f'models/soil_image_model_{mode}_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n   Size:    keras {report['size_mb']['keras']} MB -> tflite {report['size_mb']['tflite']} MB")
+    print(f"   Latency: keras {report['latency_batch1']['keras']['p50_ms']} ms -> "
+          f"tflite {report['latency_batch1']['tflite']['p50_ms']} ms (p50, batch 1)")
+    if 'accuracy' in report:
+        acc = report['accuracy']
+        print(f"   Top-1 agreement: {acc['top1_agreement']*100:.1f}% over {acc['eval_images']} images")
+        if acc['keras_accuracy'] is not None:
+            print(f"   Accuracy: keras {acc['keras_accuracy']*100:.1f}% -> tflite {acc['tflite_accuracy']*100:.1f}%")
+    print(f"✅ Saved: {report_path}")
+
+    print("\n" + "="*70)
+    print(f"Serve it with: SOIL_MODEL_BACKEND=tflite SOIL_TFLITE_MODEL={output_path}")
+    print("="*70)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the soil image model to TFLite')
+    parser.add_argument('--mode', choices=['dynamic', 'int8'], default='int8')
+    parser.add_argument('--threads', type=int, default=None, help='Interpreter threads for the latency test')
+    parser.add_argument('--calibration-size', type=int, default=200)
+    parser.add_argument('--eval-size', type=int, default=300)
+    args = parser.parse_args()
+    export_tflite(args.mode, args.threads, args.calibration_size, args.eval_size)
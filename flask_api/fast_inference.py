@@ -0,0 +1,170 @@
+"""
+Low-overhead inference for the soil image model
+
+keras.Model.predict builds a data adapter and a step function on every
+call, which costs several milliseconds even for a single image. Here the
+model is traced once into a tf.function with a fixed input signature and
+then called directly.
+
+TFLitePredictor serves a converted .tflite flatbuffer (see export_tflite.py)
+through the TFLite interpreter with the same call interface.
+"""
+import threading
+import numpy as np
+
+from startup_profiler import phase
+
+
+class CompiledPredictor:
+    """Call a keras model through a pre-traced tf.function"""
+
+    def __init__(self, model, img_size, batch_sizes=(1,), dtype=np.float32):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = model
+        self.img_size = img_size
+        # uint8 for serving models that rescale in the graph (export_serving_model.py)
+        self.dtype = np.dtype(dtype)
+        self._tf_dtype = tf.as_dtype(self.dtype)
+
+        # Batch axis left as None so a single trace serves every batch size
+        signature = [tf.TensorSpec([None, img_size, img_size, 3], self._tf_dtype, name='images')]
+
+        @tf.function(input_signature=signature, reduce_retracing=True)
+        def serve(images):
+            return model(images, training=False)
+
+        self._serve = serve
+        with phase('trace serving function'):
+            self._concrete = serve.get_concrete_function()
+
+        # Run each batch size once so kernels / memory pools are initialised
+        for batch_size in batch_sizes:
+            with phase(f'warmup batch {batch_size}'):
+                self(np.zeros((batch_size, img_size, img_size, 3), dtype=self.dtype))
+
+    def __call__(self, batch):
+        """Predict class probabilities for a (B, H, W, 3) batch of self.dtype"""
+        images = self._tf.convert_to_tensor(batch, dtype=self._tf_dtype)
+        return self._concrete(images).numpy()
+
+
+def without_graph_resize(model):
+    """A serving export (export_serving_model.py) minus its in-graph Resizing
+
+    The API already resizes in PIL, so it feeds uint8 at the trained size
+    straight into the rescale and the trained model instead of resizing
+    twice. Models without a 'resize' layer are returned as they are.
+    """
+    from tensorflow import keras
+
+    if 'resize' not in {layer.name for layer in model.layers}:
+        return model
+    trained = model.layers[-1]
+    img_size = trained.inputs[0].shape[1]
+    inputs = keras.Input((img_size, img_size, 3), dtype='uint8', name='images')
+    outputs = trained(model.get_layer('rescale')(inputs), training=False)
+    return keras.Model(inputs, outputs, name=model.name)
+
+
+def keras_predictor(model):
+    """Fallback path through Model.predict"""
+    return lambda batch: model.predict(batch, verbose=0)
+
+
+def load_tflite_interpreter(model_path, num_threads=None):
+    """Prefer the standalone LiteRT / tflite_runtime packages over full TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLitePredictor:
+    """Run a .tflite soil model with the same interface as CompiledPredictor
+
+    Resizing the interpreter's input means allocate_tensors() again. Each
+    size in bucket_sizes (the app uses a single image and a full
+    micro-batch, the sizes the batcher produces most) gets its own
+    interpreter, allocated on first use and never resized. Other sizes
+    share one interpreter, resized only when the size changes: padding
+    them up to a bucket costs more compute than the reallocation saves
+    (see benchmark_tflite.py). Batches beyond the largest bucket run in
+    chunks of it.
+    """
+
+    def __init__(self, model_path, img_size, num_threads=None, batch_sizes=(1,), bucket_sizes=None):
+        self.model_path = model_path
+        self.img_size = img_size
+        self.num_threads = num_threads
+        self.bucket_sizes = tuple(sorted(set(bucket_sizes or ())))
+
+        # bucket size (None: the shared one) -> (interpreter, lock); each
+        # interpreter is not thread-safe
+        self._interpreters = {}
+        self._shared_size = None
+        self._lock = threading.Lock()
+
+        interpreter, _ = self._interpreter(self.bucket_sizes[0] if self.bucket_sizes else None)
+        self._input = interpreter.get_input_details()[0]
+        self._output = interpreter.get_output_details()[0]
+
+        for batch_size in batch_sizes:
+            with phase(f'warmup batch {batch_size}'):
+                self(np.zeros((batch_size, img_size, img_size, 3), dtype=np.float32))
+
+    def _interpreter(self, size):
+        """Interpreter for batches of exactly size, or the shared one for None"""
+        with self._lock:
+            if size not in self._interpreters:
+                with phase(f'tflite interpreter batch {size or "shared"}'):
+                    interpreter = load_tflite_interpreter(self.model_path, self.num_threads)
+                    if size:
+                        self._resize(interpreter, size)
+                self._interpreters[size] = (interpreter, threading.Lock())
+            return self._interpreters[size]
+
+    def _resize(self, interpreter, size):
+        index = interpreter.get_input_details()[0]['index']
+        interpreter.resize_tensor_input(index, [size, self.img_size, self.img_size, 3])
+        interpreter.allocate_tensors()
+
+    def _quantize_input(self, batch):
+        scale, zero_point = self._input['quantization']
+        dtype = self._input['dtype']
+        if dtype == np.float32 or not scale:
+            return batch.astype(dtype, copy=False)
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, out):
+        scale, zero_point = self._output['quantization']
+        if out.dtype == np.float32 or not scale:
+            return out.astype(np.float32, copy=False)
+        return (out.astype(np.float32) - zero_point) * scale
+
+    def __call__(self, batch):
+        """Predict class probabilities for a (B, H, W, 3) float32 batch"""
+        batch = np.asarray(batch)
+        n = batch.shape[0]
+        largest = self.bucket_sizes[-1] if self.bucket_sizes else n
+        if n > largest:
+            return np.concatenate([self(batch[i:i + largest]) for i in range(0, n, largest)])
+
+        x = self._quantize_input(batch)
+        dedicated = n in self.bucket_sizes
+        interpreter, lock = self._interpreter(n if dedicated else None)
+        with lock:
+            if not dedicated and n != self._shared_size:
+                self._resize(interpreter, n)
+                self._shared_size = n
+            interpreter.set_tensor(self._input['index'], x)
+            interpreter.invoke()
+            out = interpreter.get_tensor(self._output['index'])
+        return self._dequantize_output(out)
@@ -9,6 +9,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 
+from thread_budget import clear_n_jobs
+
 print("="*70)
 print("FIXING FERTILITY MODEL")
 print("="*70)
@@ -97,6 +99,7 @@ if label_encoder:
 
 # Save FIXED models
 print(f"\n7. Saving FIXED models...")
+clear_n_jobs(model)
 joblib.dump(model, 'models/fertility_model.pkl')
 joblib.dump(scaler, 'models/fertility_scaler.pkl')
 joblib.dump(feature_cols, 'models/fertility_features.pkl')  # Without 'Output'!
@@ -0,0 +1,101 @@
+"""
+Gunicorn configuration for the Flask ML API
+
+Run from flask_api directory: gunicorn -c gunicorn.conf.py
+
+The master loads the app (and the sklearn models) once before forking,
+so workers share that memory copy-on-write instead of each holding a
+copy. TensorFlow is set up inside each worker after the fork. Every
+worker logs its unique memory (USS) once it is up, then every
+MEMORY_REPORT_SECONDS; /health and /metrics report it too.
+
+Environment:
+  PORT                   listen port (8000)
+  WEB_CONCURRENCY        worker processes (2)
+  GUNICORN_THREADS       threads per worker (16); concurrent requests in
+                         one worker are what the micro-batcher merges.
+                         Split between the admission budgets (app.py),
+                         so each model's requests have threads of their own
+  INFERENCE_THREADS      CPU threads per worker for TensorFlow, BLAS and
+                         sklearn (available cores / workers); finer
+                         overrides in thread_budget.py
+  GUNICORN_PRELOAD_TF    import (not initialise) TensorFlow in the master
+                         so its modules are shared too (1; 0 disables)
+  MEMORY_REPORT_SECONDS  0 disables the periodic report (300)
+"""
+import gc
+import os
+import sys
+import threading
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = 120
+graceful_timeout = 30
+
+wsgi_app = 'wsgi:app'
+preload_app = True
+
+# The app derives each worker's thread budget from the worker count, and
+# its admission limits from the request threads
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+os.environ.setdefault('REQUEST_THREADS', str(threads))
+
+# Before the master imports numpy / TensorFlow, so their pools start small
+from thread_budget import worker_budget, apply_env, configure_tensorflow  # noqa: E402
+apply_env(worker_budget())
+
+PRELOAD_TF = os.environ.get('GUNICORN_PRELOAD_TF', '1') == '1'
+MEMORY_REPORT_SECONDS = float(os.environ.get('MEMORY_REPORT_SECONDS', 300))
+
+
+def on_starting(server):
+    if PRELOAD_TF:
+        # Importing is fork-safe; TF only creates its thread pools and
+        # allocators on first use, which happens in the workers
+        import tensorflow  # noqa: F401
+        server.log.info("TensorFlow imported in master (shared with workers)")
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach, so collections
+    # in the workers don't write to (and un-share) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Size TensorFlow's pools for this worker before its runtime starts
+    if 'tensorflow' in sys.modules:
+        import tensorflow as tf
+        configure_tensorflow(tf, worker_budget())
+
+    import app
+    app.start_worker()
+
+
+def report_memory(log, label):
+    from metrics import process_memory
+    memory = process_memory()
+    if memory:
+        log.info("%s pid %s memory: uss %.1f MB, pss %.1f MB, rss %.1f MB", label, os.getpid(),
+                 memory['uss'] / 2**20, memory['pss'] / 2**20, memory['rss'] / 2**20)
+
+
+def when_ready(server):
+    report_memory(server.log, "Master")
+
+
+def post_worker_init(worker):
+    report_memory(worker.log, "Worker")
+    if MEMORY_REPORT_SECONDS <= 0:
+        return
+
+    def run():
+        while True:
+            time.sleep(MEMORY_REPORT_SECONDS)
+            report_memory(worker.log, "Worker")
+
+    threading.Thread(target=run, name='memory-report', daemon=True).start()
@@ -0,0 +1,118 @@
+"""
+Image preprocessing for the soil image model
+
+Turns uploaded bytes into the (IMG_SIZE, IMG_SIZE, 3) float32 array in
+[0, 1] the CNN expects. Phone photos are often 12+ megapixels, and
+decoding every pixel only to resize down to 224x224 can cost as much as
+the forward pass. The fast path avoids most of that:
+
+  - the header is read first (Image.open doesn't decode), so images with
+    absurd pixel counts are refused before any memory is spent on them
+  - JPEGs are decoded with draft(), letting libjpeg scale by 1/2, 1/4 or
+    1/8 during the DCT, to the smallest size still >= the target
+  - other formats resize with reducing_gap (a cheap integer reduce first)
+  - the uint8 pixels are scaled straight into a float32 buffer, which can
+    be a row of a batch tensor, with no intermediate float arrays; for a
+    serving model that rescales in its graph (export_serving_model.py)
+    they are copied as uint8 instead
+
+    batch = np.empty((n, 224, 224, 3), dtype=np.float32)
+    preprocess_image(img_bytes, 224, out=batch[i])
+
+IMAGE_FAST_DECODE=0 switches back to the reference pipeline (full decode,
+convert, resize), which benchmark_preprocessing.py compares against.
+"""
+import io
+import os
+import contextlib
+import numpy as np
+from PIL import Image
+
+from logging_setup import get_logger
+
+logger = get_logger('image_preprocessing')
+
+# Refuse images larger than this before decoding (default 64 megapixels)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 64_000_000))
+IMAGE_FAST_DECODE = os.environ.get('IMAGE_FAST_DECODE', '1') != '0'
+
+# Integer reduce while the image is still >= this multiple of the target,
+# then resample the rest with bicubic
+REDUCING_GAP = 3.0
+
+_SCALE = np.float32(255.0)
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an image's header reports more pixels than allowed"""
+
+    def __init__(self, size, max_pixels):
+        width, height = size
+        super().__init__(f'Image too large: {width}x{height} '
+                         f'({width * height / 1e6:.1f} MP, max {max_pixels / 1e6:.1f} MP)')
+        self.size = size
+        self.max_pixels = max_pixels
+
+
+def _no_timing(name):
+    return contextlib.nullcontext()
+
+
+def open_image(img_bytes, max_pixels=None):
+    """Open an image from bytes, checking its header dimensions (no decode yet)"""
+    max_pixels = IMAGE_MAX_PIXELS if max_pixels is None else max_pixels
+    img = Image.open(io.BytesIO(img_bytes))
+    width, height = img.size
+    if width <= 0 or height <= 0 or (max_pixels and width * height > max_pixels):
+        raise ImageTooLarge(img.size, max_pixels)
+    return img
+
+
+def to_input_array(img, out=None, dtype=np.float32):
+    """An RGB image's pixels as a (H, W, 3) array: float32 in [0, 1], or raw uint8"""
+    pixels = np.asarray(img)
+    if out is None:
+        out = np.empty(pixels.shape, dtype=dtype)
+    if out.dtype == np.uint8:
+        np.copyto(out, pixels)
+    else:
+        # Same arithmetic as np.array(img, dtype=np.float32) / 255.0
+        np.divide(pixels, _SCALE, out=out, dtype=np.float32)
+    return out
+
+
+def preprocess_image(img_bytes, img_size, out=None, timed=None, fast=None, dtype=np.float32):
+    """Decode an upload into a (img_size, img_size, 3) float32 array in [0, 1]
+
+    out, if given, is filled in place and returned; a uint8 out (or
+    dtype=np.uint8) gets the raw pixels. timed(name) is an optional
+    context manager factory for per-stage timings.
+    """
+    timed = timed or _no_timing
+    fast = IMAGE_FAST_DECODE if fast is None else fast
+
+    with timed('decode'):
+        img = open_image(img_bytes)
+        logger.debug("Original size: %s, mode: %s, format: %s", img.size, img.mode, img.format)
+        if fast and img.format == 'JPEG':
+            # Ask libjpeg for RGB at the smallest DCT scale still >= target
+            img.draft('RGB', (img_size, img_size))
+            logger.debug("Draft decode at: %s", img.size)
+        img.load()
+
+    if img.mode != 'RGB':
+        with timed('convert'):
+            img = img.convert('RGB')
+        logger.debug("Converted to RGB")
+
+    with timed('resize'):
+        if img.size != (img_size, img_size):
+            if fast:
+                img = img.resize((img_size, img_size), Image.Resampling.BICUBIC,
+                                 reducing_gap=REDUCING_GAP)
+            else:
+                img = img.resize((img_size, img_size))
+    logger.debug("Resized to: %dx%d", img_size, img_size)
+
+    with timed('normalize'):
+        return to_input_array(img, out, dtype)
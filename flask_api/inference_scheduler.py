@@ -0,0 +1,150 @@
+"""
+Dynamic micro-batching for model inference
+
+Concurrent requests submit one input each; a background thread merges
+whatever is queued into a single batch and runs the model once. A batch is
+flushed when it reaches max_batch_size or when the oldest queued request
+has waited max_wait_ms, whichever comes first. Each row of the output is
+routed back to the request that submitted it.
+
+With an input_pool (buffer_pool.TensorPool) the batch is stacked into a
+reused buffer instead of a freshly allocated array.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class InferenceScheduler:
+    """Queue single inputs and run them through predict_fn in batches"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name='model', input_pool=None):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be >= 1')
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.name = name
+        self.input_pool = input_pool
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Orders submit() against shutdown(): nothing is queued behind the sentinel
+        self._submit_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+        # Simple counters for tuning batch size / wait deadline
+        self.batches_run = 0
+        self.items_run = 0
+
+    def submit(self, item):
+        """Queue one input (without batch axis); returns a Future of its output row"""
+        future = Future()
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError(f'{self.name} scheduler is shut down')
+            self._ensure_started()
+            self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Blocking helper: submit one input and wait for its output row"""
+        return self.submit(item).result(timeout=timeout)
+
+    def shutdown(self):
+        """Stop the worker thread after the queued requests are served"""
+        with self._submit_lock:
+            self._stopped = True
+            if self._thread is not None:
+                self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        # Anything left (e.g. the worker thread died) would otherwise wait forever
+        error = RuntimeError(f'{self.name} scheduler is shut down')
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None and entry[1].set_running_or_notify_cancel():
+                entry[1].set_exception(error)
+
+    def stats(self):
+        avg = self.items_run / self.batches_run if self.batches_run else 0.0
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'batches_run': self.batches_run,
+            'items_run': self.items_run,
+            'avg_batch_size': round(avg, 2)
+        }
+
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created in the process that serves
+        # requests (e.g. after a gunicorn fork), not at import time
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f'{self.name}-batcher', daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self, first):
+        """Gather up to max_batch_size entries until first has waited max_wait"""
+        batch = [first]
+        # Counted from when the oldest entry was queued, not when it was taken
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Shutdown sentinel: serve what we have, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _predict(self, items):
+        if self.input_pool is None:
+            return np.asarray(self.predict_fn(np.stack(items)))
+        with self.input_pool.batch(len(items)) as inputs:
+            np.stack(items, out=inputs)
+            return np.asarray(self.predict_fn(inputs))
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+
+            # Drop requests whose caller already gave up
+            batch = [(item, fut) for item, fut, _ in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                outputs = self._predict([item for item, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+            for row, (_, fut) in enumerate(batch):
+                fut.set_result(outputs[row])
@@ -0,0 +1,166 @@
+"""
+Structured, non-blocking logging for the API
+
+Request threads only put log records on a bounded queue; a listener
+thread formats them (one JSON object per line by default) and writes them
+out. Each record carries the id of the request that produced it, taken
+from the X-Request-ID header or generated per request.
+
+Configuration:
+  LOG_LEVEL   DEBUG / INFO (default) / WARNING / ERROR
+  LOG_FORMAT  json (default) or text
+  LOG_QUEUE_SIZE  records buffered before new ones are dropped (10000)
+
+Use %-style arguments (logger.debug("Shape: %s", x.shape)) so messages
+below the configured level are never formatted.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOGGER_NAME = 'flask_api'
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def get_logger(name=None):
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) +
+                  f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id (if any) to every record"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = current_request_id()
+        return True
+
+
+def current_request_id():
+    try:
+        from flask import g, has_request_context
+        if has_request_context():
+            return g.get('request_id')
+    except ImportError:
+        pass
+    return None
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that owns its listener thread and never blocks the caller
+
+    The listener is (re)started lazily in whichever process emits, so it
+    survives a gunicorn fork. When the queue is full records are dropped
+    and counted instead of stalling the request thread.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # A forked child inherits the queue but not the thread
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self._listener = logging.handlers.QueueListener(
+                    self.queue, self.target, respect_handler_level=True
+                )
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Only merge the arguments here (they may be mutated after we
+        # return); JSON formatting and traceback rendering happen on the
+        # listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+_handler = None
+
+
+def setup_logging(level=None, fmt=None, stream=None):
+    """Route the flask_api loggers through the async JSON handler (idempotent)"""
+    global _handler
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.environ.get('LOG_FORMAT', 'json')).lower()
+
+    target = logging.StreamHandler(stream or sys.stdout)
+    if fmt == 'json':
+        target.setFormatter(JsonFormatter())
+    else:
+        target.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+        ))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler.stop()
+
+    _handler = AsyncQueueHandler(target, maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+    _handler.addFilter(RequestIdFilter())
+    logger.addHandler(_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+@atexit.register
+def _flush():
+    if _handler is not None:
+        _handler.stop()
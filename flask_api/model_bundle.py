@@ -0,0 +1,203 @@
+"""
+Single-file, memory-mappable bundles for the tabular models
+
+One .bundle file replaces a model's model / scaler / features (/ label
+encoder) pickles. It holds the compiled tree engine (tree_engine.py) as
+raw little-endian arrays plus a JSON header, so loading is a header parse
+and an mmap: no unpickling, no copies. The pages belong to the OS page
+cache, so every gunicorn worker mapping the same file shares one copy.
+
+Layout (all offsets 64-byte aligned):
+
+    8s   magic b'FAPIBNDL'
+    u32  format version (FORMAT_VERSION)
+    u32  header length in bytes
+         JSON header: {"meta": {...}, "arrays": {name: {dtype, shape, offset}}}
+         array data (offsets relative to the start of the data section)
+
+Arrays are stored compactly where that doesn't change a single result:
+node indices as int32, thresholds of engines that take float32 input as
+float32 rounded toward -inf (for float32 x, x <= t exactly when
+x <= that float32), and leaf values as float32 only when every value
+survives the round trip. Scaler-folded thresholds stay float64.
+
+    write_bundle('models/fertility.bundle', *pack_engine(engine, features))
+    bundle = read_bundle('models/fertility.bundle')
+    engine, scaler = engine_from_bundle(bundle)
+"""
+import os
+import json
+import mmap
+import struct
+import numpy as np
+
+from tree_engine import TreeEnsemble
+
+MAGIC = b'FAPIBNDL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+BUNDLE_SUFFIX = '.bundle'
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class BundleError(ValueError):
+    """Raised for files that aren't bundles or have an unsupported version"""
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(path, arrays, meta):
+    """Write arrays and a JSON-serialisable meta dict atomically to path"""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    entries, offset = {}, 0
+    for name, a in arrays.items():
+        entries[name] = {'dtype': a.dtype.newbyteorder('<').str, 'shape': list(a.shape), 'offset': offset}
+        offset = _align(offset + a.nbytes)
+
+    header = json.dumps({'meta': meta, 'arrays': entries}, sort_keys=True).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(data_start + entries[name]['offset'])
+            f.write(a.astype(entries[name]['dtype'], copy=False).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Bundle:
+    """A loaded bundle: meta dict and read-only arrays backed by the mapped file"""
+
+    def __init__(self, path, meta, arrays, size):
+        self.path = path
+        self.meta = meta
+        self.arrays = arrays
+        self.size = size
+
+
+def read_bundle(path):
+    """Map a bundle file; arrays are views into the (shared, read-only) mapping"""
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise BundleError(f'{path}: truncated')
+        magic, version, header_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise BundleError(f'{path}: not a model bundle')
+        if version != FORMAT_VERSION:
+            raise BundleError(f'{path}: bundle format {version}, expected {FORMAT_VERSION}')
+        header = json.loads(f.read(header_len))
+        # The mapping outlives the file object; arrays keep it alive
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    data_start = _align(_PREAMBLE.size + header_len)
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        start = data_start + entry['offset']
+        if start + count * dtype.itemsize > len(mapped):
+            raise BundleError(f'{path}: truncated ({name})')
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=start).reshape(entry['shape'])
+    return Bundle(path, header['meta'], arrays, len(mapped))
+
+
+# ==================== TREE ENGINES ====================
+
+def float32_floor(x):
+    """Largest float32 <= each float64 value"""
+    x = np.asarray(x, dtype=np.float64)
+    y = x.astype(np.float32)
+    too_big = y.astype(np.float64) > x
+    y[too_big] = np.nextafter(y[too_big], np.float32(-np.inf))
+    return y
+
+
+def _compact_index(a, n_nodes):
+    return a.astype(np.int32) if 2 * n_nodes < np.iinfo(np.int32).max else a.astype(np.int64)
+
+
+def _compact_values(a):
+    compact = a.astype(np.float32)
+    return compact if np.array_equal(compact.astype(np.float64), a) else a.astype(np.float64)
+
+
+def pack_engine(engine, features, scaler=None, meta=None):
+    """(arrays, meta) for a TreeEnsemble, plus the StandardScaler if not folded in"""
+    n_nodes = engine.n_nodes
+    if engine.input_dtype == np.float32:
+        threshold = float32_floor(engine.threshold)
+    else:
+        threshold = np.asarray(engine.threshold, dtype=np.float64)
+
+    arrays = {
+        'feature': _compact_index(engine.feature, n_nodes),
+        'threshold': threshold,
+        'children': _compact_index(engine._children, n_nodes),
+        'roots': _compact_index(engine.roots, n_nodes),
+        'value': _compact_values(engine.value),
+    }
+    if engine.init_raw is not None:
+        arrays['init_raw'] = engine.init_raw
+    if scaler is not None:
+        n = engine.n_features
+        with_mean = getattr(scaler, 'with_mean', True) and scaler.mean_ is not None
+        with_std = getattr(scaler, 'with_std', True) and scaler.scale_ is not None
+        arrays['scaler_mean'] = np.asarray(scaler.mean_ if with_mean else np.zeros(n), dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(scaler.scale_ if with_std else np.ones(n), dtype=np.float64)
+
+    classes = engine.classes_
+    meta = dict(meta or {})
+    meta.update({
+        'type': 'tree-ensemble',
+        'kind': engine.kind,
+        'classes': classes.tolist(),
+        'classes_dtype': classes.dtype.str,
+        'n_features': engine.n_features,
+        'max_depth': engine.max_depth,
+        'n_tree_classes': engine.n_tree_classes,
+        'input_dtype': engine.input_dtype.str,
+        'features': list(features),
+        'fused': scaler is None,
+    })
+    return arrays, meta
+
+
+class ArrayScaler:
+    """StandardScaler.transform from stored mean / scale (same arithmetic)"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+def engine_from_bundle(bundle):
+    """(TreeEnsemble, ArrayScaler or None) from a tree-ensemble bundle"""
+    meta, a = bundle.meta, bundle.arrays
+    if meta.get('type') != 'tree-ensemble':
+        raise BundleError(f"{bundle.path}: not a tree-ensemble bundle ({meta.get('type')})")
+
+    engine = TreeEnsemble(
+        meta['kind'], np.array(meta['classes'], dtype=meta['classes_dtype']), meta['n_features'],
+        a['feature'], a['threshold'], None, None, a['value'], a['roots'], meta['max_depth'],
+        init_raw=a.get('init_raw'), n_tree_classes=meta['n_tree_classes'],
+        input_dtype=np.dtype(meta['input_dtype']), children=a['children']
+    )
+    scaler = None
+    if 'scaler_mean' in a:
+        scaler = ArrayScaler(a['scaler_mean'], a['scaler_scale'])
+    return engine, scaler
@@ -0,0 +1,291 @@
+"""
+Lazy, on-demand model loading and hot reload
+
+Each model family is wrapped in a LazyModel that loads on first use or on a
+background thread, so Flask can answer /health while models are still
+loading. Heavy imports (TensorFlow) live inside the loader functions, so a
+worker that never touches a model never pays for its import. An optional
+warmup function runs on the loaded bundle before it is marked ready.
+
+A loaded model can be reloaded in place: the new version is loaded (and
+warmed up) in the background and swapped in with a single assignment.
+Requests that already hold the old bundle finish on it. Bundles taken
+with acquire() are reference-counted: a replaced bundle is handed to
+on_retire once the last of them has called release(). ModelWatcher triggers reloads when a
+model's artifact files change.
+"""
+import hashlib
+import os
+import threading
+import time
+import traceback
+
+from startup_profiler import phase
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+MODEL_STATES = (NOT_LOADED, LOADING, READY, FAILED)
+
+# Loaders run one at a time: unpickling imports sklearn submodules, and
+# importing those from two threads at once can deadlock on circular imports
+_load_lock = threading.Lock()
+
+
+
+class LazyModel:
+    """Load a model bundle once, on first use or in the background"""
+
+    def __init__(self, name, loader, artifacts=(), on_retire=None, warmup=None):
+        self.name = name
+        self.loader = loader
+        # warmup(bundle) -> timings dict, reported in status(); raising fails the load
+        self.warmup = warmup
+        # Files the bundle is built from: watched for changes, hashed for the version
+        self.artifacts = list(artifacts)
+        self.on_retire = on_retire
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.version = None
+        self.loaded_signature = None
+        self.reloads = 0
+        self.reload_error = None
+        self.warmup_timings = None
+
+        self._value = None
+        # id(bundle) -> [bundle, requests holding it] for acquire() / release()
+        self._holders = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._reloading = False
+
+    def _claim(self):
+        """Mark as loading; returns False if someone else already started"""
+        with self._lock:
+            if self.state != NOT_LOADED:
+                return False
+            self.state = LOADING
+            return True
+
+    def _load_version(self):
+        """Run the loader and the warmup; returns (bundle, version, warmup timings)"""
+        # Taken before loading, so a change made mid-load triggers another reload
+        self.loaded_signature = artifact_signature(self.artifacts)
+        with _load_lock, phase(f'load {self.name}'):
+            value = self.loader()
+        timings = None
+        if self.warmup:
+            with phase(f'warmup {self.name}'):
+                timings = self.warmup(value)
+        version = getattr(value, 'version', None) or artifacts_version(self.artifacts)
+        return value, version, timings
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            self._value, self.version, self.warmup_timings = self._load_version()
+            self.state = READY
+            print(f"✅ {self.name} model ready ({time.perf_counter() - start:.1f}s)")
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            print(f"❌ {self.name} model error: {e}")
+            traceback.print_exc()
+        finally:
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self._done.set()
+
+    def reload(self, wait=False):
+        """Load a fresh copy in the background and swap it in when ready
+
+        Returns False (and does nothing) if the model was never loaded, is
+        still loading, or is already reloading.
+        """
+        with self._lock:
+            if self.state not in (READY, FAILED) or self._reloading:
+                return False
+            self._reloading = True
+        thread = threading.Thread(target=self._reload, name=f'{self.name}-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self):
+        start = time.perf_counter()
+        print(f"🔄 Reloading {self.name} model...")
+        try:
+            value, version, timings = self._load_version()
+        except Exception as e:
+            # Keep serving the current version
+            self.reload_error = str(e)
+            print(f"❌ {self.name} reload failed, keeping version {self.version}: {e}")
+            traceback.print_exc()
+        else:
+            with self._lock:
+                old = self._value
+                self._value = value  # swap: new requests get the new bundle
+                idle = old is not None and id(old) not in self._holders
+            self.version = version
+            self.warmup_timings = timings
+            self.state = READY
+            self.error = self.reload_error = None
+            self.reloads += 1
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            print(f"✅ {self.name} model reloaded: version {version} ({self.load_seconds:.1f}s)")
+            # Otherwise the last release() of the old bundle retires it
+            if idle:
+                self._retire(old)
+        finally:
+            self._reloading = False
+
+    def load_async(self):
+        """Start loading on a background thread (no-op if already started)"""
+        preload([self])
+
+    def get(self, timeout=None):
+        """Return the loaded bundle, loading it now if needed; None if it failed"""
+        if self.state == READY:
+            return self._value
+        if self._claim():
+            self._load()
+        self._done.wait(timeout)
+        return self._value if self.state == READY else None
+
+    def acquire(self, timeout=None):
+        """Like get(), but the bundle isn't retired until release(bundle)"""
+        if self.get(timeout) is None:
+            return None
+        with self._lock:
+            # The current bundle: a reload may have swapped it since get()
+            value = self._value
+            self._holders.setdefault(id(value), [value, 0])[1] += 1
+        return value
+
+    def release(self, value):
+        """Drop a bundle from acquire(); retires it if it was replaced meanwhile"""
+        with self._lock:
+            holder = self._holders[id(value)]
+            holder[1] -= 1
+            if holder[1]:
+                return
+            del self._holders[id(value)]
+            if value is self._value:
+                return
+        self._retire(value)
+
+    def _retire(self, value):
+        if self.on_retire:
+            try:
+                self.on_retire(value)
+            except Exception as e:
+                print(f"⚠️  {self.name}: retiring the old version failed: {e}")
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def status(self):
+        status = {'state': self.state}
+        if self.version:
+            status['version'] = self.version
+        if self.load_seconds is not None:
+            status['load_seconds'] = self.load_seconds
+        if self.warmup_timings is not None:
+            status['warmup'] = self.warmup_timings
+        if self.reloads:
+            status['reloads'] = self.reloads
+        if self._reloading:
+            status['reloading'] = True
+        if self.error:
+            status['error'] = self.error
+        if self.reload_error:
+            status['reload_error'] = self.reload_error
+        return status
+
+
+def preload(models):
+    """Load models in order on one background thread"""
+    models = [m for m in models if m._claim()]
+    if not models:
+        return None
+
+    def run():
+        for model in models:
+            model._load()
+
+    thread = threading.Thread(target=run, name='model-preload', daemon=True)
+    thread.start()
+    return thread
+
+
+def file_version(path):
+    """Short content hash identifying a model artifact"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def artifacts_version(paths):
+    """Short hash over the content of every existing artifact"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            digest.update(f'{path}:{file_version(path)};'.encode())
+    return digest.hexdigest()[:12]
+
+
+def artifact_signature(paths):
+    """Cheap change detector: (path, mtime, size) of each artifact"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ModelWatcher:
+    """Poll model artifacts and reload a model when its files change
+
+    A change has to be stable for one full interval before the reload
+    starts, so a file that is still being copied isn't picked up half
+    written (replacing files with an atomic rename avoids the wait).
+    """
+
+    def __init__(self, models, interval=10.0):
+        self.models = list(models)
+        self.interval = float(interval)
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        # Per process: after a gunicorn fork each worker starts its own
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        pending = {}
+        while True:
+            time.sleep(self.interval)
+            for model in self.models:
+                if model.state not in (READY, FAILED) or model.loaded_signature is None:
+                    continue
+                current = artifact_signature(model.artifacts)
+                if current == model.loaded_signature:
+                    pending.pop(model.name, None)
+                elif pending.get(model.name) != current:
+                    pending[model.name] = current
+                else:
+                    print(f"🔄 {model.name}: artifacts changed")
+                    if model.reload():
+                        pending.pop(model.name, None)
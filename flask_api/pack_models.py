@@ -0,0 +1,143 @@
+"""
+Pack the tabular models into single-file, memory-mappable bundles
+
+For each model: loads the model / scaler / features (/ label encoder)
+pickles, compiles the tree ensemble (tree_engine.py), folds the scaler
+into the thresholds when possible, and writes one .bundle file
+(model_bundle.py). The bundle is read back through the same mmap path
+the API uses and checked against the original pipeline (scaler.transform
++ sklearn predict / predict_proba); it is only kept if every label and
+probability is identical.
+
+By default the scaler is folded in, which keeps the thresholds float64
+(they are compared against raw float64 features). --compact keeps the
+scaler separate instead, so thresholds are stored as float32: smaller,
+at the cost of one scaling pass per request.
+
+Output (loaded automatically by app.py when the source pickles match, or
+on their own when the pickles aren't deployed):
+  models/fertility.bundle
+  irrigation_assets/irrigation.bundle (or models/, next to its source)
+
+Run from flask_api directory: python pack_models.py [--compact] [fertility] [irrigation]
+"""
+import os
+import sys
+import time
+import warnings
+import numpy as np
+from types import SimpleNamespace
+
+from tree_engine import compile_model, fold_scaler
+from model_loader import file_version
+from model_bundle import write_bundle, read_bundle, pack_engine, engine_from_bundle, BUNDLE_SUFFIX
+from build_fused_models import MODELS, load_pickle, verification_inputs
+
+LABEL_ENCODERS = {'fertility': 'models/fertility_label_encoder.pkl'}
+
+
+def pipeline_predict(model, scaler, X):
+    with warnings.catch_warnings():
+        # The scalers were fitted on DataFrames; we pass plain arrays
+        warnings.simplefilter('ignore', UserWarning)
+        X_scaled = scaler.transform(X)
+    return model.predict(X_scaled), model.predict_proba(X_scaled)
+
+
+def raw_thresholds(engine, scaler):
+    """Split thresholds mapped back to raw feature units, to probe an unfolded engine"""
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(engine.n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(engine.n_features)
+    return SimpleNamespace(
+        feature=engine.feature, children_left=engine.children_left, n_nodes=engine.n_nodes,
+        threshold=engine.threshold * scale[engine.feature] + mean[engine.feature]
+    )
+
+
+def bundle_predict(path, X):
+    """Predict through a freshly mapped bundle, exactly as the API would"""
+    bundle = read_bundle(path)
+    engine, scaler = engine_from_bundle(bundle)
+    if scaler is not None:
+        X = scaler.transform(X)
+    return engine.predict_with_proba(X)
+
+
+def pack(name, compact=False):
+    """Build, verify and save one bundle; returns True on success"""
+    config = MODELS[name]
+    print(f"\n📦 {name}")
+
+    source = next((c for c in config['candidates'] if all(os.path.exists(p) for p in c)), None)
+    if not source:
+        print(f"  ❌ Source pickles not found: {config['candidates']}")
+        return False
+    model_path, scaler_path, features_path = source
+    sources = list(source)
+
+    model = load_pickle(model_path)
+    scaler = load_pickle(scaler_path)
+    features = list(load_pickle(features_path))
+    if hasattr(model, 'n_jobs'):
+        # Sum trees in a fixed order so the comparison is deterministic
+        model.set_params(n_jobs=1)
+
+    meta = {'name': name, 'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+    encoder_path = LABEL_ENCODERS.get(name)
+    if encoder_path and os.path.exists(encoder_path):
+        meta['label_encoder_classes'] = np.asarray(load_pickle(encoder_path).classes_).tolist()
+        sources.append(encoder_path)
+    meta['sources'] = {path: file_version(path) for path in sources}
+
+    engine = compile_model(model)
+    bundled_scaler = scaler
+    if not compact:
+        try:
+            engine, bundled_scaler = fold_scaler(engine, scaler), None
+        except ValueError as e:
+            print(f"  ⚠️  Scaler not folded ({e}), storing it in the bundle")
+    print(f"  Compiled {engine.n_trees} trees ({engine.n_nodes} nodes) from {model_path}")
+
+    arrays, meta = pack_engine(engine, features, scaler=bundled_scaler, meta=meta)
+    output_path = os.path.join(os.path.dirname(model_path), name + BUNDLE_SUFFIX)
+    tmp_path = output_path + '.check'
+    write_bundle(tmp_path, arrays, meta)
+
+    X = verification_inputs(engine if bundled_scaler is None else raw_thresholds(engine, scaler),
+                            scaler, features, config['dataset'])
+    expected_labels, expected_proba = pipeline_predict(model, scaler, X)
+    labels, proba = bundle_predict(tmp_path, X)
+    label_mismatch = int((labels != expected_labels).sum())
+    proba_mismatch = int((proba != expected_proba).any(axis=1).sum())
+    print(f"  Verified {len(X)} rows: {label_mismatch} label / {proba_mismatch} probability mismatches")
+    if label_mismatch or proba_mismatch:
+        os.remove(tmp_path)
+        print("  ❌ Bundle differs from the current pipeline, not saving")
+        return False
+
+    os.replace(tmp_path, output_path)
+    pickles_size = sum(os.path.getsize(p) for p in sources)
+    dtypes = ', '.join(f'{k}: {v.dtype}' for k, v in arrays.items())
+    print(f"  Arrays: {dtypes}")
+    print(f"  ✅ Saved: {output_path} ({os.path.getsize(output_path) / 1e6:.2f} MB, "
+          f"pickles {pickles_size / 1e6:.2f} MB)")
+    return True
+
+
+def pack_all(names=None, compact=False):
+    print("="*70)
+    print("PACKING TABULAR MODEL BUNDLES")
+    print("="*70)
+    results = {name: pack(name, compact) for name in (names or MODELS)}
+    print("\n" + "="*70)
+    for name, ok in results.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    print("="*70)
+    return all(results.values())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    compact = '--compact' in args
+    names = [a for a in args if a != '--compact'] or None
+    sys.exit(0 if pack_all(names, compact) else 1)
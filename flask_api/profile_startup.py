@@ -0,0 +1,100 @@
+"""
+Profile the API's cold start: import and model-load cost per phase
+
+Imports app.py and loads every model in this process, one after the
+other, with the startup profiler on (startup_profiler.py). Prints the
+phases sorted by wall time with the RSS each one added, writes the JSON
+report, and exits non-zero when a model fails to load or a phase is over
+its budget, so CI can catch cold-start regressions.
+
+Usage:
+  python profile_startup.py
+  python profile_startup.py --budgets startup_budgets.json
+  python profile_startup.py --budget "load soil_image=20" --rss-budget total=1500
+  python profile_startup.py --models fertility,irrigation --output profile.json
+
+Budget names are phase names as printed in the report ("import tensorflow",
+"load soil_image", "warmup batch 16", ...) or "total" for the whole start.
+"""
+import os
+import sys
+import json
+import argparse
+
+# Before anything heavy is imported
+import startup_profiler
+startup_profiler.install()
+
+import importlib
+
+# Load the models here, in order, instead of on background threads
+os.environ.setdefault('APP_FACTORY', '1')
+os.environ.setdefault('MODEL_PRELOAD', 'none')
+os.environ.setdefault('MODEL_WATCH_SECONDS', '0')
+
+
+def parse_budgets(values, option):
+    budgets = {}
+    for value in values or []:
+        name, sep, limit = value.rpartition('=')
+        if not sep or not name:
+            raise SystemExit(f"{option} expects NAME=LIMIT, got '{value}'")
+        budgets[name.strip()] = float(limit)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile API startup and check it against budgets')
+    parser.add_argument('--models', default='all', help='Comma-separated models to load (default: all)')
+    parser.add_argument('--output', default=None,
+                        help='JSON report path (default: STARTUP_PROFILE or startup_profile.json)')
+    parser.add_argument('--budgets', default=None,
+                        help='JSON file: {"seconds": {phase: s}, "rss_mb": {phase: MB}}')
+    parser.add_argument('--budget', action='append', metavar='PHASE=SECONDS',
+                        help='Wall time budget for a phase (repeatable)')
+    parser.add_argument('--rss-budget', action='append', metavar='PHASE=MB',
+                        help='RSS growth budget for a phase (repeatable)')
+    args = parser.parse_args()
+
+    seconds, rss_mb = {}, {}
+    if args.budgets:
+        with open(args.budgets) as f:
+            configured = json.load(f)
+        seconds.update(configured.get('seconds', {}))
+        rss_mb.update(configured.get('rss_mb', {}))
+    seconds.update(parse_budgets(args.budget, '--budget'))
+    rss_mb.update(parse_budgets(args.rss_budget, '--rss-budget'))
+
+    with startup_profiler.phase('import app'):
+        # (import_module bypasses the import hook, so app's own imports are listed)
+        app = importlib.import_module('app')
+
+    names = list(app.MODELS) if args.models == 'all' else [n.strip() for n in args.models.split(',')]
+    failures = []
+    for name in names:
+        if name not in app.MODELS:
+            raise SystemExit(f"Unknown model '{name}' (have: {', '.join(app.MODELS)})")
+        if app.MODELS[name].get() is None:
+            failures.append(f"{name}: failed to load ({app.MODELS[name].error})")
+
+    profile = startup_profiler.report()
+    violations = startup_profiler.check_budgets(profile, seconds, rss_mb)
+    profile['budgets'] = {'seconds': seconds, 'rss_mb': rss_mb}
+    profile['violations'] = failures + violations
+
+    print()
+    startup_profiler.print_report(profile)
+    path = startup_profiler.write_report(profile, args.output)
+    print(f"📄 Report written to {path}")
+
+    if failures or violations:
+        for message in failures + violations:
+            print(f"❌ {message}")
+        return 1
+    if seconds or rss_mb:
+        print(f"✅ All phases within budget ({len(seconds) + len(rss_mb)} budgets)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
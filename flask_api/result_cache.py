@@ -0,0 +1,120 @@
+"""
+LRU + TTL cache for soil image prediction results
+
+Keyed by a sha256 of the raw upload bytes plus the model version, so a
+re-submitted photo skips decode, resize and the forward pass entirely.
+Entries are evicted least-recently-used once the memory bound is reached,
+and expire after ttl_seconds. Versions share the cache: while a hot
+reload drains, old- and new-model requests each hit their own entries,
+and a retired version's entries are dropped with discard_version().
+Entry sizes are the deep sys.getsizeof of the payload and key.
+"""
+import sys
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def deep_sizeof(obj):
+    """Memory held by a JSON-like payload: containers plus everything in them"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item) for item in obj)
+    return size
+
+
+class ResultCache:
+    """Thread-safe, memory-bounded LRU cache with per-entry expiry"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl_seconds=3600):
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl_seconds)
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.ttl > 0
+
+    @staticmethod
+    def make_key(data, model_version):
+        digest = hashlib.sha256(data).hexdigest()
+        return f'{model_version}:{digest}'
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Return the cached payload or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, payload):
+        """Store a JSON-serialisable payload"""
+        if not self.enabled:
+            return
+        size = deep_sizeof(payload) + sys.getsizeof(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, payload)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard_version(self, model_version):
+        """Drop the entries of a model version that is no longer served"""
+        prefix = f'{model_version}:'
+        with self._lock:
+            stale = [key for key in self._entries if key.startswith(prefix)]
+            for key in stale:
+                self._drop(key)
+            if stale:
+                self.invalidations += 1
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
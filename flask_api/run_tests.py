@@ -0,0 +1,31 @@
+"""
+Run a test file's test_* functions without pytest, with a pass/fail summary
+Used from the unit test files: python test_<name>.py (pytest collects the same functions)
+"""
+import traceback
+
+
+def run(title, namespace):
+    """Call every test_* function in namespace (a module's globals()) and exit 1 on failure"""
+    print("="*70)
+    print(title)
+    print("="*70)
+
+    failed = 0
+    for name, test in list(namespace.items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+            except Exception:
+                failed += 1
+                print(f"❌ {name}: error")
+                traceback.print_exc()
+
+    print("="*70)
+    print("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    print("="*70)
+    raise SystemExit(1 if failed else 0)
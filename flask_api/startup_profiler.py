@@ -0,0 +1,230 @@
+"""
+Startup profiler: wall time and RSS per import and model-load phase
+
+Off unless STARTUP_PROFILE is set (to a JSON report path, or 1 for
+startup_profile.json). When on, every top-level import (flask,
+tensorflow, sklearn, ...) and every phase() block is recorded with its
+wall time and the change in resident memory while it ran. Phases nest:
+"import tensorflow" inside "load soil_image" is reported under it, and
+a module imported while another one is importing counts toward the
+outer import.
+
+    with phase('keras load_model'):
+        model = keras.models.load_model(path)
+
+profile_startup.py loads the whole app this way, prints the report,
+writes the JSON and fails when a phase exceeds its budget. In a normal
+server start (app.py) the report is written once the preloaded models
+are ready.
+
+Wall times are inclusive; RSS is sampled at the start and end of each
+phase, so a phase that allocates and frees shows only what it kept.
+"""
+import os
+import sys
+import json
+import time
+import builtins
+import itertools
+import threading
+from contextlib import contextmanager, nullcontext
+
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '')
+DEFAULT_REPORT_PATH = 'startup_profile.json'
+
+# Phases shorter than this are left out of the printed report (still in the JSON)
+REPORT_MIN_SECONDS = 0.005
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_original_import = builtins.__import__
+_local = threading.local()
+_lock = threading.Lock()
+_records = []
+_ids = itertools.count(1)
+_started = None
+_start_rss = None
+_enabled = False
+
+
+def rss():
+    """Current resident set size in bytes (peak RSS where /proc isn't available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def enabled():
+    return _enabled
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def _timed(name, kind):
+    stack = _stack()
+    record = {
+        'id': next(_ids),
+        'name': name,
+        'kind': kind,
+        'parent': stack[-1]['name'] if stack else None,
+        'parent_id': stack[-1]['id'] if stack else None,
+        'depth': len(stack),
+        'thread': threading.current_thread().name,
+        'start': round(time.perf_counter() - _started, 4),
+    }
+    stack.append(record)
+    start, start_rss = time.perf_counter(), rss()
+    try:
+        yield record
+    finally:
+        end_rss = rss()
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        record['rss_mb'] = round(end_rss / 1e6, 1)
+        record['rss_delta_mb'] = round((end_rss - start_rss) / 1e6, 1)
+        stack.pop()
+        with _lock:
+            _records.append(record)
+
+
+def phase(name):
+    """Record a block as a named startup phase (no-op unless profiling)"""
+    if not _enabled:
+        return nullcontext()
+    return _timed(name, 'phase')
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Only the outermost import of a module not loaded yet is recorded
+    if level or getattr(_local, 'importing', False):
+        return _original_import(name, globals, locals, fromlist, level)
+    if name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    # Named after the package, unless only a submodule of it is new
+    top = name.partition('.')[0]
+    _local.importing = True
+    try:
+        with _timed(f'import {name if top in sys.modules else top}', 'import'):
+            return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.importing = False
+
+
+def install():
+    """Start recording phases and imports (idempotent)"""
+    global _enabled, _started, _start_rss
+    if _enabled:
+        return
+    _started, _start_rss = time.perf_counter(), rss()
+    _enabled = True
+    builtins.__import__ = _timed_import
+
+
+def uninstall():
+    global _enabled
+    _enabled = False
+    builtins.__import__ = _original_import
+
+
+def reset():
+    """Forget the phases recorded so far"""
+    with _lock:
+        _records.clear()
+
+
+def report():
+    """The profile so far as a JSON-serialisable dict"""
+    with _lock:
+        phases = sorted(_records, key=lambda r: r['start'])
+    end_rss = rss()
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'pid': os.getpid(),
+        'python': sys.version.split()[0],
+        'total_seconds': round(time.perf_counter() - _started, 3) if _started else 0.0,
+        'rss_start_mb': round((_start_rss or 0) / 1e6, 1),
+        'rss_end_mb': round(end_rss / 1e6, 1),
+        'rss_delta_mb': round((end_rss - (_start_rss or 0)) / 1e6, 1),
+        'phases': phases,
+    }
+
+
+def print_report(profile, min_seconds=REPORT_MIN_SECONDS):
+    """Phases sorted by wall time, children indented under their parent"""
+    children = {}
+    for record in profile['phases']:
+        children.setdefault(record['parent_id'], []).append(record)
+
+    print("="*70)
+    print(f"STARTUP PROFILE: {profile['total_seconds']:.2f}s, RSS {profile['rss_start_mb']:.0f} MB "
+          f"-> {profile['rss_end_mb']:.0f} MB")
+    print("="*70)
+    print(f"{'seconds':>9} {'RSS MB':>9}  phase")
+    print("-"*70)
+
+    def show(parent_id, depth):
+        level = sorted(children.get(parent_id, []), key=lambda r: r['seconds'], reverse=True)
+        for record in level:
+            if record['seconds'] < min_seconds:
+                continue
+            print(f"{record['seconds']:>9.3f} {record['rss_delta_mb']:>+9.1f}  {'  ' * depth}{record['name']}")
+            show(record['id'], depth + 1)
+
+    show(None, 0)
+    hidden = sum(1 for r in profile['phases'] if r['seconds'] < min_seconds)
+    if hidden:
+        print(f"{'':>20}({hidden} phases under {min_seconds * 1000:.0f} ms not shown)")
+    print("="*70)
+
+
+def write_report(profile, path=None):
+    path = path or (STARTUP_PROFILE if STARTUP_PROFILE not in ('', '1') else DEFAULT_REPORT_PATH)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(profile, f, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+    return path
+
+
+def check_budgets(profile, seconds=None, rss_mb=None):
+    """Phases over their budget, as messages; 'total' budgets the whole startup
+
+    A name that occurs more than once (e.g. the same import in two threads)
+    is checked on its slowest / largest occurrence.
+    """
+    worst_seconds = {'total': profile['total_seconds']}
+    worst_rss = {'total': profile['rss_delta_mb']}
+    for record in profile['phases']:
+        worst_seconds[record['name']] = max(worst_seconds.get(record['name'], 0), record['seconds'])
+        worst_rss[record['name']] = max(worst_rss.get(record['name'], 0), record['rss_delta_mb'])
+
+    violations = []
+    for budgets, worst, unit in ((seconds or {}, worst_seconds, 's'), (rss_mb or {}, worst_rss, ' MB')):
+        for name, budget in budgets.items():
+            if name not in worst:
+                print(f"⚠️  Budget for unknown phase '{name}' (not run in this profile)")
+            elif worst[name] > budget:
+                violations.append(f"{name}: {worst[name]:g}{unit} > budget {budget:g}{unit}")
+    return violations
+
+
+def finish(path=None):
+    """Print and write the report; returns the report path"""
+    profile = report()
+    print_report(profile)
+    path = write_report(profile, path)
+    print(f"📄 Startup profile written to {path}")
+    return path
+
+
+if STARTUP_PROFILE:
+    install()
@@ -0,0 +1,191 @@
+"""
+Test admission control: FIFO hand-off, thread-share limits, and tabular
+latency while soil uploads saturate a real gunicorn (gthread) or uvicorn
+server running with the thread counts shipped in gunicorn.conf.py / asgi.py
+Run from flask_api directory: python -m pytest test_admission.py
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import textwrap
+import threading
+import subprocess
+import multiprocessing
+
+import requests
+
+from admission import AdmissionController, Rejected, thread_limits
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHARES = {'soil_image': 0.5, 'fertility': 0.2, 'irrigation': 0.2, 'bulk': 0.1}
+
+# The real app's admit() decorator and budgets, plus two routes standing in
+# for the model routes: a slow "soil" request and a fast "tabular" one
+SERVER_MODULE = '''
+import os, time
+os.environ.update(APP_FACTORY='1', MODEL_PRELOAD='none', MODEL_WATCH_SECONDS='0')
+{asgi_import}
+import app as api
+
+@api.app.route('/test/soil', methods=['POST'])
+@api.admit('soil_image')
+def slow_soil():
+    time.sleep(0.5)
+    return api.jsonify({{'ok': True}})
+
+@api.app.route('/test/tabular', methods=['POST'])
+@api.admit('fertility')
+def fast_tabular():
+    return api.jsonify({{'ok': True}})
+
+app = {app_expr}
+'''
+
+
+def test_thread_limits_fit_the_threads():
+    for threads in (8, 16, 32, 64):
+        limits = thread_limits(threads, SHARES)
+        assert set(limits) == set(SHARES)
+        assert all(in_flight >= 1 for in_flight, _ in limits.values()), limits
+        assert sum(in_flight + queue for in_flight, queue in limits.values()) <= threads - 1, limits
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    controller = AdmissionController('t', 1, max_queue=50, max_wait_ms=5000)
+    order, threads = [], []
+    held = controller.acquire()
+
+    def request(i):
+        acquired_at = controller.acquire()
+        order.append(i)
+        controller.release(acquired_at)
+
+    for i in range(10):
+        threads.append(threading.Thread(target=request, args=(i,)))
+        threads[-1].start()
+        while controller.queued < i + 1:
+            time.sleep(0.001)
+    controller.release(held)
+    for thread in threads:
+        thread.join()
+    assert order == list(range(10)), order
+    assert controller.in_flight == 0 and controller.queued == 0
+
+
+def test_full_queue_is_rejected():
+    controller = AdmissionController('t', 1, max_queue=0)
+    held = controller.acquire()
+    try:
+        controller.acquire()
+        raise AssertionError('admitted past max_in_flight with no queue')
+    except Rejected as e:
+        assert e.status == 429
+    controller.release(held)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def flood_soil(base_url, seconds, clients, statuses):
+    """Soil requests from many threads until seconds have passed (run in its own process)"""
+    stop = time.perf_counter() + seconds
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < stop:
+            status = session.post(f'{base_url}/test/soil', timeout=30).status_code
+            statuses.append(status)
+            if status != 200:
+                time.sleep(0.1)  # shed: retry soon (sooner than Retry-After asks)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def saturate(base_url, seconds=4.0, soil_clients=48):
+    """Flood the soil route while timing tabular requests; returns (latencies, soil statuses)"""
+    # A separate process, so the load generator's threads don't slow the timing below
+    manager = multiprocessing.Manager()
+    statuses = manager.list()
+    flood = multiprocessing.Process(target=flood_soil, args=(base_url, seconds, soil_clients, statuses))
+    flood.start()
+    time.sleep(1.0)  # let the soil budget fill up
+    latencies = []
+    session = requests.Session()
+    stop = time.perf_counter() + seconds - 1.5
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        response = session.post(f'{base_url}/test/tabular', timeout=30)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        time.sleep(0.05)
+    flood.join()
+    statuses = list(statuses)
+    manager.shutdown()
+    return latencies, statuses
+
+
+def run_server(command, module_source, env_extra=None):
+    root = tempfile.mkdtemp()
+    with open(os.path.join(root, 'admission_server.py'), 'w') as f:
+        f.write(textwrap.dedent(module_source))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, HERE]), LOG_LEVEL='warning',
+               GUNICORN_PRELOAD_TF='0', MEMORY_REPORT_SECONDS='0', **(env_extra or {}))
+    for name in ('REQUEST_THREADS', 'GUNICORN_THREADS', 'ASGI_WORKER_THREADS'):
+        env.pop(name, None)
+    return subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(base_url, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise AssertionError(f'server exited with {proc.returncode}')
+        try:
+            requests.post(f'{base_url}/test/tabular', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise AssertionError('server did not start')
+
+
+def assert_tabular_unaffected(command, app_expr, asgi_import=''):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    source = SERVER_MODULE.format(asgi_import=asgi_import, app_expr=app_expr)
+    proc = run_server([part.format(port=port) for part in command], source)
+    try:
+        wait_until_up(base_url, proc)
+        latencies, statuses = saturate(base_url)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    worst = max(latencies)
+    # Without per-budget threads, tabular requests queue behind 0.5 s soil requests
+    assert worst < 0.25, f'tabular latency {worst * 1000:.0f} ms while soil saturated'
+    assert 200 in statuses and {429, 503} & set(statuses), sorted(set(statuses))
+    return worst
+
+
+def test_gunicorn_gthread_keeps_tabular_latency_bounded():
+    worst = assert_tabular_unaffected(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', '1',
+         '-b', '127.0.0.1:{port}', 'admission_server:app'],
+        'api.app')
+    print(f"   gunicorn gthread: worst tabular latency {worst * 1000:.1f} ms")
+
+
+def test_asgi_keeps_tabular_latency_bounded():
+    worst = assert_tabular_unaffected(
+        [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', '{port}',
+         '--log-level', 'warning', 'admission_server:app'],
+        'asgi.ASGIAdapter(api.app)', asgi_import='import asgi')
+    print(f"   uvicorn + ASGI adapter: worst tabular latency {worst * 1000:.1f} ms")
@@ -0,0 +1,174 @@
+"""
+Test the manifest-driven artifact fetcher against a local file server
+Run from flask_api directory: python test_artifact_fetcher.py
+"""
+import os
+import shutil
+import tempfile
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from artifact_fetcher import (fetch_all, fetch_artifact, update_manifest, save_manifest, verify, drive_confirm_url,
+                              FetchError, SKIPPED, DOWNLOADED, RESUMED, FAILED)
+from download_models import download_models
+
+
+def make_artifacts(root, sizes=(5_000_000, 1_000, 37)):
+    """Random artifacts under root/models and a manifest describing them"""
+    os.makedirs(os.path.join(root, 'models'))
+    manifest = {'version': 1, 'artifacts': []}
+    for i, size in enumerate(sizes):
+        path = f'models/artifact_{i}.bin'
+        with open(os.path.join(root, path), 'wb') as f:
+            f.write(os.urandom(size))
+        manifest['artifacts'].append({'path': path})
+    update_manifest(manifest, root)
+    return manifest
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(root):
+    """Background HTTP server for root; returns (server, base_url)"""
+    handler = functools.partial(QuietHandler, directory=root)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def same_file(a, b):
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        return fa.read() == fb.read()
+
+
+def test_http_parallel_download_and_skip():
+    src, dst = tempfile.mkdtemp(), tempfile.mkdtemp()
+    server, base_url = serve(src)
+    try:
+        manifest = make_artifacts(src)
+        results = fetch_all(manifest, base_url=base_url, workers=3, root=dst)
+        assert all(outcome == DOWNLOADED for outcome, _ in results.values()), results
+        for entry in manifest['artifacts']:
+            assert same_file(os.path.join(src, entry['path']), os.path.join(dst, entry['path']))
+            assert not os.path.exists(os.path.join(dst, entry['path'] + '.part'))
+
+        results = fetch_all(manifest, base_url=base_url, root=dst)
+        assert all(outcome == SKIPPED for outcome, _ in results.values()), results
+    finally:
+        server.shutdown()
+        shutil.rmtree(src)
+        shutil.rmtree(dst)
+
+
+def test_resume_partial_file():
+    src, dst = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        manifest = make_artifacts(src)
+        entry = manifest['artifacts'][0]
+        os.makedirs(os.path.join(dst, 'models'))
+        with open(os.path.join(src, entry['path']), 'rb') as f, \
+                open(os.path.join(dst, entry['path'] + '.part'), 'wb') as part:
+            part.write(f.read(1_234_567))
+
+        outcome = fetch_artifact(entry, base_url='file://' + src, root=dst)
+        assert outcome == RESUMED, outcome
+        assert same_file(os.path.join(src, entry['path']), os.path.join(dst, entry['path']))
+    finally:
+        shutil.rmtree(src)
+        shutil.rmtree(dst)
+
+
+def test_corrupt_files_are_replaced_or_rejected():
+    src, dst = tempfile.mkdtemp(), tempfile.mkdtemp()
+    server, base_url = serve(src)
+    try:
+        manifest = make_artifacts(src)
+        entry = manifest['artifacts'][1]
+        dest = os.path.join(dst, entry['path'])
+
+        # A same-size file with different bytes on disk is re-downloaded
+        os.makedirs(os.path.dirname(dest))
+        with open(dest, 'wb') as f:
+            f.write(b'\0' * entry['size'])
+        assert fetch_artifact(entry, base_url=base_url, root=dst) == DOWNLOADED
+        assert same_file(os.path.join(src, entry['path']), dest)
+
+        # Bytes that never match the manifest are not renamed into place
+        with open(os.path.join(src, entry['path']), 'wb') as f:
+            f.write(os.urandom(entry['size']))
+        os.remove(dest)
+        try:
+            fetch_artifact(entry, base_url=base_url, root=dst, retries=2)
+            raise AssertionError('corrupt download was accepted')
+        except FetchError:
+            pass
+        assert not os.path.exists(dest) and not os.path.exists(dest + '.part')
+
+        # Missing on the server: fails without retrying
+        results = fetch_all({'version': 1, 'artifacts': [{'path': 'models/missing.bin'}]},
+                            base_url=base_url, root=dst)
+        assert results['models/missing.bin'][0] == FAILED
+    finally:
+        server.shutdown()
+        shutil.rmtree(src)
+        shutil.rmtree(dst)
+
+
+def test_min_size_without_digest():
+    root = tempfile.mkdtemp()
+    try:
+        path = os.path.join(root, 'model.pkl')
+        with open(path, 'wb') as f:
+            f.write(b'<html>quota exceeded</html>')
+        assert not verify(path, {'path': 'model.pkl', 'size': None, 'sha256': None, 'min_size': 1000})
+        assert verify(path, {'path': 'model.pkl', 'size': None, 'sha256': None, 'min_size': 10})
+    finally:
+        shutil.rmtree(root)
+
+
+def test_unverified_manifest_needs_an_opt_out():
+    src, dst = tempfile.mkdtemp(), tempfile.mkdtemp()
+    server, base_url = serve(src)
+    cwd = os.getcwd()
+    try:
+        manifest = make_artifacts(src, sizes=(2_000,))
+        manifest['artifacts'][0].update(sha256=None, size=None, min_size=1000)
+        manifest_path = os.path.join(dst, 'model_manifest.json')
+        save_manifest(manifest, manifest_path)
+        os.chdir(dst)
+        assert not download_models(base_url, manifest_path=manifest_path, allow_unverified=False)
+        assert not os.path.exists(manifest['artifacts'][0]['path'])
+
+        # Opted out: fetched, checked against min_size only
+        download_models(base_url, manifest_path=manifest_path, allow_unverified=True)
+        assert same_file(os.path.join(src, manifest['artifacts'][0]['path']), manifest['artifacts'][0]['path'])
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(src)
+        shutil.rmtree(dst)
+
+
+def test_drive_confirm_page():
+    url = 'https://drive.google.com/uc?export=download&id=abc'
+    page = """<html><body><p>Google Drive can't scan this file for viruses.</p>
+    <form id="download-form" action="https://drive.usercontent.google.com/download" method="get">
+    <input type="submit" id="uc-download-link" value="Download anyway"/>
+    <input type="hidden" name="id" value="abc"><input type="hidden" name="export" value="download">
+    <input type="hidden" name="confirm" value="t"><input type="hidden" name="uuid" value="1-2&amp;3">
+    </form></body></html>"""
+    assert drive_confirm_url(url, page) == \
+        'https://drive.usercontent.google.com/download?id=abc&export=download&confirm=t&uuid=1-2%263'
+    assert drive_confirm_url(url, '<html></html>', {'download_warning_123': 'Tok3n'}) == url + '&confirm=Tok3n'
+    assert drive_confirm_url(url, '<a href="/uc?export=download&amp;confirm=xYz_1&amp;id=abc">') == \
+        url + '&confirm=xYz_1'
+    assert drive_confirm_url(url, '<html>Quota exceeded</html>') is None
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING ARTIFACT FETCHER", globals())
@@ -0,0 +1,64 @@
+"""
+Test the streamed CSV scoring routes on undecodable or malformed uploads
+Run from flask_api directory: python -m pytest test_csv_stream.py
+"""
+import os
+import json
+from types import SimpleNamespace
+
+os.environ.update(APP_FACTORY='1', MODEL_PRELOAD='none', MODEL_WATCH_SECONDS='0')
+import app as api
+
+# Stand-in for a tabular model: scores each row as the sum of its features
+BUNDLE = SimpleNamespace(features=['a', 'b'])
+MODEL = SimpleNamespace(name='test', get=lambda: BUNDLE)
+
+
+def score_sum(bundle, X):
+    return [{'success': True, 'score': float(total)} for total in X.sum(axis=1)]
+
+
+@api.app.route('/test/stream', methods=['POST'])
+def stream_test_scores():
+    return api.stream_csv_scores(MODEL, score_sum)
+
+
+def post_csv(body):
+    client = api.app.test_client()
+    return client.post('/test/stream', data=body, content_type='text/csv')
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_rows_are_scored():
+    lines = ndjson(post_csv(b'a,b\n1,2\n3,x\n'))
+    assert lines[0] == {'row': 1, 'success': True, 'score': 3.0}
+    assert lines[1]['row'] == 2 and not lines[1]['success']
+    assert lines[-1] == {'summary': {'scored': 1, 'failed': 1}}
+
+
+def test_undecodable_header_is_a_json_400():
+    response = post_csv(b'a,\xff\n1,2\n')
+    assert response.status_code == 400
+    assert 'Could not read CSV' in response.get_json()['error']
+
+
+def test_undecodable_row_ends_with_error_and_summary():
+    # Past the TextIOWrapper's first read, so the header decodes fine
+    good_rows = b'1,2\n' * 5000
+    lines = ndjson(post_csv(b'a,b\n' + good_rows + b'5,\xff\n'))
+    scored = lines[-1]['summary']['scored']
+    # Rows decoded along with the bad byte are lost; the rest are scored
+    assert 0 < scored < 5000 and lines[-1]['summary']['failed'] == 0
+    assert f'Could not read CSV after row {scored}' in lines[-2]['error']
+    assert len(lines) == scored + 2
+
+
+def test_malformed_row_ends_with_error_and_summary():
+    # A field over the csv module's size limit
+    lines = ndjson(post_csv(b'a,b\n1,2\n3,"' + b'4' * 200000 + b'"\n'))
+    assert lines[0] == {'row': 1, 'success': True, 'score': 3.0}
+    assert 'Could not read CSV after row 1' in lines[-2]['error']
+    assert lines[-1] == {'summary': {'scored': 1, 'failed': 0}}
@@ -0,0 +1,106 @@
+"""
+Test the memory-mapped model bundle format
+Run from flask_api directory: python test_model_bundle.py
+"""
+import os
+import tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+
+from tree_engine import compile_model, fold_scaler
+from model_bundle import (write_bundle, read_bundle, pack_engine, engine_from_bundle,
+                          float32_floor, BundleError)
+
+
+def make_data(n=400, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features)) * [1, 10, 100, 0.1, 5, 50]
+    y = (X[:, 0] + X[:, 1] / 10 > 0).astype(int) + (X[:, 2] > 50)
+    return X, y
+
+
+def round_trip(arrays, meta):
+    fd, path = tempfile.mkstemp(suffix='.bundle')
+    os.close(fd)
+    write_bundle(path, arrays, meta)
+    return path, read_bundle(path)
+
+
+def test_arrays_round_trip_as_mapped_views():
+    arrays = {'a': np.arange(10, dtype=np.int32), 'b': np.linspace(0, 1, 7).reshape(7, 1)}
+    path, bundle = round_trip(arrays, {'name': 'test'})
+    try:
+        assert bundle.meta == {'name': 'test'}
+        for name, a in arrays.items():
+            assert np.array_equal(bundle.arrays[name], a) and bundle.arrays[name].dtype == a.dtype
+            assert not bundle.arrays[name].flags.writeable
+    finally:
+        os.remove(path)
+
+
+def test_bad_files_are_rejected():
+    fd, path = tempfile.mkstemp(suffix='.bundle')
+    os.close(fd)
+    try:
+        with open(path, 'wb') as f:
+            f.write(b'not a bundle at all')
+        try:
+            read_bundle(path)
+            raise AssertionError('garbage accepted as a bundle')
+        except BundleError:
+            pass
+
+        write_bundle(path, {'a': np.arange(1000.0)}, {})
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 100)
+        try:
+            read_bundle(path)
+            raise AssertionError('truncated bundle accepted')
+        except BundleError:
+            pass
+    finally:
+        os.remove(path)
+
+
+def test_float32_floor_keeps_comparisons_exact():
+    rng = np.random.default_rng(1)
+    t = rng.normal(size=10_000) * 100
+    t32 = float32_floor(t)
+    assert (t32.astype(np.float64) <= t).all()
+    x = np.concatenate([t.astype(np.float32), np.nextafter(t32, np.float32(np.inf)), t32])
+    for value in rng.choice(t, 200):
+        f = float32_floor(np.array([value]))[0]
+        assert np.array_equal(x <= value, x <= f)
+
+
+def test_engines_predict_identically_from_bundle():
+    X, y = make_data()
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    for model in (RandomForestClassifier(n_estimators=20, random_state=0, n_jobs=1),
+                  GradientBoostingClassifier(n_estimators=20, random_state=0)):
+        model.fit(X_scaled, y)
+        expected = model.predict(X_scaled), model.predict_proba(X_scaled)
+        features = [f'f{i}' for i in range(X.shape[1])]
+        engine = compile_model(model)
+
+        for fused in (True, False):
+            packed = fold_scaler(engine, scaler) if fused else engine
+            path, bundle = round_trip(*pack_engine(packed, features, scaler=None if fused else scaler))
+            try:
+                loaded, bundle_scaler = engine_from_bundle(bundle)
+                assert (bundle_scaler is None) == fused
+                assert bundle.meta['features'] == features
+                X_in = X if fused else bundle_scaler.transform(X)
+                labels, proba = loaded.predict_with_proba(X_in)
+                name = f'{type(model).__name__} fused={fused}'
+                assert np.array_equal(labels, expected[0]), name
+                assert np.array_equal(proba, expected[1]), name
+            finally:
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING MODEL BUNDLES", globals())
@@ -0,0 +1,117 @@
+"""
+Test that the uint8 serving export matches the NumPy preprocessing
+(PIL resize, then / 255.0) it replaces
+Run from flask_api directory: python test_serving_model.py
+"""
+import io
+import os
+import glob
+import numpy as np
+from PIL import Image
+
+from export_serving_model import build_serving_model
+from export_tflite import KERAS_MODEL_PATHS
+from fast_inference import CompiledPredictor, without_graph_resize
+from image_preprocessing import preprocess_image
+
+IMG_SIZE = 96
+# Rescaling multiplies by 1/255 where NumPy divides by 255: inputs differ by
+# at most one float32 ulp, which the network may amplify slightly
+MAX_PROB_DIFF = 1e-5
+
+
+def make_model(img_size=IMG_SIZE, num_classes=3):
+    """Same architecture as train_soil_image_model.py, small and untrained"""
+    from tensorflow import keras
+
+    base = keras.applications.MobileNetV2(input_shape=(img_size, img_size, 3), alpha=0.35,
+                                          include_top=False, weights=None)
+    model = keras.Sequential([
+        base,
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(num_classes, activation='softmax')
+    ])
+    model.build((None, img_size, img_size, 3))
+    return model
+
+
+def make_images(n=8, seed=0):
+    """JPEG and PNG bytes of assorted sizes and modes"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(n):
+        height, width = rng.integers(60, 400, size=2)
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        img = Image.fromarray(pixels)
+        if i % 3 == 2:
+            img = img.convert('L')
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG' if i % 2 else 'PNG')
+        images.append(buffer.getvalue())
+    return images
+
+
+def assert_equivalent(model, img_size, images):
+    reference = CompiledPredictor(model, img_size)
+    serving = CompiledPredictor(build_serving_model(model, img_size), img_size, dtype=np.uint8)
+
+    x_float = np.stack([preprocess_image(b, img_size, fast=False) for b in images])
+    x_uint8 = np.stack([preprocess_image(b, img_size, fast=False, dtype=np.uint8) for b in images])
+    assert x_uint8.dtype == np.uint8 and x_uint8.nbytes * 4 == x_float.nbytes
+
+    ref_probs, serving_probs = reference(x_float), serving(x_uint8)
+    diff = np.abs(ref_probs - serving_probs).max()
+    assert diff <= MAX_PROB_DIFF, f'probabilities differ (max |diff| {diff:.3e})'
+    assert np.array_equal(ref_probs.argmax(axis=1), serving_probs.argmax(axis=1)), 'top-1 differs'
+
+
+def test_uint8_input_matches_numpy_preprocessing():
+    assert_equivalent(make_model(), IMG_SIZE, make_images())
+
+
+def test_in_graph_resize():
+    from tensorflow import keras
+
+    model = make_model()
+    serving = build_serving_model(model, IMG_SIZE, input_size=2 * IMG_SIZE)
+    assert serving.inputs[0].shape[1:] == (2 * IMG_SIZE, 2 * IMG_SIZE, 3)
+    assert isinstance(serving.get_layer('resize'), keras.layers.Resizing)
+    x = np.random.default_rng(1).integers(0, 256, (2, 2 * IMG_SIZE, 2 * IMG_SIZE, 3), dtype=np.uint8)
+    probs = CompiledPredictor(serving, 2 * IMG_SIZE, dtype=np.uint8)(x)
+    assert probs.shape == (2, 3) and np.allclose(probs.sum(axis=1), 1, atol=1e-5)
+
+
+def test_api_skips_in_graph_resize():
+    """Fed at the trained size, the export without its Resizing matches the float model"""
+    model = make_model()
+    serving = without_graph_resize(build_serving_model(model, IMG_SIZE, input_size=2 * IMG_SIZE))
+    assert 'resize' not in {layer.name for layer in serving.layers}
+    assert serving.inputs[0].shape[1:] == (IMG_SIZE, IMG_SIZE, 3)
+
+    images = make_images()
+    x_float = np.stack([preprocess_image(b, IMG_SIZE, fast=False) for b in images])
+    x_uint8 = np.stack([preprocess_image(b, IMG_SIZE, fast=False, dtype=np.uint8) for b in images])
+    ref_probs = CompiledPredictor(model, IMG_SIZE)(x_float)
+    serving_probs = CompiledPredictor(serving, IMG_SIZE, dtype=np.uint8)(x_uint8)
+    assert np.abs(ref_probs - serving_probs).max() <= MAX_PROB_DIFF
+
+
+def test_trained_model():
+    from tensorflow import keras
+
+    model_path = next((p for p in KERAS_MODEL_PATHS if os.path.exists(p)), None)
+    if not model_path:
+        print("   ⏭️  No trained soil model found, skipping")
+        return
+    model = keras.models.load_model(model_path, compile=False)
+    img_size = model.inputs[0].shape[1]
+    images = []
+    for path in sorted(glob.glob('datasets/soil_images/*/*'))[:32]:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    assert_equivalent(model, img_size, images or make_images())
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING SERVING EXPORT AGAINST NUMPY PREPROCESSING", globals())
@@ -0,0 +1,97 @@
+"""
+Test the startup profiler's phase nesting, import timing and budgets
+Run from flask_api directory: python test_startup_profiler.py
+"""
+import os
+import sys
+import mmap
+import json
+import tempfile
+from contextlib import contextmanager
+
+import startup_profiler
+from startup_profiler import phase
+
+
+@contextmanager
+def profiling():
+    """A fresh profile for one test: recording on inside the block only"""
+    startup_profiler.reset()
+    startup_profiler.install()
+    try:
+        yield
+    finally:
+        startup_profiler.uninstall()
+
+
+def touched_pages(size):
+    """Anonymous mapping with every page written: new resident memory even
+    where the allocator would reuse pages freed by an earlier test"""
+    block = mmap.mmap(-1, size)
+    block[::mmap.PAGESIZE] = b'x' * len(range(0, size, mmap.PAGESIZE))
+    return block
+
+
+def by_name(profile):
+    return {record['name']: record for record in profile['phases']}
+
+
+def test_phases_nest_and_record_memory():
+    with profiling():
+        with phase('outer'):
+            with phase('inner'):
+                block = touched_pages(50_000_000)
+        records = by_name(startup_profiler.report())
+    assert records['inner']['parent'] == 'outer' and records['inner']['depth'] == 1
+    assert records['outer']['seconds'] >= records['inner']['seconds']
+    assert records['inner']['rss_delta_mb'] >= 40, records['inner']
+    block.close()
+
+
+def test_imports_are_timed_once_at_the_outermost_level():
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, 'profiled_outer.py'), 'w') as f:
+            f.write('import profiled_inner\n')
+        with open(os.path.join(root, 'profiled_inner.py'), 'w') as f:
+            f.write('VALUE = 1\n')
+        sys.path.insert(0, root)
+        try:
+            with profiling(), phase('loading'):
+                import profiled_outer  # noqa: F401
+                import profiled_outer  # noqa: F401,F811 (already loaded: not recorded again)
+        finally:
+            sys.path.remove(root)
+            for name in ('profiled_outer', 'profiled_inner'):
+                sys.modules.pop(name, None)
+    records = [r for r in startup_profiler.report()['phases'] if r['name'].startswith('import profiled')]
+    assert [r['name'] for r in records] == ['import profiled_outer'], records
+    assert records[0]['parent'] == 'loading'
+
+
+def test_budgets_report_only_the_phases_over_them():
+    with profiling():
+        with phase('inner'):
+            block = touched_pages(10_000_000)
+        profile = startup_profiler.report()
+    block.close()
+    inner = by_name(profile)['inner']
+    violations = startup_profiler.check_budgets(
+        profile, seconds={'inner': inner['seconds'] + 1, 'total': 0}, rss_mb={'inner': 1})
+    assert len(violations) == 2, violations
+    assert any(v.startswith('total:') for v in violations)
+    assert any(v.startswith('inner:') and 'MB' in v for v in violations)
+
+
+def test_report_is_written_as_json():
+    with profiling(), phase('work'):
+        sum(range(100_000))
+    with tempfile.TemporaryDirectory() as root:
+        path = startup_profiler.write_report(startup_profiler.report(), os.path.join(root, 'profile.json'))
+        with open(path) as f:
+            profile = json.load(f)
+    assert profile['phases'] and profile['total_seconds'] > 0
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING STARTUP PROFILER", globals())
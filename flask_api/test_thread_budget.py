@@ -0,0 +1,62 @@
+"""
+Test the per-worker thread budget
+Run from flask_api directory: python test_thread_budget.py
+"""
+import os
+from unittest import mock
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier, VotingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from thread_budget import worker_budget, apply_env, set_n_jobs, clear_n_jobs, BLAS_ENV_VARS
+
+
+def budget_with(cores, **env):
+    with mock.patch.dict(os.environ, {k: str(v) for k, v in env.items()}, clear=True), \
+            mock.patch('thread_budget.available_cores', return_value=cores):
+        return worker_budget()
+
+
+def test_budget_splits_cores_between_workers():
+    budget = budget_with(8, WEB_CONCURRENCY=2)
+    assert budget['threads'] == 4 and budget['tf_intra_op'] == 4 and budget['blas'] == 4
+    assert budget['n_jobs'] == 4 and budget['tf_inter_op'] == 1
+    # Never below one thread, even with more workers than cores
+    assert budget_with(2, WEB_CONCURRENCY=4)['threads'] == 1
+    assert budget_with(8)['threads'] == 8
+
+
+def test_explicit_settings_win():
+    budget = budget_with(8, WEB_CONCURRENCY=2, INFERENCE_THREADS=3, TF_INTER_OP_THREADS=2, SKLEARN_N_JOBS=1)
+    assert budget['threads'] == 3 and budget['tf_intra_op'] == 3
+    assert budget['tf_inter_op'] == 2 and budget['n_jobs'] == 1
+
+    with mock.patch.dict(os.environ, {'OMP_NUM_THREADS': '7'}, clear=True):
+        apply_env(budget)
+        assert os.environ['OMP_NUM_THREADS'] == '7'
+        assert all(os.environ[name] in ('3', '7') for name in BLAS_ENV_VARS)
+        assert os.environ['TF_NUM_INTRAOP_THREADS'] == '3'
+
+
+def test_n_jobs_is_replaced_in_nested_estimators():
+    forest = RandomForestClassifier(n_jobs=-1)
+    assert set_n_jobs(forest, 2) == 1 and forest.n_jobs == 2
+
+    voting = VotingClassifier([('rf', RandomForestClassifier(n_jobs=-1)), ('lr', LogisticRegression())], n_jobs=-1)
+    pipeline = make_pipeline(StandardScaler(), voting)
+    assert set_n_jobs(pipeline, 1) >= 3
+    assert voting.n_jobs == 1 and voting.estimators[0][1].n_jobs == 1
+    assert set_n_jobs(object(), 1) == 0
+
+
+def test_training_n_jobs_is_not_pickled():
+    forest = RandomForestClassifier(n_jobs=-1)
+    assert clear_n_jobs(forest) == 1 and forest.n_jobs is None
+    # Estimators without n_jobs are left alone
+    assert clear_n_jobs(GradientBoostingClassifier()) == 0
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING THREAD BUDGET", globals())
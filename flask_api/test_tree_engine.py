@@ -0,0 +1,118 @@
+"""
+Test that the flat-array tree engine matches sklearn exactly
+Run from flask_api directory: python test_tree_engine.py
+"""
+import os
+import pickle
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+
+from tree_engine import compile_model, fold_scaler, CHUNK_ROWS
+
+
+def make_data(n_classes, n_samples=1500, n_features=12, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_samples, n_features))
+    score = X[:, 0] + 0.5 * X[:, 1] - X[:, 2] * X[:, 3] + rng.normal(0, 0.5, n_samples)
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+def assert_matches(model, X):
+    # n_jobs=1 so sklearn itself sums trees in a fixed order
+    if hasattr(model, 'n_jobs'):
+        model.set_params(n_jobs=1)
+    engine = compile_model(model)
+    labels, proba = engine.predict_with_proba(X)
+
+    assert np.array_equal(labels, model.predict(X)), 'labels differ'
+    assert np.array_equal(proba, model.predict_proba(X)), \
+        f'probabilities differ (max |diff| {np.abs(proba - model.predict_proba(X)).max():.3e})'
+    return engine
+
+
+def test_random_forest_multiclass():
+    # Same settings as train_fertility.py
+    X, y = make_data(3)
+    model = RandomForestClassifier(n_estimators=200, max_depth=15, min_samples_split=10,
+                                   min_samples_leaf=4, random_state=42, class_weight='balanced')
+    model.fit(X[:1000], y[:1000])
+    assert_matches(model, X[1000:])
+
+
+def test_random_forest_binary_string_labels():
+    X, y = make_data(2)
+    labels = np.array(['dry', 'wet'])[y]
+    model = RandomForestClassifier(n_estimators=50, random_state=0).fit(X[:1000], labels[:1000])
+    assert_matches(model, X[1000:])
+
+
+def test_gradient_boosting_binary():
+    # Same settings as retrain_irrigation_for_render.py
+    X, y = make_data(2, n_features=5)
+    model = GradientBoostingClassifier(n_estimators=150, learning_rate=0.1, max_depth=5,
+                                       min_samples_split=10, min_samples_leaf=5, random_state=42)
+    model.fit(X[:1000], y[:1000])
+    assert_matches(model, X[1000:])
+
+
+def test_gradient_boosting_multiclass():
+    X, y = make_data(3, n_features=5)
+    for init in [None, 'zero']:
+        model = GradientBoostingClassifier(n_estimators=40, max_depth=3, init=init, random_state=1)
+        model.fit(X[:1000], y[:1000])
+        assert_matches(model, X[1000:])
+
+
+def test_large_batch_is_chunked():
+    X, y = make_data(3, n_samples=CHUNK_ROWS * 2 + 17)
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X[:500], y[:500])
+    assert_matches(model, X)
+
+
+def test_thresholds_compare_in_float32():
+    # Values that only differ from a split threshold after the float32 cast
+    X, y = make_data(2, n_features=5)
+    model = GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0).fit(X, y)
+    thresholds = np.concatenate([est.tree_.threshold for est in model.estimators_.ravel()])
+    thresholds = thresholds[thresholds != -2]
+    X_edge = np.repeat(thresholds[:, None], 5, axis=1)
+    X_edge = np.concatenate([X_edge, np.nextafter(X_edge, np.inf), np.nextafter(X_edge, -np.inf)])
+    assert_matches(model, X_edge)
+
+
+def test_fold_scaler_matches_pipeline():
+    X, y = make_data(3)
+    X = X * np.arange(1, 13) * 7.3 + 40  # raw, unscaled units
+    for model in [RandomForestClassifier(n_estimators=30, random_state=0),
+                  GradientBoostingClassifier(n_estimators=30, max_depth=3, random_state=0)]:
+        scaler = StandardScaler().fit(X[:1000])
+        model.fit(scaler.transform(X[:1000]), y[:1000])
+        fused = fold_scaler(compile_model(model), scaler)
+
+        # Held-out rows plus raw values at / around every folded threshold
+        split = fused.children_left != np.arange(fused.n_nodes)
+        edges = np.repeat(X[1000:1001], split.sum(), axis=0)
+        edges[np.arange(split.sum()), fused.feature[split]] = fused.threshold[split]
+        for rows in [X[1000:], edges, np.nextafter(edges, np.inf), np.nextafter(edges, -np.inf)]:
+            labels, proba = fused.predict_with_proba(rows)
+            expected = scaler.transform(rows)
+            assert np.array_equal(labels, model.predict(expected)), 'fused labels differ'
+            assert np.array_equal(proba, model.predict_proba(expected)), 'fused probabilities differ'
+
+
+def test_committed_irrigation_model():
+    path = 'irrigation_assets/irrigation_model.pkl'
+    if not os.path.exists(path):
+        print("   ⏭️  irrigation_assets not found, skipping")
+        return
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    rng = np.random.default_rng(7)
+    assert_matches(model, rng.normal(size=(2000, model.n_features_in_)))
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING TREE ENGINE AGAINST SKLEARN", globals())
@@ -0,0 +1,59 @@
+"""
+Test the warmup plan helpers (batch sizes, representative inputs)
+Run from flask_api directory: python test_warmup.py
+"""
+import io
+import numpy as np
+from types import SimpleNamespace
+from PIL import Image
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from tree_engine import compile_model, fold_scaler
+from warmup import parse_sizes, default_batch_sizes, sample_photo, representative_rows, warm_tabular_model
+
+
+def test_batch_size_plans():
+    assert default_batch_sizes(16, 32) == (1, 2, 4, 8, 16, 32)
+    assert default_batch_sizes(12) == (1, 2, 4, 8, 12)
+    assert parse_sizes('16, 1,4,4', (1,)) == (1, 4, 16)
+    assert parse_sizes('', (1, 8)) == (1, 8)
+    try:
+        parse_sizes('0,4', (1,))
+        raise AssertionError('zero batch size accepted')
+    except ValueError:
+        pass
+
+
+def test_sample_photo_is_a_jpeg():
+    img = Image.open(io.BytesIO(sample_photo()))
+    assert img.format == 'JPEG' and img.size == (1280, 960)
+
+
+def test_representative_rows_reach_many_leaves():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 4)) * [1, 10, 100, 1000] + [0, 50, 500, 0]
+    y = (X[:, 0] > 0).astype(int) + (X[:, 2] > 500)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(scaler.transform(X), y)
+    engine = compile_model(model)
+    features = ['a', 'b', 'c', 'd']
+
+    for bundle in (SimpleNamespace(engine=engine, scaler=scaler, fused=False, features=features),
+                   SimpleNamespace(engine=fold_scaler(engine, scaler), scaler=None, fused=True,
+                                   features=features)):
+        rows = representative_rows(bundle, 256)
+        assert rows.shape == (256, 4)
+        # Rows are in raw units, around the training data
+        assert np.all(np.abs(rows.mean(axis=0) - X.mean(axis=0)) < 3 * X.std(axis=0))
+        labels = model.predict(scaler.transform(rows))
+        assert len(set(labels)) == 3, set(labels)
+
+        timings = warm_tabular_model(bundle, lambda b, X: b.engine.predict_with_proba(
+            X if b.fused else b.scaler.transform(X)), (1, 64))
+        assert set(timings['rows']) == {'1', '64'} and timings['seconds'] >= 0
+
+
+if __name__ == '__main__':
+    from run_tests import run
+    run("TESTING WARMUP PLAN", globals())
@@ -0,0 +1,115 @@
+"""
+Per-worker CPU thread budget for inference
+
+Every pool that can spin up threads defaults to "all cores": TensorFlow's
+intra-op pool, BLAS / OpenMP, and the n_jobs=-1 the training scripts
+used to pickle into the forests. With several gunicorn workers on one
+box each worker then runs cores x workers threads and they fight over
+the CPUs, which shows up as tail latency. Here one budget per worker,
+cores // workers, sizes all of them.
+
+    budget = worker_budget()
+    apply_env(budget)        # before numpy / TensorFlow are imported
+    limit_blas(budget)       # after, for pools that already exist
+    configure_tensorflow(tf, budget)
+    set_n_jobs(model, budget['n_jobs'])
+
+Environment (explicit values win over the derived budget):
+  WEB_CONCURRENCY       worker processes sharing the machine (1)
+  INFERENCE_THREADS     threads per worker (available cores // workers)
+  TF_INTRA_OP_THREADS   TensorFlow intra-op pool (INFERENCE_THREADS)
+  TF_INTER_OP_THREADS   TensorFlow inter-op pool (1)
+  BLAS_THREADS          OpenMP / BLAS pools (INFERENCE_THREADS)
+  SKLEARN_N_JOBS        n_jobs of the loaded sklearn models (INFERENCE_THREADS)
+"""
+import os
+
+# Read by the BLAS / OpenMP runtimes when they start, i.e. at numpy import
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def available_cores():
+    """CPUs this process may run on, capped by a cgroup (container) CPU quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return max(1, int(value)) if value else default
+
+
+def worker_budget():
+    """Thread counts for one worker process"""
+    cores = available_cores()
+    workers = _env_int('WEB_CONCURRENCY', 1)
+    threads = _env_int('INFERENCE_THREADS', max(1, cores // workers))
+    return {
+        'cores': cores,
+        'workers': workers,
+        'threads': threads,
+        'tf_intra_op': _env_int('TF_INTRA_OP_THREADS', threads),
+        'tf_inter_op': _env_int('TF_INTER_OP_THREADS', 1),
+        'blas': _env_int('BLAS_THREADS', threads),
+        'n_jobs': _env_int('SKLEARN_N_JOBS', threads),
+    }
+
+
+def apply_env(budget):
+    """Export the budget for runtimes that read it at start-up (keeps explicit settings)"""
+    for name in BLAS_ENV_VARS:
+        os.environ.setdefault(name, str(budget['blas']))
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(budget['tf_intra_op']))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', str(budget['tf_inter_op']))
+
+
+def limit_blas(budget):
+    """Resize BLAS / OpenMP pools that are already loaded; False without threadpoolctl"""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return False
+    threadpool_limits(limits=budget['blas'])
+    return True
+
+
+def configure_tensorflow(tf, budget):
+    """Size TensorFlow's pools; False once its runtime has started (too late to change)"""
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(budget['tf_intra_op'])
+        tf.config.threading.set_inter_op_parallelism_threads(budget['tf_inter_op'])
+        return True
+    except RuntimeError:
+        return False
+
+
+def set_n_jobs(estimator, n_jobs):
+    """Set n_jobs on an sklearn estimator and any nested ones; returns how many"""
+    if not hasattr(estimator, 'get_params'):
+        return 0
+    params = [name for name in estimator.get_params(deep=True)
+              if name == 'n_jobs' or name.endswith('__n_jobs')]
+    if params:
+        estimator.set_params(**{name: n_jobs for name in params})
+    return len(params)
+
+
+def clear_n_jobs(estimator):
+    """Reset n_jobs before a training script pickles the model
+
+    n_jobs=-1 speeds up fitting, but pickled it would have every serving
+    worker use all cores. Serving sets n_jobs from the worker budget
+    (set_n_jobs above), so the artifact carries the sklearn default.
+    """
+    return set_n_jobs(estimator, None)
@@ -10,6 +10,8 @@ from sklearn.metrics import classification_report, accuracy_score, confusion_mat
 import joblib
 import os
 
+from thread_budget import clear_n_jobs
+
 print("="*70)
 print("TRAINING SOIL FERTILITY MODEL")
 print("="*70)
@@ -130,6 +132,7 @@ print(feature_importance.head())
 print(f"\n💾 Saving model...")
 os.makedirs('models', exist_ok=True)
 
+clear_n_jobs(model)
 joblib.dump(model, 'models/fertility_model.pkl')
 joblib.dump(scaler, 'models/fertility_scaler.pkl')
 joblib.dump(feature_cols, 'models/fertility_features.pkl')
@@ -11,6 +11,8 @@ from sklearn.metrics import classification_report, accuracy_score, confusion_mat
 import joblib
 import os
 
+from thread_budget import clear_n_jobs
+
 print("="*70)
 print("TRAINING IRRIGATION MODEL WITH REAL DATA")
 print("="*70)
@@ -76,6 +78,7 @@ print(f"FN: {cm[1,0]} | TP: {cm[1,1]}")
 # Save
 print("\n4. Saving model...")
 os.makedirs('models', exist_ok=True)
+clear_n_jobs(best_model)
 joblib.dump(best_model, 'models/irrigation_model.pkl')
 joblib.dump(scaler, 'models/irrigation_scaler.pkl')
 joblib.dump(feature_cols, 'models/irrigation_features.pkl')
@@ -221,6 +221,11 @@ with open('models/soil_model_metadata.json', 'w') as f:
     json.dump(metadata, f, indent=2)
 print("✅ Saved: models/soil_model_metadata.json")
 
+# Serving export: rescaling in the graph, so the API feeds raw uint8 pixels
+from export_serving_model import build_serving_model, save_serving_model, SERVING_MODEL_PATH
+save_serving_model(build_serving_model(model, IMG_SIZE), 'models/soil_image_model.keras', IMG_SIZE)
+print(f"✅ Saved: {SERVING_MODEL_PATH}")
+
 # Test prediction
 print("\n9. Testing prediction...")
 test_image_path = None
@@ -259,6 +264,7 @@ print("="*70)
 print("\nFiles created:")
 print("  - models/soil_image_model.keras (recommended)")
 print("  - models/soil_image_model.h5 (for compatibility)")
+print("  - models/soil_image_serving.keras (served by the API, uint8 input)")
 print("  - models/soil_class_labels.json")
 print("  - models/soil_model_metadata.json")
 print("\nModel Architecture: MobileNetV2 with Transfer Learning")
@@ -0,0 +1,308 @@
+"""
+Flat-array tree ensemble engine for the tabular models
+
+Converts a fitted RandomForestClassifier or GradientBoostingClassifier into
+contiguous NumPy node arrays (feature, threshold, children, leaf values)
+and evaluates every tree at once with a vectorized, level-by-level
+traversal. Labels and probabilities come out of a single pass, instead of
+sklearn's predict + predict_proba each walking all trees separately.
+
+Results match sklearn exactly (see test_tree_engine.py): inputs are cast
+to float32 like sklearn's tree code, and per-tree contributions are summed
+in the same order.
+
+The arrays may be read-only views of a memory-mapped bundle
+(model_bundle.py) in compact dtypes (int32 indices, float32 thresholds or
+leaf values where that is exact); they are used as given, not copied.
+"""
+import numpy as np
+from scipy.special import expit
+
+FOREST = 'forest'
+GRADIENT_BOOSTING = 'gradient_boosting'
+
+# Rows evaluated per traversal; bounds the (rows, trees) index arrays
+CHUNK_ROWS = 4096
+
+
+class TreeEnsemble:
+    """Flat-array tree ensemble classifier"""
+
+    def __init__(self, kind, classes, n_features, feature, threshold,
+                 children_left, children_right, value, roots, max_depth,
+                 init_raw=None, n_tree_classes=1, input_dtype=np.float32, children=None):
+        self.kind = kind
+        self.classes_ = np.asarray(classes)
+        self.n_features = int(n_features)
+        self.feature = _index_array(feature)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.value = np.ascontiguousarray(value)
+        self.roots = _index_array(roots)
+        # Interleaved [right, left] per node: next = children[2 * node + go_left]
+        if children is None:
+            children = np.stack([_index_array(children_right), _index_array(children_left)], axis=1).ravel()
+        self._children = _index_array(children)
+        self.children_left = self._children[1::2]
+        self.children_right = self._children[0::2]
+        self.max_depth = int(max_depth)
+        self.init_raw = None if init_raw is None else np.asarray(init_raw, dtype=np.float64)
+        # Gradient boosting: trees per stage (1 for binary, n_classes otherwise)
+        self.n_tree_classes = int(n_tree_classes)
+        # float32 for sklearn-equivalent trees; float64 once a scaler is folded in
+        self.input_dtype = np.dtype(input_dtype)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def arrays(self):
+        """The numeric state, e.g. for serialising"""
+        arrays = {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children_left': self.children_left,
+            'children_right': self.children_right,
+            'value': self.value,
+            'roots': self.roots,
+            'children': self._children,
+        }
+        if self.init_raw is not None:
+            arrays['init_raw'] = self.init_raw
+        return arrays
+
+    def _leaves(self, X):
+        """Leaf node index reached in every tree: shape (n_samples, n_trees)"""
+        n_samples = X.shape[0]
+        # Flat offsets so X[row, feature] becomes one take() on X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * self.n_features)[:, None]
+        flat_X = X.ravel()
+        node = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(node))
+            go_left = x <= self.threshold.take(node)
+            node = self._children.take((node << 1) | go_left)
+        return node
+
+    def _proba_chunk(self, X):
+        leaves = self._leaves(X)
+
+        if self.kind == FOREST:
+            # Sequential (cumulative) sum keeps sklearn's tree-by-tree order
+            per_tree = self.value.take(leaves, axis=0)
+            proba = np.cumsum(per_tree, axis=1, dtype=np.float64)[:, -1]
+            proba /= self.n_trees
+            return proba
+
+        # Gradient boosting: init + sum over stages of learning_rate * leaf
+        K = self.n_tree_classes
+        per_tree = self.value.take(leaves).reshape(X.shape[0], -1, K)
+        raw = np.concatenate([np.broadcast_to(self.init_raw, (X.shape[0], 1, K)), per_tree], axis=1)
+        raw = np.cumsum(raw, axis=1)[:, -1]
+
+        if K == 1:
+            proba = np.empty((X.shape[0], 2), dtype=np.float64)
+            proba[:, 1] = expit(raw[:, 0])
+            proba[:, 0] = 1 - proba[:, 1]
+            return proba
+
+        # Same steps as sklearn.utils.extmath.softmax
+        raw -= np.max(raw, axis=1).reshape((-1, 1))
+        np.exp(raw, raw)
+        raw /= np.sum(raw, axis=1).reshape((-1, 1))
+        return raw
+
+    def _encoded(self, proba):
+        if self.kind == GRADIENT_BOOSTING and self.n_tree_classes == 1:
+            # GradientBoostingClassifier.predict thresholds the raw score at 0,
+            # i.e. proba >= 0.5, so ties go to the positive class
+            return (proba[:, 1] >= 0.5).astype(np.intp)
+        return np.argmax(proba, axis=1)
+
+    def predict_with_proba(self, X):
+        """Return (labels, probabilities) from one traversal"""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected input with {self.n_features} features, got shape {X.shape}')
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        if not np.isfinite(X).all():
+            raise ValueError('Input contains NaN or infinity')
+
+        if X.shape[0] <= CHUNK_ROWS:
+            proba = self._proba_chunk(X)
+        else:
+            proba = np.concatenate([
+                self._proba_chunk(X[start:start + CHUNK_ROWS])
+                for start in range(0, X.shape[0], CHUNK_ROWS)
+            ])
+        return self.classes_.take(self._encoded(proba)), proba
+
+    def predict_proba(self, X):
+        return self.predict_with_proba(X)[1]
+
+    def predict(self, X):
+        return self.predict_with_proba(X)[0]
+
+
+def _index_array(a):
+    """Contiguous integer index array, keeping a compact (e.g. int32) dtype"""
+    a = np.asarray(a)
+    if a.dtype.kind not in 'iu':
+        a = a.astype(np.intp)
+    return np.ascontiguousarray(a)
+
+
+def _flatten_trees(trees, leaf_value):
+    """Concatenate sklearn Tree objects into global node arrays"""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree in trees:
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(n) + offset
+
+        # Leaves point at themselves, so extra traversal steps are no-ops
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        value.append(leaf_value(tree))
+        roots.append(offset)
+
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return (np.concatenate(feature), np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left), np.concatenate(right), np.concatenate(value),
+            np.array(roots), max_depth)
+
+
+def compile_model(model):
+    """Build a TreeEnsemble from a fitted sklearn classifier"""
+    from sklearn.ensemble import (RandomForestClassifier, ExtraTreesClassifier,
+                                  GradientBoostingClassifier)
+    from sklearn.dummy import DummyClassifier
+
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError('Multi-output models are not supported')
+
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        n_classes = model.n_classes_
+        trees = [est.tree_ for est in model.estimators_]
+        # Classifier leaf values are stored as class fractions already
+        arrays = _flatten_trees(trees, lambda t: t.value[:, 0, :n_classes])
+        feature, threshold, left, right, value, roots, max_depth = arrays
+        return TreeEnsemble(FOREST, model.classes_, model.n_features_in_, feature,
+                            threshold, left, right, value.astype(np.float64), roots, max_depth)
+
+    if isinstance(model, GradientBoostingClassifier):
+        if not (isinstance(model.init_, str) and model.init_ == 'zero') and \
+                not isinstance(model.init_, DummyClassifier):
+            raise ValueError('Only the default (prior) or zero init estimator is supported')
+
+        # Stage-major order: stage 0 class 0..K-1, stage 1 ... (as predict_stages)
+        trees = [est.tree_ for est in model.estimators_.ravel()]
+        lr = model.learning_rate
+        arrays = _flatten_trees(trees, lambda t: lr * t.value[:, 0, 0])
+        feature, threshold, left, right, value, roots, max_depth = arrays
+
+        # The prior doesn't depend on X, so evaluate it once on a dummy row
+        init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+        return TreeEnsemble(GRADIENT_BOOSTING, model.classes_, model.n_features_in_, feature,
+                            threshold, left, right, value.astype(np.float64), roots, max_depth,
+                            init_raw=init_raw, n_tree_classes=model.estimators_.shape[1])
+
+    raise ValueError(f'Unsupported model type: {type(model).__name__}')
+
+
+_INT64_MIN = np.int64(np.iinfo(np.int64).min)
+
+
+def _float_to_ordered(x):
+    """Map float64 values to int64 keys with the same ordering"""
+    bits = x.view(np.int64)
+    return np.where(bits >= 0, bits, _INT64_MIN - bits)
+
+
+def _ordered_to_float(keys):
+    bits = np.where(keys >= 0, keys, _INT64_MIN - keys)
+    return bits.view(np.float64)
+
+
+def fold_scaler(engine, scaler):
+    """Fold a fitted StandardScaler into the split thresholds
+
+    The returned engine takes raw (unscaled) float64 features. For a split
+    on feature j the original pipeline tests
+
+        float32((x - mean_j) / scale_j) <= t
+
+    which is monotone in x, so it is equivalent to x <= T for the largest
+    float64 T that still passes. T is found exactly by bisecting over the
+    ordered float64 values, making the fused engine agree with
+    scaler.transform + engine for every finite input.
+    """
+    if engine.input_dtype != np.float32:
+        raise ValueError('Engine already takes raw features')
+
+    n_features = engine.n_features
+    mean = scaler.mean_ if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None \
+        else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, 'with_std', True) and scaler.scale_ is not None \
+        else np.ones(n_features)
+
+    split = engine.children_left != np.arange(engine.n_nodes)
+    feature = engine.feature[split]
+    t = engine.threshold[split]
+    m = mean[feature].astype(np.float64)
+    sc = scale[feature].astype(np.float64)
+
+    def passes(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            z = (x - m) / sc
+            return z.astype(np.float32) <= t
+
+    # Invariant: passes(lo) is True, passes(hi) is False
+    max_float = np.finfo(np.float64).max
+    lo = np.full(len(t), _float_to_ordered(np.array([-max_float]))[0])
+    hi = np.full(len(t), _float_to_ordered(np.array([max_float]))[0])
+    if not (passes(_ordered_to_float(lo)).all() and not passes(_ordered_to_float(hi)).any()):
+        raise ValueError('Cannot fold scaler: thresholds out of range')
+
+    for _ in range(64):
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        ok = passes(_ordered_to_float(mid))
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+
+    threshold = engine.threshold.copy()
+    threshold[split] = _ordered_to_float(lo)
+
+    return TreeEnsemble(engine.kind, engine.classes_, engine.n_features, engine.feature,
+                        threshold, engine.children_left, engine.children_right, engine.value,
+                        engine.roots, engine.max_depth, init_raw=engine.init_raw,
+                        n_tree_classes=engine.n_tree_classes, input_dtype=np.float64,
+                        children=engine._children)
+
+
+class SklearnPredictor:
+    """Fallback with the TreeEnsemble interface for models we can't compile"""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict_with_proba(self, X):
+        proba = self.model.predict_proba(X)
+        return self.model.predict(X), proba
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def predict(self, X):
+        return self.model.predict(X)
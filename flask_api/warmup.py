@@ -0,0 +1,140 @@
+"""
+Warmup plans: run representative inputs through a model before it serves
+
+A freshly loaded model is slow on its first calls: TensorFlow sets up
+kernels and memory for each new batch shape, NumPy / sklearn initialise
+lazily, buffer pools start empty and the batching thread isn't running.
+LazyModel runs its model's warmup (model_loader.py) after loading and
+before reporting ready, so that cost is paid before the first request
+instead of by it. Hot reloads are warmed the same way before the swap.
+
+Each warmup returns its timings (shown in /health under model_states):
+the first and a repeat call for every planned batch size, so a first
+call still far slower than the repeat shows a shape that needs warming.
+
+Environment:
+  MODEL_WARMUP              0 disables warmup (1)
+  SOIL_WARMUP_BATCH_SIZES   image batch sizes, e.g. "1,4,16" (default:
+                            powers of two up to the largest batch served)
+  TABULAR_WARMUP_ROWS       row counts for the tabular models ("1,64,<STREAM_CHUNK_ROWS>")
+"""
+import io
+import os
+import time
+import numpy as np
+from PIL import Image
+
+from image_preprocessing import preprocess_image
+from startup_profiler import phase
+
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') != '0'
+
+
+def parse_sizes(value, default):
+    """Sorted unique positive ints from "1,4,16" (default when unset)"""
+    if not value:
+        return tuple(default)
+    sizes = {int(v) for v in value.split(',') if v.strip()}
+    if any(size < 1 for size in sizes):
+        raise ValueError(f"Batch sizes must be positive: {value}")
+    return tuple(sorted(sizes))
+
+
+def default_batch_sizes(*max_sizes):
+    """Powers of two up to the largest size, plus each maximum itself"""
+    largest = max(max_sizes)
+    sizes = {size for size in max_sizes}
+    size = 1
+    while size < largest:
+        sizes.add(size)
+        size *= 2
+    return tuple(sorted(sizes))
+
+
+def _ms(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _first_and_repeat(fn, *args):
+    first = _ms(fn, *args)
+    return {'first_ms': first, 'repeat_ms': _ms(fn, *args)}
+
+
+def sample_photo(size=(1280, 960), seed=0):
+    """JPEG bytes of a synthetic soil-coloured photo (phone-camera sized)"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    base = np.array([110, 80, 55], dtype=np.float32)
+    # Coarse blotches plus grain, so the JPEG isn't trivially compressible
+    coarse = rng.normal(0, 25, (h // 32 + 1, w // 32 + 1, 3)).repeat(32, 0).repeat(32, 1)[:h, :w]
+    pixels = np.clip(base + coarse + rng.normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format='JPEG', quality=85)
+    return out.getvalue()
+
+
+def warm_image_model(soil, batch_sizes):
+    """Decode a sample photo and run it through every planned batch size
+
+    Uses the model's own buffer pools and scheduler, so the pools are
+    filled and the batching thread is running when this returns.
+    """
+    start = time.perf_counter()
+    photo = sample_photo()
+    timings = {}
+    with soil.item_pool.batch(1) as item:
+        timings['decode'] = _first_and_repeat(
+            lambda: preprocess_image(photo, soil.img_size, out=item[0]))
+        batches = {}
+        for n in batch_sizes:
+            with phase(f'warmup batch {n}'), soil.batch_pool.batch(n) as batch:
+                batch[:] = item
+                batches[str(n)] = _first_and_repeat(soil.predictor, batch)
+        timings['batch_sizes'] = batches
+        timings['scheduler'] = _first_and_repeat(soil.scheduler.predict, item[0])
+    timings['seconds'] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+def representative_rows(bundle, n, seed=0):
+    """n raw feature rows spread over the range the trees split on
+
+    Rows land in many different leaves, unlike a row of zeros. Without the
+    engine's arrays (sklearn fallback), rows are drawn around the scaler's
+    mean instead.
+    """
+    rng = np.random.default_rng(seed)
+    n_features = len(bundle.features)
+    engine = bundle.engine
+    if hasattr(engine, 'threshold'):
+        # Leaves point at themselves; only split nodes have real thresholds
+        splits = engine.children_left != np.arange(engine.n_nodes)
+        lo, hi = np.full(n_features, -1.0), np.full(n_features, 1.0)
+        for f in range(n_features):
+            t = engine.threshold[splits & (engine.feature == f)]
+            if len(t):
+                margin = max(float(t.max() - t.min()) * 0.1, 1e-3)
+                lo[f], hi[f] = t.min() - margin, t.max() + margin
+        Z = rng.uniform(lo, hi, size=(n, n_features))
+    else:
+        Z = rng.standard_normal((n, n_features))
+
+    # Engine inputs are scaled unless the scaler is folded into it
+    scaler = None if bundle.fused else bundle.scaler
+    if scaler is None:
+        return Z
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    return Z * (1.0 if scale is None else scale) + (0.0 if mean is None else mean)
+
+
+def warm_tabular_model(bundle, score_fn, row_counts):
+    """Score representative rows through the route's own scoring function"""
+    start = time.perf_counter()
+    batches = {}
+    for n in row_counts:
+        X = representative_rows(bundle, n)
+        batches[str(n)] = _first_and_repeat(score_fn, bundle, X)
+    return {'rows': batches, 'seconds': round(time.perf_counter() - start, 3)}
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for gunicorn (see gunicorn.conf.py)
+
+With preload_app the master imports this module once: the tabular models
+are loaded here and shared copy-on-write with every forked worker.
+"""
+import os
+
+os.environ['APP_FACTORY'] = '1'
+
+from app import create_app
+
+app = create_app(fork=True)